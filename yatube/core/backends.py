@@ -0,0 +1,66 @@
+"""Бэкенды шаблонов, кэша и миниатюр с замером времени (см. core.timing).
+
+Подключаются через TEMPLATES, CACHES и THUMBNAIL_BACKEND и ведут себя
+как стандартные, только дописывают метрики в текущий запрос.
+"""
+from django.core.cache.backends.locmem import LocMemCache
+from django.template.backends.django import DjangoTemplates, Template
+from sorl.thumbnail.base import ThumbnailBackend
+
+from .shm_cache import SharedMemoryCache
+from .timing import count_cache, timer
+
+MISSING = object()
+
+
+class TimedTemplate(Template):
+
+    def render(self, context=None, request=None):
+        with timer('tpl'):
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
+
+
+class InstrumentedCacheMixin:
+    """Считает попадания и промахи get (get_many идёт через get)."""
+
+    def get(self, key, default=None, version=None):
+        with timer('cache'):
+            value = super().get(key, MISSING, version)
+        if value is MISSING:
+            count_cache('cache', misses=1)
+            return default
+        count_cache('cache', hits=1)
+        return value
+
+
+class InstrumentedLocMemCache(InstrumentedCacheMixin, LocMemCache):
+    pass
+
+
+class InstrumentedSharedMemoryCache(InstrumentedCacheMixin,
+                                    SharedMemoryCache):
+    pass
+
+
+class TimedThumbnailBackend(ThumbnailBackend):
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        with timer('thumb'):
+            return super().get_thumbnail(file_, geometry_string, **options)
+
+    def _create_thumbnail(self, source_image, geometry_string, options,
+                          thumbnail):
+        with timer('thumb-generate'):
+            return super()._create_thumbnail(
+                source_image, geometry_string, options, thumbnail
+            )
@@ -0,0 +1,478 @@
+"""Двухуровневый кэш: LRU в памяти процесса перед общим SQLite-кэшем.
+
+Общий уровень (SQLiteCache) — файл SQLite, доступный всем воркерам:
+add и incr в нём атомарны, поэтому блокировки и счётчики поколений
+кэша страниц работают между процессами.
+
+Локальный уровень (TwoTierCache) держит горячие значения в памяти,
+ограничен числом записей, объёмом и временем жизни. Согласованность —
+через журнал изменений в общем файле: каждая запись дописывает в него
+ключ, а номер последней записи служит версией. Воркер не реже
+SYNC_INTERVAL секунд дочитывает журнал после своей версии и выбрасывает
+изменённые ключи — в том числе свои: потоки процесса делят память, и
+поток, прочитавший значение до чужой записи, мог положить его в
+память уже после неё. Так инвалидации из сигналов любого потока
+доходят до всех.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from .timing import count_cache, timer
+
+MISSING = object()
+# Ключ записи журнала, означающей очистку всего кэша
+CLEAR_ALL = ''
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+    'CREATE TABLE IF NOT EXISTS changes ('
+    'seq INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL)',
+)
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в файле SQLite, общий для процессов на одной машине.
+
+    OPTIONS: MAX_ENTRIES и CULL_FREQUENCY как у встроенных бэкендов,
+    LOG_LENGTH — сколько последних изменений хранить в журнале.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = location
+        options = params.get('OPTIONS', {})
+        self.log_length = int(options.get('LOG_LENGTH', 10000))
+        self.cull_every = int(options.get('CULL_EVERY', 100))
+        self.writes = 0
+        self.local = threading.local()
+
+    @property
+    def db(self):
+        # Соединение своё у каждого потока и у каждого процесса после fork
+        if getattr(self.local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            db.execute('PRAGMA journal_mode = WAL')
+            db.execute('PRAGMA synchronous = NORMAL')
+            for statement in SCHEMA:
+                db.execute(statement)
+            self.local.db = db
+            self.local.pid = os.getpid()
+        return self.local.db
+
+    def write(self, operation):
+        """Выполняет operation(db) в одной транзакции записи."""
+        db = self.db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            result = operation(db)
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+        return result
+
+    def log(self, db, keys):
+        db.executemany(
+            'INSERT INTO changes (key) VALUES (?)', ((key,) for key in keys)
+        )
+        last = db.execute('SELECT max(seq) FROM changes').fetchone()[0]
+        if last % 1000 < len(keys):
+            db.execute(
+                'DELETE FROM changes WHERE seq <= ?',
+                (last - self.log_length,)
+            )
+
+    def cull(self, db):
+        now = time.time()
+        db.execute('DELETE FROM cache WHERE expires <= ?', (now,))
+        total = db.execute('SELECT count(*) FROM cache').fetchone()[0]
+        if total > self._max_entries:
+            # Выбрасываем записи, которым раньше всего истекать
+            db.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY expires IS NULL, expires LIMIT ?)',
+                (total // self._cull_frequency,)
+            )
+
+    def get_raw(self, keys):
+        """Живые записи {ключ: (pickle, истечение)} для готовых ключей."""
+        found = {}
+        now = time.time()
+        keys = list(keys)
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = self.db.execute(
+                'SELECT key, value, expires FROM cache WHERE key IN ({})'
+                .format(','.join('?' * len(chunk))),
+                chunk
+            )
+            for key, value, expires in rows:
+                if expires is None or expires > now:
+                    found[key] = (value, expires)
+        return found
+
+    def set_raw(self, items, timeout, only_new=False):
+        """Записывает {ключ: pickle}; only_new — поведение add."""
+        expires = self.get_backend_timeout(timeout)
+
+        def operation(db):
+            if only_new:
+                db.execute(
+                    'DELETE FROM cache WHERE key IN ({}) AND expires <= ?'
+                    .format(','.join('?' * len(items))),
+                    [*items, time.time()]
+                )
+            cursor = db.executemany(
+                'INSERT OR {} INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)'.format(
+                    'IGNORE' if only_new else 'REPLACE'
+                ),
+                ((key, value, expires) for key, value in items.items())
+            )
+            if cursor.rowcount:
+                self.log(db, items)
+                self.writes += 1
+                if self.writes % self.cull_every == 0:
+                    self.cull(db)
+            return cursor.rowcount
+        return self.write(operation)
+
+    def changes_since(self, seq):
+        """Ключи, изменённые после seq, и новая версия.
+
+        Если журнал уже обрезан дальше seq, ключи — None: локальную
+        копию надо сбросить целиком.
+        """
+        db = self.db
+        first = db.execute('SELECT min(seq) FROM changes').fetchone()[0]
+        rows = db.execute(
+            'SELECT seq, key FROM changes WHERE seq > ? '
+            'ORDER BY seq', (seq,)
+        ).fetchall()
+        if not rows:
+            return seq, []
+        if first is not None and first > seq + 1:
+            return rows[-1][0], None
+        return rows[-1][0], [key for _, key in rows]
+
+    def last_seq(self):
+        return self.db.execute(
+            'SELECT coalesce(max(seq), 0) FROM changes'
+        ).fetchone()[0]
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return bool(self.set_raw(
+            {key: pickle.dumps(value, pickle.HIGHEST_PROTOCOL)},
+            timeout, only_new=True
+        ))
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        entry = self.get_raw([key]).get(key)
+        return default if entry is None else pickle.loads(entry[0])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self.set_raw(
+            {key: pickle.dumps(value, pickle.HIGHEST_PROTOCOL)}, timeout
+        )
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        items = {}
+        for key, value in data.items():
+            key = self.make_key(key, version=version)
+            self.validate_key(key)
+            items[key] = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if items:
+            self.set_raw(items, timeout)
+        return []
+
+    def get_many(self, keys, version=None):
+        made = {self.make_key(key, version=version): key for key in keys}
+        return {
+            made[key]: pickle.loads(value)
+            for key, (value, _) in self.get_raw(made).items()
+        }
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        expires = self.get_backend_timeout(timeout)
+        return bool(self.write(lambda db: db.execute(
+            'UPDATE cache SET expires = ? WHERE key = ?', (expires, key)
+        ).rowcount))
+
+    def delete_raw(self, keys):
+        def operation(db):
+            deleted = db.execute(
+                'DELETE FROM cache WHERE key IN ({})'.format(
+                    ','.join('?' * len(keys))
+                ),
+                keys
+            ).rowcount
+            self.log(db, keys)
+            return deleted
+        return self.write(operation)
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self.delete_raw([key])
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_key(key, version=version) for key in keys]
+        if keys:
+            self.delete_raw(keys)
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        return key in self.get_raw([key])
+
+    def incr_raw(self, key, delta):
+        def operation(db):
+            row = db.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or (row[1] is not None and row[1] <= time.time()):
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            db.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (pickle.dumps(value, pickle.HIGHEST_PROTOCOL), key)
+            )
+            self.log(db, [key])
+            return value
+        return self.write(operation)
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self.incr_raw(key, delta)
+
+    def clear(self):
+        def operation(db):
+            db.execute('DELETE FROM cache')
+            self.log(db, [CLEAR_ALL])
+        self.write(operation)
+
+
+class LocalLRU:
+    """Ограниченный LRU в памяти процесса: значения хранятся в pickle.
+
+    Один на процесс и LOCATION: Django создаёт экземпляр бэкенда в
+    каждом потоке, а память и версия журнала у потоков общие.
+    """
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.seen = None
+        self.synced = 0
+        self.pid = os.getpid()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, expires):
+        if len(value) > self.max_bytes:
+            return
+        with self.lock:
+            self._remove(key)
+            self.entries[key] = (value, expires)
+            self.size += len(value)
+            while (
+                len(self.entries) > self.max_entries
+                or self.size > self.max_bytes
+            ):
+                self._remove(next(iter(self.entries)))
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[0])
+
+    def discard(self, keys):
+        with self.lock:
+            for key in keys:
+                self._remove(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+_local_tiers = {}
+_local_tiers_lock = threading.Lock()
+
+
+def local_tier(location, max_entries, max_bytes):
+    with _local_tiers_lock:
+        if location not in _local_tiers:
+            _local_tiers[location] = LocalLRU(max_entries, max_bytes)
+        return _local_tiers[location]
+
+
+class TwoTierCache(BaseCache):
+    """Локальный LRU перед общим SQLiteCache.
+
+    LOCATION — файл общего уровня. OPTIONS: LOCAL_MAX_ENTRIES,
+    LOCAL_MAX_BYTES, LOCAL_TIMEOUT (сколько максимум значение живёт в
+    памяти процесса) и SYNC_INTERVAL (как часто читать журнал), а также
+    параметры SQLiteCache. Атомарные add и incr всегда идут в общий
+    уровень.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.shared = SQLiteCache(location, params)
+        options = params.get('OPTIONS', {})
+        self.local = local_tier(
+            location,
+            int(options.get('LOCAL_MAX_ENTRIES', 1000)),
+            int(options.get('LOCAL_MAX_BYTES', 32 * 1024 ** 2)),
+        )
+        self.local_timeout = float(options.get('LOCAL_TIMEOUT', 60))
+        self.sync_interval = float(options.get('SYNC_INTERVAL', 0.1))
+
+    def make_key(self, key, version=None):
+        return self.shared.make_key(key, version)
+
+    def sync(self):
+        """Выбрасывает из памяти ключи, изменённые после прошлой сверки."""
+        local = self.local
+        now = time.monotonic()
+        if local.pid != os.getpid():
+            # После fork копия памяти родителя уже не согласована
+            local.pid, local.seen = os.getpid(), None
+        if local.seen is not None and now - local.synced < self.sync_interval:
+            return
+        if local.seen is None:
+            local.clear()
+            local.seen = self.shared.last_seq()
+        else:
+            local.seen, keys = self.shared.changes_since(local.seen)
+            if keys is None or CLEAR_ALL in keys:
+                local.clear()
+            else:
+                local.discard(keys)
+        local.synced = now
+
+    def remember(self, key, value, expires):
+        local_expires = time.time() + self.local_timeout
+        self.local.set(
+            key, value,
+            local_expires if expires is None else min(expires, local_expires)
+        )
+
+    def get_many(self, keys, version=None):
+        with timer('cache'):
+            self.sync()
+            made = {self.make_key(key, version): key for key in keys}
+            for key in made:
+                self.validate_key(key)
+            raw = {}
+            for key in made:
+                value = self.local.get(key)
+                if value is not None:
+                    raw[key] = value
+            local_hits = len(raw)
+            missing = [key for key in made if key not in raw]
+            if missing:
+                for key, (value, expires) in self.shared.get_raw(
+                    missing
+                ).items():
+                    self.remember(key, value, expires)
+                    raw[key] = value
+            count_cache('local', hits=local_hits,
+                        misses=len(made) - local_hits)
+            count_cache('cache', hits=len(raw), misses=len(made) - len(raw))
+            return {
+                made[key]: pickle.loads(value) for key, value in raw.items()
+            }
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version).get(key, default)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        items = {}
+        for key, value in data.items():
+            key = self.make_key(key, version)
+            self.validate_key(key)
+            items[key] = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if not items:
+            return []
+        self.sync()
+        self.shared.set_raw(items, timeout)
+        expires = self.get_backend_timeout(timeout)
+        for key, value in items.items():
+            self.remember(key, value, expires)
+        return []
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version)
+        self.validate_key(key)
+        self.sync()
+        self.local.discard([key])
+        return bool(self.shared.set_raw(
+            {key: pickle.dumps(value, pickle.HIGHEST_PROTOCOL)},
+            timeout, only_new=True
+        ))
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version)
+        self.validate_key(key)
+        self.sync()
+        self.local.discard([key])
+        return self.shared.incr_raw(key, delta)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self.sync()
+        self.local.discard([self.make_key(key, version)])
+        return self.shared.touch(key, timeout, version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_key(key, version) for key in keys]
+        if keys:
+            self.sync()
+            self.local.discard(keys)
+            self.shared.delete_raw(keys)
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def has_key(self, key, version=None):
+        return key in self.get_many([key], version)
+
+    def clear(self):
+        self.sync()
+        self.local.clear()
+        self.shared.clear()
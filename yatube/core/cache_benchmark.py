@@ -0,0 +1,86 @@
+"""Сравнение бэкендов кэша под нагрузкой нескольких процессов.
+
+Каждый процесс имитирует воркер: читает ключи с перекосом к
+популярным, при промахе «считает» значение и кладёт его в кэш, а с
+долей write_ratio просто перезаписывает ключ. Итог по бэкенду —
+пропускная способность, задержки операций и число пересчётов на всю
+машину: у кэша в памяти процесса каждый воркер считает всё сам.
+"""
+import multiprocessing
+import os
+import random
+import statistics
+import time
+
+from django.utils.module_loading import import_string
+
+BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', None),
+    'filebased': (
+        'django.core.cache.backends.filebased.FileBasedCache', 'filebased'
+    ),
+    'two-tier': ('core.cache.TwoTierCache', 'two-tier.sqlite3'),
+    'shared-memory': ('core.shm_cache.SharedMemoryCache', 'shared.shm'),
+}
+
+
+def create(name, directory, keys):
+    backend, location = BACKENDS[name]
+    return import_string(backend)(
+        os.path.join(directory, location) if location else name,
+        {'OPTIONS': {
+            'MAX_ENTRIES': keys * 2, 'LOCAL_MAX_ENTRIES': keys * 2
+        }},
+    )
+
+
+def work(name, directory, operations, keys, value_size, write_ratio,
+         seed):
+    """Нагрузка одного воркера: задержки, попадания и пересчёты."""
+    cache = create(name, directory, keys)
+    generator = random.Random(seed)
+    value = os.urandom(value_size)
+    latencies = []
+    hits = computes = 0
+    started = time.perf_counter()
+    for _ in range(operations):
+        key = f'key:{int(keys ** generator.random())}'
+        operation_started = time.perf_counter()
+        if generator.random() < write_ratio:
+            cache.set(key, value)
+        elif cache.get(key) is None:
+            cache.set(key, value)
+            computes += 1
+        else:
+            hits += 1
+        latencies.append(time.perf_counter() - operation_started)
+    return latencies, hits, computes, time.perf_counter() - started
+
+
+def run_backend(name, directory, processes, operations, keys, value_size,
+                write_ratio):
+    arguments = [
+        (name, directory, operations, keys, value_size, write_ratio, seed)
+        for seed in range(processes)
+    ]
+    if processes == 1:
+        results = [work(*arguments[0])]
+    else:
+        context = multiprocessing.get_context('fork')
+        with context.Pool(processes) as pool:
+            results = pool.starmap(work, arguments)
+    latencies = [
+        latency for result in results for latency in result[0]
+    ]
+    reads = sum(result[1] + result[2] for result in results)
+    cuts = statistics.quantiles(latencies, n=100)
+    return {
+        'ops': len(latencies),
+        'ops_per_second': len(latencies) / max(
+            result[3] for result in results
+        ),
+        'p50_us': cuts[49] * 1e6,
+        'p99_us': cuts[98] * 1e6,
+        'hit_ratio': sum(result[1] for result in results) / reads,
+        'computes': sum(result[2] for result in results),
+    }
@@ -0,0 +1,86 @@
+"""Настройка соединений SQLite под параллельную нагрузку.
+
+При создании соединения включаем WAL (читатели не ждут писателей),
+synchronous=NORMAL (в WAL это безопасно и без fsync на каждую
+транзакцию), busy_timeout, размер страничного кэша и mmap — всё из
+SQLITE_PRAGMAS. Соединения живут CONN_MAX_AGE секунд, поэтому
+PRAGMA optimize и контрольная точка WAL выполняются периодически
+после запросов, а не при закрытии соединения.
+
+Транзакции, которые пишут, открываются через immediate_atomic: в SQLite
+она начинается с BEGIN IMMEDIATE (см. core.sqlite3).
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+_maintenance = threading.local()
+
+
+def is_sqlite(connection):
+    return connection.vendor == 'sqlite'
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if not is_sqlite(connection):
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {pragma} = {value}')
+
+
+class ImmediateAtomic(transaction.Atomic):
+    """atomic, который сразу берёт блокировку записи SQLite.
+
+    Действует только на внешний блок: вложенный блок становится точкой
+    сохранения в уже открытой транзакции.
+    """
+
+    def __enter__(self):
+        connection = transaction.get_connection(self.using)
+        connection.begin_immediate = True
+        try:
+            super().__enter__()
+        finally:
+            connection.begin_immediate = False
+
+
+def immediate_atomic(using=None, savepoint=True):
+    """transaction.atomic для путей записи, тоже работает декоратором."""
+    if callable(using):
+        return ImmediateAtomic(DEFAULT_DB_ALIAS, savepoint)(using)
+    return ImmediateAtomic(using, savepoint)
+
+
+def maintain(connection, checkpoint='PASSIVE'):
+    """PRAGMA optimize и контрольная точка WAL.
+
+    Возвращает результат wal_checkpoint: (занят ли, страниц в WAL,
+    перенесено страниц).
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA optimize')
+        cursor.execute(f'PRAGMA wal_checkpoint({checkpoint})')
+        return cursor.fetchone()
+
+
+@receiver(request_finished)
+def periodic_maintenance(sender, **kwargs):
+    # Отметка времени своя у каждого потока, как и его соединения
+    now = time.monotonic()
+    last = getattr(_maintenance, 'last', None)
+    if last is None:
+        _maintenance.last = now
+        return
+    if now - last < settings.SQLITE_MAINTENANCE_INTERVAL:
+        return
+    _maintenance.last = now
+    for connection in connections.all():
+        if is_sqlite(connection) and connection.connection is not None:
+            maintain(connection)
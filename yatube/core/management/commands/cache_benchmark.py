@@ -0,0 +1,57 @@
+import json
+import shutil
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.cache_benchmark import BACKENDS, run_backend
+
+
+class Command(BaseCommand):
+    help = 'Сравнение бэкендов кэша под нагрузкой нескольких процессов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--backends', nargs='*', default=list(BACKENDS),
+            choices=list(BACKENDS)
+        )
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument(
+            '--operations', type=int, default=20000,
+            help='Операций на процесс'
+        )
+        parser.add_argument('--keys', type=int, default=1000)
+        parser.add_argument('--value-size', type=int, default=2048)
+        parser.add_argument(
+            '--write-ratio', type=float, default=0.05,
+            help='Доля перезаписей среди операций'
+        )
+        parser.add_argument(
+            '--output', default=None, help='Сохранить результат в JSON'
+        )
+
+    def handle(self, *args, **options):
+        if options['processes'] < 1 or options['operations'] < 2:
+            raise CommandError('Нужны хотя бы один процесс и две операции')
+        results = {}
+        for name in options['backends']:
+            # Каждому бэкенду — свой пустой каталог
+            directory = tempfile.mkdtemp()
+            try:
+                results[name] = result = run_backend(
+                    name, directory, options['processes'],
+                    options['operations'], options['keys'],
+                    options['value_size'], options['write_ratio'],
+                )
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+            self.stdout.write(
+                f'{name}: {result["ops_per_second"]:.0f} оп/с, '
+                f'p50 {result["p50_us"]:.1f} мкс, '
+                f'p99 {result["p99_us"]:.1f} мкс, '
+                f'попаданий {result["hit_ratio"]:.1%}, '
+                f'пересчётов {result["computes"]}'
+            )
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, ensure_ascii=False, indent=2)
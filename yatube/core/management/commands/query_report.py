@@ -0,0 +1,66 @@
+import json
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Сводка выборки SQL-запросов по вью из QUERY_REPORT_PATH'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path', default=settings.QUERY_REPORT_PATH,
+            help='Файл выборки в формате JSON Lines'
+        )
+        parser.add_argument(
+            '--json', action='store_true', help='Вывести отчёт в JSON'
+        )
+
+    def handle(self, *args, **options):
+        views = defaultdict(lambda: {
+            'requests': 0,
+            'queries': [],
+            'time': 0.0,
+            'n_plus_one': Counter(),
+        })
+        if not options['path']:
+            raise CommandError(
+                'Выборка не пишется: задайте QUERY_REPORT_PATH или --path'
+            )
+        with open(options['path']) as sample:
+            for line in sample:
+                entry = json.loads(line)
+                view = views[entry['view']]
+                view['requests'] += 1
+                view['queries'].append(entry['queries'])
+                view['time'] += entry['time']
+                for repeated in entry['n_plus_one']:
+                    for origin in repeated['origins']:
+                        view['n_plus_one'][
+                            f'{origin} {repeated["shape"]}'
+                        ] += 1
+        report = {
+            name: {
+                'requests': view['requests'],
+                'avg_queries': sum(view['queries']) / view['requests'],
+                'max_queries': max(view['queries']),
+                'avg_db_time': view['time'] / view['requests'],
+                'n_plus_one': dict(view['n_plus_one'].most_common()),
+            }
+            for name, view in views.items()
+        }
+        if options['json']:
+            self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+            return
+        for name, view in sorted(
+            report.items(), key=lambda item: -item[1]['avg_queries']
+        ):
+            self.stdout.write(
+                f'{name}: обращений {view["requests"]}, '
+                f'в среднем {view["avg_queries"]:.1f} SQL '
+                f'(максимум {view["max_queries"]}), '
+                f'{view["avg_db_time"] * 1000:.1f} мс в БД'
+            )
+            for place, count in view['n_plus_one'].items():
+                self.stdout.write(f'  N+1 ×{count}: {place}')
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.db import is_sqlite, maintain
+
+CHECKPOINT_MODES = ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE')
+
+
+class Command(BaseCommand):
+    help = 'PRAGMA optimize и контрольная точка WAL для баз SQLite'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--checkpoint', default='TRUNCATE', choices=CHECKPOINT_MODES,
+            help='Режим wal_checkpoint; TRUNCATE заодно обрезает файл WAL'
+        )
+
+    def handle(self, *args, **options):
+        databases = [
+            connection for connection in connections.all()
+            if is_sqlite(connection)
+        ]
+        if not databases:
+            raise CommandError('Нет баз SQLite')
+        for connection in databases:
+            busy, wal_pages, moved = maintain(
+                connection, options['checkpoint']
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f'{connection.alias}: страниц в WAL {wal_pages}, '
+                f'перенесено {moved}, занято {bool(busy)}'
+            ))
@@ -0,0 +1,279 @@
+"""Метрики приложения в формате Prometheus, общие для всех воркеров.
+
+Каждый процесс пишет свои счётчики в отдельный файл METRICS_DIR/<pid>.db,
+отображённый в память (mmap), поэтому запись не требует блокировок
+между процессами. Эндпоинт /metrics читает все файлы каталога и
+складывает значения: у счётчиков и гистограмм сумма по воркерам и
+есть итог.
+
+Файл живёт, пока жив процесс: при выходе воркер удаляет его сам, файлы
+убитых процессов удаляет сборщик, а файл, оставшийся от прежнего
+процесса с тем же pid, начинается заново. Поэтому после перезапуска
+счётчики сбрасываются, как у обычного процесса, и каталог не растёт.
+
+Формат файла: 8 байт — занятая длина, затем записи
+<длина ключа: 4 байта><ключ, выровненный до 8 байт><значение: double>.
+Ключ — готовая строка сэмпла вида name{label="value"}.
+"""
+import atexit
+import mmap
+import os
+import struct
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+
+HEADER = struct.Struct('q')
+KEY_LENGTH = struct.Struct('i')
+VALUE = struct.Struct('d')
+INITIAL_SIZE = 64 * 1024
+FILE_SUFFIX = '.db'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+COUNTER = 'counter'
+HISTOGRAM = 'histogram'
+GAUGE = 'gauge'
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 15, 20, 50, 100)
+UPLOAD_BUCKETS = (
+    10 * 1024, 100 * 1024, 512 * 1024, 1024 ** 2, 5 * 1024 ** 2,
+    10 * 1024 ** 2,
+)
+
+METRICS = {
+    'yatube_requests_total': (
+        COUNTER, 'Запросы по имени вью, методу и статусу'
+    ),
+    'yatube_request_errors_total': (
+        COUNTER, 'Ответы 5xx и необработанные исключения по имени вью'
+    ),
+    'yatube_request_duration_seconds': (
+        HISTOGRAM, 'Время ответа по имени вью'
+    ),
+    'yatube_db_queries': (
+        HISTOGRAM, 'Число SQL-запросов на запрос по имени вью'
+    ),
+    'yatube_cache_requests_total': (
+        COUNTER, 'Обращения к кэшу: попадания и промахи'
+    ),
+    'yatube_cache_hit_ratio': (
+        GAUGE, 'Доля попаданий в кэш по всем воркерам'
+    ),
+    'yatube_upload_bytes': (
+        HISTOGRAM, 'Размер загруженных файлов'
+    ),
+}
+
+
+def sample_key(name, **labels):
+    if not labels:
+        return name
+    return '{}{{{}}}'.format(name, ','.join(
+        '{}="{}"'.format(label, str(value).replace('"', '\\"'))
+        for label, value in sorted(labels.items())
+    ))
+
+
+def read_entries(data):
+    """Пары (ключ, смещение значения) из содержимого файла метрик."""
+    used = HEADER.unpack_from(data, 0)[0]
+    position = HEADER.size
+    while position < used:
+        length = KEY_LENGTH.unpack_from(data, position)[0]
+        key_start = position + KEY_LENGTH.size
+        key = bytes(data[key_start:key_start + length]).decode()
+        position = key_start + length
+        position += -position % 8
+        yield key, position
+        position += VALUE.size
+
+
+class MmapStore:
+    """Значения одного процесса в файле, отображённом в память."""
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.file = open(path, 'a+b')
+        size = os.fstat(self.file.fileno()).st_size
+        if size == 0:
+            size = INITIAL_SIZE
+            self.file.truncate(size)
+        self.size = size
+        self.mmap = mmap.mmap(self.file.fileno(), size)
+        self.used = HEADER.unpack_from(self.mmap, 0)[0]
+        if not self.used:
+            self.used = HEADER.size
+            HEADER.pack_into(self.mmap, 0, self.used)
+        self.positions = dict(read_entries(self.mmap))
+
+    def _grow(self, needed):
+        size = self.size
+        while size < needed:
+            size *= 2
+        self.mmap.close()
+        self.file.truncate(size)
+        self.size = size
+        self.mmap = mmap.mmap(self.file.fileno(), size)
+
+    def _append(self, key):
+        encoded = key.encode()
+        key_end = self.used + KEY_LENGTH.size + len(encoded)
+        position = key_end + -key_end % 8
+        end = position + VALUE.size
+        if end > self.size:
+            self._grow(end)
+        KEY_LENGTH.pack_into(self.mmap, self.used, len(encoded))
+        self.mmap[self.used + KEY_LENGTH.size:key_end] = encoded
+        VALUE.pack_into(self.mmap, position, 0.0)
+        # Длину обновляем последней: читатель не увидит запись,
+        # пока она не дописана целиком
+        self.used = end
+        HEADER.pack_into(self.mmap, 0, end)
+        self.positions[key] = position
+        return position
+
+    def inc(self, key, amount=1):
+        with self.lock:
+            position = self.positions.get(key) or self._append(key)
+            value = VALUE.unpack_from(self.mmap, position)[0]
+            VALUE.pack_into(self.mmap, position, value + amount)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Файл текущего процесса; после fork воркер заводит свой."""
+    global _store
+    path = os.path.join(settings.METRICS_DIR, f'{os.getpid()}{FILE_SUFFIX}')
+    if _store is None or _store[0] != path:
+        with _store_lock:
+            if _store is None or _store[0] != path:
+                os.makedirs(settings.METRICS_DIR, exist_ok=True)
+                # Файл с нашим pid остался от завершившегося процесса
+                remove(path)
+                _store = (path, MmapStore(path))
+    return _store[1]
+
+
+def remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+@atexit.register
+def remove_store():
+    """Удаляет файл процесса при выходе."""
+    # После fork обработчик наследуется, а файл родителя трогать нельзя
+    if _store is not None and os.path.basename(_store[0]) == (
+        f'{os.getpid()}{FILE_SUFFIX}'
+    ):
+        remove(_store[0])
+
+
+def is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def inc(name, amount=1, **labels):
+    get_store().inc(sample_key(name, **labels), amount)
+
+
+def observe(name, value, buckets, **labels):
+    """Наблюдение гистограммы: бакеты храним сразу накопительными.
+
+    Все бакеты заводятся при первом наблюдении, так что в файле они
+    идут по возрастанию le, как того требует формат экспозиции.
+    """
+    store = get_store()
+    for bound in buckets:
+        store.inc(
+            sample_key(f'{name}_bucket', le=bound, **labels),
+            int(value <= bound)
+        )
+    store.inc(sample_key(f'{name}_bucket', le='+Inf', **labels))
+    store.inc(sample_key(f'{name}_sum', **labels), value)
+    store.inc(sample_key(f'{name}_count', **labels))
+
+
+def collect():
+    """Значения всех воркеров, сложенные по ключу сэмпла."""
+    totals = defaultdict(float)
+    if not os.path.isdir(settings.METRICS_DIR):
+        return totals
+    for filename in os.listdir(settings.METRICS_DIR):
+        pid = filename[:-len(FILE_SUFFIX)]
+        if not filename.endswith(FILE_SUFFIX) or not pid.isdigit():
+            continue
+        path = os.path.join(settings.METRICS_DIR, filename)
+        if not is_alive(int(pid)):
+            # Процесс убит и не успел удалить свой файл
+            remove(path)
+            continue
+        try:
+            with open(path, 'rb') as metrics_file:
+                data = metrics_file.read()
+        except FileNotFoundError:
+            continue
+        if len(data) < HEADER.size:
+            continue
+        for key, position in read_entries(data):
+            totals[key] += VALUE.unpack_from(data, position)[0]
+    return totals
+
+
+def cache_hit_ratios(totals):
+    name = 'yatube_cache_requests_total'
+    requests = defaultdict(lambda: {'hit': 0, 'miss': 0})
+    for key, value in totals.items():
+        if key.startswith(name + '{'):
+            labels = dict(
+                label.split('=', 1)
+                for label in key[len(name) + 1:-1].split(',')
+            )
+            requests[labels['cache'].strip('"')][
+                labels['result'].strip('"')
+            ] += value
+    return {
+        sample_key('yatube_cache_hit_ratio', cache=cache):
+            counts['hit'] / (counts['hit'] + counts['miss'])
+        for cache, counts in requests.items()
+        if counts['hit'] + counts['miss']
+    }
+
+
+def format_value(value):
+    return str(int(value)) if value == int(value) else repr(value)
+
+
+def render():
+    """Текст в формате экспозиции Prometheus."""
+    totals = collect()
+    totals.update(cache_hit_ratios(totals))
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        samples = [
+            (key, value) for key, value in totals.items()
+            if key.split('{', 1)[0] in (
+                name, f'{name}_bucket', f'{name}_sum', f'{name}_count'
+            )
+        ]
+        if not samples:
+            continue
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        lines.extend(
+            f'{key} {format_value(value)}' for key, value in samples
+        )
+    return '\n'.join(lines) + '\n'
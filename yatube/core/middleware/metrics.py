@@ -0,0 +1,66 @@
+"""Запись метрик запроса для эндпоинта /metrics (см. core.metrics).
+
+Число SQL-запросов и обращения к кэшу берутся из сборщика
+ServerTimingMiddleware, поэтому эта middleware должна стоять после неё.
+"""
+import time
+
+from .. import metrics
+from ..timing import current
+
+
+class MetricsMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        except Exception:
+            metrics.inc(
+                'yatube_request_errors_total', view=view_name(request)
+            )
+            raise
+        self.record(request, response, time.perf_counter() - started)
+        return response
+
+    def record(self, request, response, duration):
+        view = view_name(request)
+        metrics.inc(
+            'yatube_requests_total',
+            view=view, method=request.method, status=response.status_code
+        )
+        if response.status_code >= 500:
+            metrics.inc('yatube_request_errors_total', view=view)
+        metrics.observe(
+            'yatube_request_duration_seconds', duration,
+            metrics.LATENCY_BUCKETS, view=view
+        )
+        timing = current()
+        if timing is not None:
+            metrics.observe(
+                'yatube_db_queries', timing.counts['db'],
+                metrics.QUERY_BUCKETS, view=view
+            )
+            for cache, counts in timing.cache.items():
+                for result, key in (('hit', 'hits'), ('miss', 'misses')):
+                    if counts[key]:
+                        metrics.inc(
+                            'yatube_cache_requests_total', counts[key],
+                            cache=cache, result=result
+                        )
+        if request.method == 'POST' and request.content_type == (
+            'multipart/form-data'
+        ):
+            for upload in request.FILES.values():
+                metrics.observe(
+                    'yatube_upload_bytes', upload.size,
+                    metrics.UPLOAD_BUCKETS
+                )
+
+
+def view_name(request):
+    match = request.resolver_match
+    return match.view_name if match else 'unmatched'
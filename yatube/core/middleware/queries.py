@@ -0,0 +1,148 @@
+"""Учёт SQL-запросов запроса: бюджет на вью и поиск N+1.
+
+Middleware записывает все запросы выборочных HTTP-запросов (всех при
+DEBUG), группирует их по форме (SQL без литералов) и помечает формы,
+повторившиеся N_PLUS_ONE_THRESHOLD и более раз, вместе с шаблоном и
+строкой, откуда они пришли. Превышение бюджета QUERY_BUDGETS
+логируется, а при QUERY_BUDGET_STRICT — роняет запрос, чтобы падали
+тесты. Данные выборки дописываются в QUERY_REPORT_PATH (JSON Lines),
+отчёт по ним строит команда query_report.
+"""
+import json
+import logging
+import random
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+IN_LISTS = re.compile(r'\bIN \((?:\?, )*\?\)')
+PROJECT_ROOT = settings.BASE_DIR
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_shape(sql):
+    """SQL без литералов: одинаковые запросы с разными id совпадают."""
+    return IN_LISTS.sub(
+        'IN (...)', LITERALS.sub('?', sql.replace('%s', '?'))
+    )
+
+
+def query_origin():
+    """Шаблон и строка, рендер которых вызвал запрос, или код проекта."""
+    frame = sys._getframe(2)
+    code_origin = None
+    while frame is not None:
+        node = frame.f_locals.get('self')
+        if frame.f_code.co_name == 'render_annotated' and node is not None:
+            origin = getattr(node, 'origin', None)
+            token = getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                return f'{origin.template_name}:{token.lineno}'
+        filename = frame.f_code.co_filename
+        if (
+            code_origin is None
+            and filename.startswith(PROJECT_ROOT)
+            and filename != __file__
+        ):
+            code_origin = '{}:{}'.format(
+                filename[len(PROJECT_ROOT) + 1:], frame.f_lineno
+            )
+        frame = frame.f_back
+    return code_origin
+
+
+class QueryRecorder:
+    """Обёртка execute_wrapper, которая запоминает запросы."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'time': time.perf_counter() - started,
+                'origin': query_origin(),
+            })
+
+    def repeated_shapes(self, threshold):
+        shapes = defaultdict(Counter)
+        for query in self.queries:
+            shapes[query_shape(query['sql'])][query['origin']] += 1
+        return [
+            {
+                'shape': shape,
+                'count': sum(origins.values()),
+                'origins': dict(origins),
+            }
+            for shape, origins in shapes.items()
+            if sum(origins.values()) >= threshold
+        ]
+
+
+class QueryInspectorMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def sampled(self):
+        return (
+            settings.DEBUG
+            or settings.QUERY_BUDGET_STRICT
+            or random.random() < settings.QUERY_SAMPLE_RATE
+        )
+
+    def __call__(self, request):
+        if not self.sampled():
+            return self.get_response(request)
+        recorder = QueryRecorder()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        match = request.resolver_match
+        self.inspect(request, match.view_name if match else None, recorder)
+        return response
+
+    def inspect(self, request, view_name, recorder):
+        repeated = recorder.repeated_shapes(settings.N_PLUS_ONE_THRESHOLD)
+        for entry in repeated:
+            logger.warning(
+                'N+1 в %s: %s одинаковых запросов из %s: %s',
+                view_name, entry['count'], entry['origins'], entry['shape']
+            )
+        if settings.QUERY_REPORT_PATH:
+            with open(settings.QUERY_REPORT_PATH, 'a') as report:
+                report.write(json.dumps({
+                    'view': view_name,
+                    'path': request.path,
+                    'queries': len(recorder.queries),
+                    'time': sum(query['time'] for query in recorder.queries),
+                    'n_plus_one': repeated,
+                }, ensure_ascii=False) + '\n')
+        budget = settings.QUERY_BUDGETS.get(
+            view_name, settings.QUERY_BUDGET_DEFAULT
+        )
+        if len(recorder.queries) <= budget:
+            return
+        message = (
+            f'{view_name} выполнил {len(recorder.queries)} запросов '
+            f'при бюджете {budget}'
+        )
+        if settings.QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
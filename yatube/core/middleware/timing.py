@@ -0,0 +1,85 @@
+"""Заголовок Server-Timing и структурированный лог времени запроса.
+
+Разбивает ответ на время SQL (и число запросов), рендер шаблонов,
+обращения к кэшу с попаданиями и промахами (отдельно — кэш страниц)
+и миниатюры sorl. Метрики видны во вкладке Network браузера, а строка
+лога с ключом view_name — в агрегаторе логов.
+"""
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from ..timing import collect
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseTimer:
+    """Обёртка execute_wrapper, которая копит время SQL в метрике db."""
+
+    def __init__(self, timing):
+        self.timing = timing
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.timing.add('db', time.perf_counter() - started)
+
+
+def server_timing(timing, total):
+    # Описания идут в заголовок, поэтому только ASCII
+    metrics = [
+        f'{metric};dur={duration * 1000:.1f};desc="{timing.counts[metric]}"'
+        for metric, duration in timing.durations.items()
+    ]
+    metrics.extend(
+        f'{name}-hit;desc="{counts["hits"]}",'
+        f'{name}-miss;desc="{counts["misses"]}"'
+        for name, counts in timing.cache.items()
+    )
+    metrics.append(f'total;dur={total * 1000:.1f}')
+    return ','.join(metrics)
+
+
+def log_record(request, timing, total):
+    match = request.resolver_match
+    return {
+        'view': match.view_name if match else None,
+        'method': request.method,
+        'path': request.path,
+        'total_ms': round(total * 1000, 1),
+        'durations_ms': {
+            metric: round(duration * 1000, 1)
+            for metric, duration in timing.durations.items()
+        },
+        'counts': dict(timing.counts),
+        'cache': dict(timing.cache),
+    }
+
+
+class ServerTimingMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        with collect() as timing, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(DatabaseTimer(timing))
+                )
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+        if settings.SERVER_TIMING_HEADER:
+            response['Server-Timing'] = server_timing(timing, total)
+        logger.info(json.dumps(
+            log_record(request, timing, total), ensure_ascii=False
+        ))
+        return response
@@ -0,0 +1,157 @@
+"""Чтение лент и страниц постов с реплик базы.
+
+Вью, обёрнутые в use_replica, читают модели REPLICA_APP_LABELS с
+реплик DATABASE_REPLICAS по кругу; недоступная реплика пропускается
+на REPLICA_HEALTH_CHECK_INTERVAL секунд, а если живых нет — читаем
+с основной базы. Запись, сессии и пользователи всегда идут в основную.
+
+Чтобы пользователь сразу видел свои изменения, ReplicaPinMiddleware
+после успешного изменяющего запроса ставит cookie REPLICA_PIN_COOKIE:
+пока она жива, его чтения идут в основную базу. Вью, которые пишут
+по GET (подписка по ссылке), помечаются декоратором pin_replica.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from itertools import count
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PRIMARY = 'primary'
+REPLICA = 'replica'
+
+_state = threading.local()
+_turn = count()
+_health = {}
+
+
+def check_health(alias):
+    connection = connections[alias]
+    if connection.vendor == 'sqlite' and not connection.is_in_memory_db():
+        # Иначе sqlite молча создаст пустой файл на месте пропавшей копии
+        if not os.path.exists(connection.settings_dict['NAME']):
+            return False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except DatabaseError:
+        return False
+    return True
+
+
+def is_healthy(alias):
+    healthy, checked = _health.get(alias, (True, None))
+    now = time.monotonic()
+    if (
+        checked is None
+        or now - checked > settings.REPLICA_HEALTH_CHECK_INTERVAL
+    ):
+        healthy = check_health(alias)
+        _health[alias] = (healthy, now)
+    return healthy
+
+
+def choose_replica():
+    """Следующая живая реплика по кругу или основная база."""
+    replicas = settings.DATABASE_REPLICAS
+    start = next(_turn)
+    for offset in range(len(replicas)):
+        alias = replicas[(start + offset) % len(replicas)]
+        if is_healthy(alias):
+            return alias
+    return DEFAULT_DB_ALIAS
+
+
+def reads_from_replica():
+    return bool(getattr(_state, 'replica', False) and (
+        settings.DATABASE_REPLICAS
+    ))
+
+
+def read_source():
+    """Откуда сейчас читаются данные: для ключей кэша страниц."""
+    return REPLICA if reads_from_replica() else PRIMARY
+
+
+@contextmanager
+def replica_reads():
+    previous = getattr(_state, 'replica', False)
+    _state.replica = True
+    try:
+        yield
+    finally:
+        _state.replica = previous
+
+
+def is_pinned(request):
+    return settings.REPLICA_PIN_COOKIE in request.COOKIES
+
+
+def use_replica(view):
+    """Читать данные вью с реплик, если пользователь не закреплён."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in SAFE_METHODS or is_pinned(request):
+            return view(request, *args, **kwargs)
+        with replica_reads():
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+def pin_replica(view):
+    """Закрепить пользователя за основной базой после этой вью.
+
+    Для вью, которые пишут и по безопасным методам.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        request.pin_replica = True
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def writes(request):
+    return (
+        request.method not in SAFE_METHODS
+        or getattr(request, 'pin_replica', False)
+    )
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if (
+            reads_from_replica()
+            and model._meta.app_label in settings.REPLICA_APP_LABELS
+        ):
+            return choose_replica()
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной базы, связи между ними допустимы
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaPinMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if writes(request) and response.status_code < 400:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS, httponly=True,
+            )
+        return response
@@ -0,0 +1,413 @@
+"""Кэш в общей памяти всех воркеров одной машины.
+
+Файл LOCATION отображается в память (mmap) каждым процессом, поэтому
+страницы, счётчики и фрагменты считаются один раз на машину, а не в
+каждом воркере.
+
+Память разбита на классы слотов разного размера (CLASSES): маленькие
+для счётчиков и блокировок, большие для страниц. Каждый класс —
+хэш-таблица из наборов по WAYS слотов: ключ попадает в один набор
+каждого класса, а хранится в наименьшем классе, куда помещается. При
+нехватке места из набора вытесняется истёкшая или давнее всего
+прочитанная запись. Значения больше самого крупного слота не
+кэшируются.
+
+Чтение идёт без блокировок: у слота есть счётчик версии (seqlock),
+нечётный на время записи, и читатель повторяет чтение, если версия
+изменилась. Запись блокирует только наборы своего ключа: потоки
+процесса — через полосы threading.Lock, процессы — через fcntl.lockf
+на диапазон байт набора. Поэтому add и incr атомарны между воркерами.
+
+Формат набора: WAYS меток (хэшей ключей, 0 — пусто), затем слоты
+<версия><истечение><последнее чтение><длина ключа><длина значения>
+<ключ><значение в pickle>.
+"""
+import errno
+import fcntl
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+MAGIC = b'YTBSHM01'
+HEADER = struct.Struct('8s16s')
+HEADER_SIZE = 64
+WAYS = 8
+TAGS = struct.Struct(f'{WAYS}Q')
+WORD = struct.Struct('Q')
+SLOT = struct.Struct('QdQII')
+ACCESS_OFFSET = 16
+READ_RETRIES = 20
+ZERO_CHUNK = 1024 ** 2
+LOCK_STRIPES = 64
+# (размер слота, число слотов): 8 + 16 + 16 + 16 МБ
+DEFAULT_CLASSES = (
+    (1024, 8192), (8192, 2048), (65536, 256), (524288, 32),
+)
+NEVER = float('inf')
+# Чтение слота не удалось из-за постоянной записи в него
+BUSY = object()
+
+
+def lock_range(file, length, offset):
+    while True:
+        try:
+            fcntl.lockf(file, fcntl.LOCK_EX, length, offset)
+            return
+        except OSError as error:
+            # Ядро ищет взаимоблокировки между процессами, не потоками,
+            # и может ошибиться, пока соседний поток держит свой набор
+            if error.errno != errno.EDEADLK:
+                raise
+            time.sleep(0.001)
+
+
+class SlotClass:
+    """Хэш-таблица слотов одного размера внутри файла."""
+
+    def __init__(self, number, offset, slot_size, slots):
+        self.number = number
+        self.offset = offset
+        self.slot_size = slot_size
+        self.sets = max(slots // WAYS, 1)
+        self.set_size = TAGS.size + WAYS * slot_size
+        self.size = self.sets * self.set_size
+        self.capacity = slot_size - SLOT.size
+
+    def set_index(self, hashed):
+        return hashed % self.sets
+
+    def set_offset(self, hashed):
+        return self.offset + self.set_index(hashed) * self.set_size
+
+    def slot_offset(self, set_offset, way):
+        return set_offset + TAGS.size + way * self.slot_size
+
+
+class SharedMemoryCache(BaseCache):
+    """Кэш в файле, отображённом в память всех процессов.
+
+    LOCATION — путь к файлу (лучше в tmpfs, например /dev/shm).
+    OPTIONS: CLASSES — пары (размер слота, число слотов).
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = location
+        options = params.get('OPTIONS', {})
+        classes = options.get('CLASSES', DEFAULT_CLASSES)
+        self.classes = []
+        offset = HEADER_SIZE
+        for number, (slot_size, slots) in enumerate(sorted(classes)):
+            if slot_size <= SLOT.size + 250:
+                raise ValueError(f'Слот {slot_size} байт не вмещает ключ')
+            slot_class = SlotClass(number, offset, slot_size, slots)
+            self.classes.append(slot_class)
+            offset += slot_class.size
+        self.size = offset
+        self.geometry = hashlib.blake2b(
+            repr([(c.slot_size, c.sets) for c in self.classes]).encode(),
+            digest_size=HEADER.size - len(MAGIC)
+        ).digest()
+        self.pid = None
+        self.attach_lock = threading.Lock()
+
+    def attach(self):
+        """Отображает файл в память; заново — после fork."""
+        if self.pid == os.getpid():
+            return
+        with self.attach_lock:
+            if self.pid == os.getpid():
+                return
+            if self.pid is None:
+                self.open()
+            # Блокировки потоков родителя в дочернем процессе не годятся
+            self.stripes = [threading.Lock() for _ in range(LOCK_STRIPES)]
+            self.pid = os.getpid()
+
+    def open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = os.fdopen(
+            os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666), 'r+b'
+        )
+        header = HEADER.pack(MAGIC, self.geometry)
+        fcntl.lockf(self.file, fcntl.LOCK_EX)
+        try:
+            size = os.fstat(self.file.fileno()).st_size
+            if size != self.size:
+                self.file.truncate(self.size)
+            self.mmap = mmap.mmap(self.file.fileno(), self.size)
+            if self.mmap[:HEADER.size] != header:
+                # Файл с другой разметкой: начинаем с пустого
+                if size:
+                    for start in range(0, self.size, ZERO_CHUNK):
+                        end = min(start + ZERO_CHUNK, self.size)
+                        self.mmap[start:end] = bytes(end - start)
+                self.mmap[:HEADER.size] = header
+        finally:
+            fcntl.lockf(self.file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def address(key):
+        encoded = key.encode()
+        hashed = int.from_bytes(
+            hashlib.blake2b(encoded, digest_size=8).digest(), 'little'
+        )
+        return encoded, hashed or 1
+
+    @contextmanager
+    def locked(self, hashed, classes=None):
+        """Блокирует наборы ключа во всех классах от потоков и процессов."""
+        classes = self.classes if classes is None else classes
+        with ExitStack() as stack:
+            stripes = sorted({
+                (slot_class.set_index(hashed) * len(self.classes)
+                 + slot_class.number) % LOCK_STRIPES
+                for slot_class in classes
+            })
+            for stripe in stripes:
+                stack.enter_context(self.stripes[stripe])
+            # Всегда в порядке классов, поэтому процессы не сцепятся
+            for slot_class in classes:
+                offset = slot_class.set_offset(hashed)
+                lock_range(self.file, slot_class.set_size, offset)
+                stack.callback(
+                    fcntl.lockf, self.file, fcntl.LOCK_UN,
+                    slot_class.set_size, offset
+                )
+            yield
+
+    def read_slot(self, offset, encoded):
+        """(pickle, истечение) из слота без блокировок, None или BUSY."""
+        data = self.mmap
+        for _ in range(READ_RETRIES):
+            seq, expires, _, key_length, value_length = SLOT.unpack_from(
+                data, offset
+            )
+            if seq % 2:
+                continue
+            start = offset + SLOT.size
+            content = data[start:start + key_length + value_length]
+            if WORD.unpack_from(data, offset)[0] != seq:
+                continue
+            if content[:key_length] != encoded:
+                return None
+            return content[key_length:], expires
+        return BUSY
+
+    def read(self, encoded, hashed):
+        """Живая запись ключа или None; при гонке — под блокировкой."""
+        self.attach()
+        data = self.mmap
+        now = time.time()
+        for slot_class in self.classes:
+            set_offset = slot_class.set_offset(hashed)
+            for way, tag in enumerate(TAGS.unpack_from(data, set_offset)):
+                if tag != hashed:
+                    continue
+                offset = slot_class.slot_offset(set_offset, way)
+                entry = self.read_slot(offset, encoded)
+                if entry is BUSY:
+                    with self.locked(hashed):
+                        found = self.find(encoded, hashed)
+                        return found[3] if found else None
+                if entry is None:
+                    continue
+                if entry[1] <= now:
+                    return None
+                # Гонка с записью тут безвредна: это лишь отметка для LRU
+                WORD.pack_into(
+                    data, offset + ACCESS_OFFSET, time.monotonic_ns()
+                )
+                return entry
+        return None
+
+    def find(self, encoded, hashed):
+        """Под блокировкой: (класс, набор, путь, запись) живого ключа."""
+        data = self.mmap
+        now = time.time()
+        for slot_class in self.classes:
+            set_offset = slot_class.set_offset(hashed)
+            for way, tag in enumerate(TAGS.unpack_from(data, set_offset)):
+                if tag != hashed:
+                    continue
+                offset = slot_class.slot_offset(set_offset, way)
+                _, expires, _, key_length, value_length = SLOT.unpack_from(
+                    data, offset
+                )
+                start = offset + SLOT.size
+                if data[start:start + key_length] != encoded:
+                    continue
+                if expires <= now:
+                    self.clear_slot(set_offset, way, offset)
+                    return None
+                value = data[
+                    start + key_length:start + key_length + value_length
+                ]
+                return slot_class, set_offset, way, (value, expires)
+        return None
+
+    def write_slot(self, set_offset, way, offset, hashed, encoded, value,
+                   expires):
+        data = self.mmap
+        seq = WORD.unpack_from(data, offset)[0]
+        WORD.pack_into(data, offset, seq + 1)
+        WORD.pack_into(data, set_offset + way * WORD.size, hashed)
+        SLOT.pack_into(
+            data, offset, seq + 1, expires, time.monotonic_ns(),
+            len(encoded), len(value)
+        )
+        start = offset + SLOT.size
+        data[start:start + len(encoded) + len(value)] = encoded + value
+        WORD.pack_into(data, offset, seq + 2)
+
+    def clear_slot(self, set_offset, way, offset):
+        data = self.mmap
+        seq = WORD.unpack_from(data, offset)[0]
+        WORD.pack_into(data, offset, seq + 1)
+        WORD.pack_into(data, set_offset + way * WORD.size, 0)
+        SLOT.pack_into(data, offset, seq + 1, 0, 0, 0, 0)
+        WORD.pack_into(data, offset, seq + 2)
+
+    def victim(self, slot_class, set_offset):
+        """Путь для новой записи: пустой, истёкший или давно читанный."""
+        now = time.time()
+        oldest = None
+        for way in range(WAYS):
+            offset = slot_class.slot_offset(set_offset, way)
+            _, expires, access, key_length, _ = SLOT.unpack_from(
+                self.mmap, offset
+            )
+            if not key_length or expires <= now:
+                return way
+            if oldest is None or access < oldest[0]:
+                oldest = access, way
+        return oldest[1]
+
+    def put(self, encoded, hashed, value, expires, found):
+        """Под блокировкой: пишет значение в подходящий класс."""
+        size = len(encoded) + len(value)
+        target = next(
+            (c for c in self.classes if c.capacity >= size), None
+        )
+        if found and found[0] is not target:
+            slot_class, set_offset, way, _ = found
+            self.clear_slot(
+                set_offset, way, slot_class.slot_offset(set_offset, way)
+            )
+            found = None
+        if target is None:
+            return False
+        if found:
+            _, set_offset, way, _ = found
+        else:
+            set_offset = target.set_offset(hashed)
+            way = self.victim(target, set_offset)
+        self.write_slot(
+            set_offset, way, target.slot_offset(set_offset, way), hashed,
+            encoded, value, expires
+        )
+        return True
+
+    def expiry(self, timeout):
+        expires = self.get_backend_timeout(timeout)
+        return NEVER if expires is None else expires
+
+    def store(self, key, value, timeout, only_new=False):
+        encoded, hashed = self.address(key)
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        self.attach()
+        with self.locked(hashed):
+            found = self.find(encoded, hashed)
+            if found and only_new:
+                return False
+            return self.put(
+                encoded, hashed, value, self.expiry(timeout), found
+            )
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self.store(key, value, timeout, only_new=True)
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        entry = self.read(*self.address(key))
+        return default if entry is None else pickle.loads(entry[0])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self.store(key, value, timeout)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        encoded, hashed = self.address(key)
+        self.attach()
+        with self.locked(hashed):
+            found = self.find(encoded, hashed)
+            if not found:
+                return False
+            return self.put(
+                encoded, hashed, found[3][0], self.expiry(timeout), found
+            )
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        encoded, hashed = self.address(key)
+        self.attach()
+        with self.locked(hashed):
+            found = self.find(encoded, hashed)
+            if found:
+                slot_class, set_offset, way, _ = found
+                self.clear_slot(
+                    set_offset, way, slot_class.slot_offset(set_offset, way)
+                )
+            return bool(found)
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self.read(*self.address(key)) is not None
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        encoded, hashed = self.address(key)
+        self.attach()
+        with self.locked(hashed):
+            found = self.find(encoded, hashed)
+            if not found:
+                raise ValueError(f"Key '{key}' not found")
+            value, expires = found[3]
+            value = pickle.loads(value) + delta
+            self.put(
+                encoded, hashed, pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                expires, found
+            )
+            return value
+
+    def clear(self):
+        self.attach()
+        for slot_class in self.classes:
+            for index in range(slot_class.sets):
+                set_offset = slot_class.offset + index * slot_class.set_size
+                with self.locked(index, [slot_class]):
+                    tags = TAGS.unpack_from(self.mmap, set_offset)
+                    for way, tag in enumerate(tags):
+                        if tag:
+                            self.clear_slot(
+                                set_offset, way,
+                                slot_class.slot_offset(set_offset, way)
+                            )
@@ -0,0 +1,22 @@
+"""SQLite с транзакциями BEGIN IMMEDIATE на путях записи.
+
+Отложенная транзакция (обычный BEGIN), которая сначала читает, а потом
+пишет, в режиме WAL получает «database is locked» сразу, если другой
+писатель успел закоммитить: busy_timeout такой случай не ждёт.
+Блок core.db.immediate_atomic берёт блокировку записи в начале
+транзакции, и конкурирующие писатели ждут друг друга в пределах
+busy_timeout. Обычный transaction.atomic остаётся отложенным и не
+мешает читающим запросам.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    # Включается на время входа в immediate_atomic
+    begin_immediate = False
+
+    def _start_transaction_under_autocommit(self):
+        if self.begin_immediate:
+            self.cursor().execute('BEGIN IMMEDIATE')
+        else:
+            super()._start_transaction_under_autocommit()
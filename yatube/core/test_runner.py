@@ -0,0 +1,18 @@
+"""Прогон manage.py test с настройками из yatube.test_settings."""
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+from yatube.test_settings import OVERRIDES
+
+
+class TestRunner(DiscoverRunner):
+    """DiscoverRunner, подменяющий настройки на время всего прогона."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.test_settings = override_settings(**OVERRIDES)
+        self.test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_settings.disable()
+        super().teardown_test_environment(**kwargs)
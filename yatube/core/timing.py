@@ -0,0 +1,72 @@
+"""Сбор времени запроса по слоям для заголовка Server-Timing.
+
+ServerTimingMiddleware заводит на время запроса RequestTiming в
+потоке, а инструментированные бэкенды (core.backends) и кэш страниц
+дописывают в него время шаблонов, попадания в кэш и генерацию
+миниатюр. Вне запроса current() возвращает None и запись пропускается.
+"""
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+_local = threading.local()
+
+
+class RequestTiming:
+
+    def __init__(self):
+        self.durations = defaultdict(float)
+        self.counts = defaultdict(int)
+        self.cache = defaultdict(lambda: {'hits': 0, 'misses': 0})
+        self.depth = defaultdict(int)
+
+    def add(self, metric, seconds, count=1):
+        self.durations[metric] += seconds
+        self.counts[metric] += count
+
+    def count_cache(self, name, hits=0, misses=0):
+        self.cache[name]['hits'] += hits
+        self.cache[name]['misses'] += misses
+
+
+def current():
+    return getattr(_local, 'timing', None)
+
+
+@contextmanager
+def collect():
+    """Собирает метрики всего, что выполнится внутри блока."""
+    previous = current()
+    _local.timing = RequestTiming()
+    try:
+        yield _local.timing
+    finally:
+        _local.timing = previous
+
+
+@contextmanager
+def timer(metric):
+    """Добавляет время блока к метрике.
+
+    Вложенные замеры той же метрики (шаблон внутри шаблона) не
+    складываются: учитывается только внешний.
+    """
+    timing = current()
+    if timing is None:
+        yield
+        return
+    timing.depth[metric] += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.depth[metric] -= 1
+        if not timing.depth[metric]:
+            timing.add(metric, time.perf_counter() - started)
+
+
+def count_cache(name, hits=0, misses=0):
+    timing = current()
+    if timing is not None:
+        timing.count_cache(name, hits, misses)
@@ -1,10 +1,24 @@
 from .models import Post, Group, Comment, Follow
+from .search import COMMENT_INDEX, POST_INDEX, match_expression, matching_ids
 
 
 from django.contrib import admin
 
 
-class PostAdmin(admin.ModelAdmin):
+class FullTextSearchMixin:
+    """Поиск по тексту через индекс FTS5, а не LIKE по всей таблице."""
+    search_index = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not match_expression(search_term):
+            return queryset, False
+        return queryset.filter(
+            pk__in=matching_ids(self.search_index, search_term)
+        ), False
+
+
+class PostAdmin(FullTextSearchMixin, admin.ModelAdmin):
+    search_index = POST_INDEX
     list_display = ('pk', 'text', 'pub_date', 'author', 'group', 'image')
     list_editable = ('group',)
     search_fields = ('text',)
@@ -20,7 +34,8 @@ class GroupAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(FullTextSearchMixin, admin.ModelAdmin):
+    search_index = COMMENT_INDEX
     list_display = ('pk', 'post', 'author', 'text', 'created')
     search_fields = ('text',)
     list_filter = ('created',)
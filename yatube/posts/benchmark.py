@@ -0,0 +1,301 @@
+"""Нагрузочный прогон страниц posts с перцентилями задержки.
+
+Каждая страница прогоняется отдельно заданным числом параллельных
+клиентов: через тестовый клиент Django в этом процессе или по HTTP
+к запущенному серверу. Результат — задержки p50/p95/p99 и пропускная
+способность по имени вью; JSON с результатами удобно сравнивать
+между коммитами. С writers параллельно идёт запись (комментарии,
+подписки и отписки) — так видно, как чтение переносит конкурентную
+запись в базу.
+"""
+import random
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from core.db import immediate_atomic
+
+from .models import Comment, Follow, Group, Post, User
+
+PERCENTILES = (50, 95, 99)
+WRITE_SAMPLE_SIZE = 1000
+WRITE_TEXT = 'Комментарий нагрузочного теста'
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    rank = max(-(-len(ordered) * percent // 100), 1)
+    return ordered[rank - 1]
+
+
+def pick_targets():
+    """Адреса всех страниц posts на самых нагруженных объектах.
+
+    Возвращает пользователя, от чьего имени открываются закрытые
+    страницы, и список (имя вью, адрес, нужен ли вход).
+    """
+    author = User.objects.annotate(
+        followers_total=Count('following')
+    ).order_by('-followers_total').first()
+    reader = User.objects.annotate(
+        following_total=Count('follower')
+    ).order_by('-following_total').first()
+    post = Post.objects.filter(author=reader).order_by('-pub_date').first()
+    busiest = Post.objects.order_by('-comment_count', '-pk').first()
+    group = Group.objects.annotate(
+        posts_total=Count('posts')
+    ).order_by('-posts_total').first()
+    targets = [('posts:main_page', reverse('posts:main_page'), False)]
+    if group:
+        targets.append((
+            'posts:group_list',
+            reverse('posts:group_list', args=[group.slug]), False
+        ))
+    if author:
+        targets.append((
+            'posts:profile',
+            reverse('posts:profile', args=[author.username]), False
+        ))
+    if busiest:
+        targets.extend((
+            (
+                'posts:post_detail',
+                reverse('posts:post_detail', args=[busiest.id]), False
+            ),
+            (
+                'posts:comment_list',
+                reverse('posts:comment_list', args=[busiest.id]), False
+            ),
+        ))
+    if reader:
+        targets.extend((
+            ('posts:follow_index', reverse('posts:follow_index'), True),
+            ('posts:post_create', reverse('posts:post_create'), True),
+        ))
+    if post:
+        targets.append((
+            'posts:post_edit',
+            reverse('posts:post_edit', args=[post.id]), True
+        ))
+    return reader, targets
+
+
+class ClientTransport:
+    """Тестовый клиент Django, свой на каждый поток."""
+
+    name = 'client'
+
+    def __init__(self, user=None):
+        self.user = user
+        self.local = threading.local()
+
+    def client(self, login):
+        attr = 'user_client' if login else 'guest_client'
+        client = getattr(self.local, attr, None)
+        if client is None:
+            client = Client()
+            if login:
+                client.force_login(self.user)
+            setattr(self.local, attr, client)
+        return client
+
+    def get(self, url, login=False):
+        return self.client(login).get(url).status_code
+
+
+class HttpTransport:
+    """HTTP-запросы к запущенному серверу с той же базой."""
+
+    name = 'http'
+
+    def __init__(self, base_url, user=None):
+        self.base_url = base_url.rstrip('/')
+        self.cookie = None
+        if user is not None:
+            client = Client()
+            client.force_login(user)
+            self.cookie = '{}={}'.format(
+                settings.SESSION_COOKIE_NAME,
+                client.cookies[settings.SESSION_COOKIE_NAME].value
+            )
+
+    def get(self, url, login=False):
+        request = urllib.request.Request(self.base_url + url)
+        if login and self.cookie:
+            request.add_header('Cookie', self.cookie)
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as error:
+            return error.code
+
+
+def measure(transport, url, login):
+    started = time.perf_counter()
+    try:
+        status = transport.get(url, login)
+    except Exception:
+        status = None
+    return time.perf_counter() - started, status
+
+
+def run_view(transport, url, login, requests, concurrency):
+    """Задержки и статусы requests запросов к одной странице."""
+    started = time.perf_counter()
+    if concurrency == 1:
+        samples = [measure(transport, url, login) for _ in range(requests)]
+    else:
+        with ThreadPoolExecutor(concurrency) as pool:
+            samples = list(pool.map(
+                lambda _: measure(transport, url, login), range(requests)
+            ))
+    return samples, time.perf_counter() - started
+
+
+class Writer(threading.Thread):
+    """Пишет комментарии и переключает подписки, пока идёт чтение."""
+
+    def __init__(self, user_ids, post_ids, stop, seed=None):
+        super().__init__(daemon=True)
+        self.user_ids = user_ids
+        self.post_ids = post_ids
+        self.stop = stop
+        self.random = random.Random(seed)
+        self.samples = []
+
+    @immediate_atomic
+    def write(self):
+        if self.random.random() < 0.5:
+            Comment.objects.create(
+                author_id=self.random.choice(self.user_ids),
+                post_id=self.random.choice(self.post_ids),
+                text=WRITE_TEXT,
+            )
+            return
+        user_id, author_id = self.random.sample(self.user_ids, 2)
+        follow = Follow.objects.filter(
+            user_id=user_id, author_id=author_id
+        ).first()
+        if follow:
+            follow.delete()
+        else:
+            Follow.objects.create(user_id=user_id, author_id=author_id)
+
+    def run(self):
+        try:
+            while not self.stop.is_set():
+                started = time.perf_counter()
+                try:
+                    self.write()
+                    status = 200
+                except DatabaseError:
+                    status = None
+                self.samples.append((time.perf_counter() - started, status))
+        finally:
+            connection.close()
+
+
+def start_writers(count):
+    user_ids = list(User.objects.order_by('-pk').values_list(
+        'pk', flat=True
+    )[:WRITE_SAMPLE_SIZE])
+    post_ids = list(Post.objects.order_by('-pk').values_list(
+        'pk', flat=True
+    )[:WRITE_SAMPLE_SIZE])
+    if len(user_ids) < 2 or not post_ids:
+        return []
+    stop = threading.Event()
+    writers = [
+        Writer(user_ids, post_ids, stop, seed=number)
+        for number in range(count)
+    ]
+    for writer in writers:
+        writer.start()
+    return writers
+
+
+def stop_writers(writers):
+    for writer in writers:
+        writer.stop.set()
+    for writer in writers:
+        writer.join()
+    return [sample for writer in writers for sample in writer.samples]
+
+
+def summarize(samples, wall_time):
+    latencies = [latency for latency, _ in samples]
+    summary = {
+        'requests': len(samples),
+        'errors': sum(
+            1 for _, status in samples
+            if status is None or status >= 400
+        ),
+        'mean_ms': sum(latencies) / len(latencies) * 1000,
+        'rps': len(samples) / wall_time,
+    }
+    for percent in PERCENTILES:
+        summary[f'p{percent}_ms'] = percentile(latencies, percent) * 1000
+    return summary
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(transport, targets, requests, concurrency, warmup=0, writers=0,
+        log=None):
+    views = {}
+    writer_threads = start_writers(writers) if writers else []
+    started = time.perf_counter()
+    try:
+        for view_name, url, login in targets:
+            for _ in range(warmup):
+                measure(transport, url, login)
+            samples, wall_time = run_view(
+                transport, url, login, requests, concurrency
+            )
+            views[view_name] = dict(url=url, **summarize(samples, wall_time))
+            if log:
+                log(view_name, views[view_name])
+    finally:
+        writes = stop_writers(writer_threads)
+    result = {
+        'meta': {
+            'commit': current_commit(),
+            'created': timezone.now().isoformat(),
+            'transport': transport.name,
+            'requests': requests,
+            'concurrency': concurrency,
+            'warmup': warmup,
+            'writers': len(writer_threads),
+        },
+        'views': views,
+    }
+    if connection.vendor == 'sqlite':
+        result['meta']['sqlite_pragmas'] = settings.SQLITE_PRAGMAS
+    if writes:
+        result['writes'] = summarize(
+            writes, time.perf_counter() - started
+        )
+        if log:
+            log('writes', result['writes'])
+    return result
@@ -0,0 +1,66 @@
+"""Кэш отрендеренных карточек постов для лент.
+
+Ключ карточки включает id поста, время его изменения, число
+комментариев, вариант показа и отпечаток имени автора и названия
+группы, поэтому правка поста, профиля или группы сразу даёт новый
+ключ. Страница ленты достаёт все карточки одним get_many и
+рендерит только промахи.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+from .const import CARD_CACHE_TIME
+
+CARD_TEMPLATE = 'posts/includes/post_form.html'
+CARD_KEY = 'card:{id}:{updated}:{comments}:{variant}:{labels}'
+VARIANTS = (
+    (False, False),
+    (True, False),
+    (False, True),
+    (True, True),
+)
+
+
+def labels(post, dont_show_author, dont_show_group):
+    """Отпечаток подписей автора и группы, которые выводит карточка."""
+    shown = []
+    if not dont_show_author:
+        shown += [post.author.username, post.author.get_full_name()]
+    if not dont_show_group and post.group_id:
+        shown += [post.group.slug, post.group.title]
+    return hashlib.md5('\n'.join(shown).encode()).hexdigest()
+
+
+def card_key(post, dont_show_author=False, dont_show_group=False):
+    return CARD_KEY.format(
+        id=post.id,
+        updated=post.updated.timestamp(),
+        comments=post.comment_count,
+        variant=f'{int(dont_show_author)}{int(dont_show_group)}',
+        labels=labels(post, dont_show_author, dont_show_group),
+    )
+
+
+def render_cards(posts, dont_show_author=False, dont_show_group=False):
+    """HTML карточек постов в порядке posts."""
+    keys = [
+        card_key(post, dont_show_author, dont_show_group) for post in posts
+    ]
+    cards = cache.get_many(keys)
+    missing = {
+        key: render_to_string(CARD_TEMPLATE, {
+            'post': post,
+            'dont_show_author': dont_show_author,
+            'dont_show_group': dont_show_group,
+        })
+        for key, post in zip(keys, posts) if key not in cards
+    }
+    cache.set_many(missing, CARD_CACHE_TIME)
+    cards.update(missing)
+    return [cards[key] for key in keys]
+
+
+def invalidate_cards(post):
+    cache.delete_many([card_key(post, *variant) for variant in VARIANTS])
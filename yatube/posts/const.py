@@ -1,2 +1,34 @@
 POSTS_FOR_PAGE = 10
-CACHE_TIME = 20
+CACHE_TIME = 60 * 60 * 4
+MAX_OFFSET_PAGES = 10
+INBOX_BATCH_SIZE = 1000
+FEED_ENGINE_INBOX = 'inbox'
+FEED_ENGINE_TIMELINE = 'timeline'
+TIMELINE_LENGTH = 1000
+TIMELINE_CACHE_TIME = 60 * 60 * 24
+FOLLOW_GRAPH_CACHE_TIME = 60 * 60 * 24
+TIMELINE_AUTHORS_PER_QUERY = 500
+STATS_BATCH_SIZE = 1000
+COMMENTS_FOR_PAGE = 20
+CACHE_STALE_TIME = 60
+CACHE_LOCK_TIMEOUT = 30
+CACHE_LOCK_WAIT = 5
+CARD_CACHE_TIME = 60 * 60 * 24
+POST_IMAGE_SIZE = (960, 339)
+POST_IMAGE_WIDTHS = (480, 720, 960)
+POST_IMAGE_FORMATS = ('WEBP',)
+POST_IMAGE_SIZES = '(max-width: 960px) 100vw, 960px'
+POST_IMAGE_OPTIONS = {'crop': 'center', 'upscale': True}
+POST_IMAGE_CACHE_TIME = 60 * 60 * 24
+TAG_MAX_LENGTH = 50
+TAG_BATCH_SIZE = 1000
+RELATED_POSTS_COUNT = 5
+RELATED_BLOCK_SIZE = 500
+RELATED_MIN_WORD_LENGTH = 3
+RELATED_MAX_DOCUMENT_FREQUENCY = 0.5
+RELATED_MAX_POSTINGS = 200
+RELATED_CANDIDATES = 50
+SUGGESTIONS_COUNT = 5
+SUGGESTION_BLOCK_SIZE = 1000
+SUGGESTION_MAX_FANOUT = 1000
+SUGGESTION_COFOLLOW_WEIGHT = 0.5
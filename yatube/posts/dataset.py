@@ -0,0 +1,222 @@
+"""Синтетический набор данных для нагрузочного тестирования.
+
+Пользователи, группы, подписки, посты и комментарии создаются через
+bulk_create пачками, поэтому сигналы не срабатывают: счётчики, ленты
+подписок и кэш пересобираются один раз в конце.
+Популярность и активность авторов подчиняются степенному закону
+(закон Ципфа): немногие авторы собирают большую часть подписчиков,
+и немногие пишут большую часть постов, как в настоящих соцсетях.
+"""
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+
+from . import inbox, stats
+from .const import FEED_ENGINE_INBOX
+from .models import Comment, Follow, Group, Post, User
+from .utils import batched
+
+USERNAME_TEMPLATE = 'bench-{number}'
+SLUG_TEMPLATE = 'bench-{number}'
+TEXT_POOL_SIZE = 1000
+GROUP_SHARE = 0.5
+
+
+def bulk_create(model, objects, batch_size, **kwargs):
+    for batch in batched(objects, batch_size):
+        model.objects.bulk_create(batch, **kwargs)
+
+
+def zipf_cum_weights(size, alpha):
+    """Накопленные веса рангов 1..size для random.choices."""
+    return list(accumulate(1 / rank ** alpha for rank in range(1, size + 1)))
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Отключает auto_now_add, чтобы задать даты в прошлом."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def last_id(model):
+    return model.objects.aggregate(last=Max('id'))['last'] or 0
+
+
+class DatasetGenerator:
+
+    def __init__(self, users, posts, groups, comments, follows,
+                 batch_size=5000, days=365, alpha=1.1, seed=None):
+        self.users = users
+        self.posts = posts
+        self.groups = groups
+        self.comments = comments
+        self.follows = follows
+        self.batch_size = batch_size
+        self.alpha = alpha
+        self.random = random.Random(seed)
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(seed)
+        self.now = timezone.now()
+        self.period = timedelta(days=days).total_seconds()
+        self.texts = [
+            self.fake.paragraph(nb_sentences=self.random.randint(1, 6))
+            for _ in range(TEXT_POOL_SIZE)
+        ]
+
+    def past_date(self):
+        return self.now - timedelta(
+            seconds=self.random.uniform(0, self.period)
+        )
+
+    def ascending_dates(self, count):
+        """count дат в прошлом по возрастанию.
+
+        Период делится на отрезки по пачкам, даты сортируются внутри
+        пачки, поэтому в памяти держится не больше batch_size дат.
+        """
+        step = self.period / max(count, 1)
+        for start in range(0, count, self.batch_size):
+            size = min(self.batch_size, count - start)
+            offsets = sorted(
+                self.random.uniform(start, start + size) * step
+                for _ in range(size)
+            )
+            for offset in offsets:
+                yield self.now - timedelta(seconds=self.period - offset)
+
+    def text(self):
+        return self.random.choice(self.texts)
+
+    def create_users(self):
+        start = last_id(User)
+        password = make_password(None)
+        bulk_create(User, (
+            User(
+                username=USERNAME_TEMPLATE.format(number=start + number),
+                first_name=self.fake.first_name(),
+                last_name=self.fake.last_name(),
+                password=password,
+            )
+            for number in range(1, self.users + 1)
+        ), self.batch_size)
+        user_ids = list(User.objects.filter(id__gt=start).order_by(
+            'id'
+        ).values_list('id', flat=True))
+        # Ранги популярности и активности не связаны ни с порядком
+        # регистрации, ни друг с другом: иначе самые читаемые авторы
+        # писали бы и больше всех, и ленты подписок раздувались бы
+        self.cum_weights = zipf_cum_weights(len(user_ids), self.alpha)
+        self.ranked = self.random.sample(user_ids, len(user_ids))
+        self.active = self.random.sample(user_ids, len(user_ids))
+
+    def popular_users(self, count):
+        return self.random.choices(
+            self.ranked, cum_weights=self.cum_weights, k=count
+        )
+
+    def active_users(self, count):
+        """Авторы по активности: выбираются пачками, а не списком на count."""
+        for start in range(0, count, self.batch_size):
+            yield from self.random.choices(
+                self.active, cum_weights=self.cum_weights,
+                k=min(self.batch_size, count - start)
+            )
+
+    def create_groups(self):
+        start = last_id(Group)
+        bulk_create(Group, (
+            Group(
+                title=self.fake.sentence(nb_words=3)[:200],
+                slug=SLUG_TEMPLATE.format(number=start + number),
+                description=self.text(),
+            )
+            for number in range(1, self.groups + 1)
+        ), self.batch_size)
+        self.group_ids = list(Group.objects.filter(
+            id__gt=start
+        ).values_list('id', flat=True))
+
+    def follow_pairs(self):
+        for user_id in self.ranked:
+            count = min(
+                int(self.random.expovariate(1 / self.follows)),
+                len(self.ranked) - 1
+            )
+            authors = set(self.popular_users(count))
+            authors.discard(user_id)
+            for author_id in authors:
+                yield Follow(user_id=user_id, author_id=author_id)
+
+    def create_follows(self):
+        if self.follows:
+            bulk_create(
+                Follow, self.follow_pairs(), self.batch_size,
+                ignore_conflicts=True
+            )
+
+    def post_objects(self):
+        # pub_date растёт вместе с id, как у постов, созданных через сайт
+        dates = self.ascending_dates(self.posts)
+        for author_id, pub_date in zip(self.active_users(self.posts), dates):
+            group_id = None
+            if self.group_ids and self.random.random() < GROUP_SHARE:
+                group_id = self.random.choice(self.group_ids)
+            yield Post(
+                author_id=author_id,
+                group_id=group_id,
+                text=self.text(),
+                pub_date=pub_date,
+            )
+
+    def create_posts(self):
+        start = last_id(Post)
+        with explicit_dates(Post._meta.get_field('pub_date')):
+            bulk_create(Post, self.post_objects(), self.batch_size)
+        self.post_range = (start + 1, last_id(Post))
+
+    def comment_objects(self):
+        first, last = self.post_range
+        for author_id in self.active_users(self.comments):
+            yield Comment(
+                author_id=author_id,
+                post_id=self.random.randint(first, last),
+                text=self.text(),
+                created=self.past_date(),
+            )
+
+    def create_comments(self):
+        if self.comments and self.post_range[1] >= self.post_range[0]:
+            with explicit_dates(Comment._meta.get_field('created')):
+                bulk_create(Comment, self.comment_objects(), self.batch_size)
+
+    def finish(self):
+        stats.recount()
+        if settings.FOLLOW_FEED_ENGINE == FEED_ENGINE_INBOX:
+            inbox.rebuild()
+        cache.clear()
+
+    def generate(self, log=lambda message: None):
+        for step, message in (
+            (self.create_users, 'Пользователи'),
+            (self.create_groups, 'Группы'),
+            (self.create_follows, 'Подписки'),
+            (self.create_posts, 'Посты'),
+            (self.create_comments, 'Комментарии'),
+            (self.finish, 'Счётчики, ленты и кэш'),
+        ):
+            step()
+            log(f'{message}: готово')
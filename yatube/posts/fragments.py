@@ -0,0 +1,129 @@
+"""Персональные фрагменты закэшированных страниц.
+
+Страница, которую кэширует cache_feed, рендерится один раз на всех:
+вместо персональных частей (шапка, вкладки, кнопки подписки и
+редактирования, рекомендации, форма комментария) в неё попадают
+маркеры. При отдаче маркеры заменяются фрагментами, отрендеренными
+для текущего пользователя, поэтому из кэша обслуживаются и
+авторизованные запросы.
+"""
+import re
+import threading
+from contextlib import contextmanager
+
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .forms import CommentForm
+from . import graph
+from .const import SUGGESTIONS_COUNT
+from .models import FollowSuggestion, UserStats
+from .stats import get_stats
+
+MARKER = '<!--fragment:{name}{args}-->'
+MARKER_RE = re.compile(r'<!--fragment:(\w+)((?::[^:>]*)*)-->')
+
+_state = threading.local()
+
+
+def follow_button_context(request, username, author_id):
+    authenticated = request.user.is_authenticated
+    return {
+        'author_username': username,
+        'following': authenticated and graph.is_following(
+            request.user.pk, int(author_id)
+        ),
+        'follows_you': authenticated and graph.is_following(
+            int(author_id), request.user.pk
+        ),
+    }
+
+
+def suggestions_context(request):
+    if not request.user.is_authenticated:
+        return {'suggestions': ()}
+    suggestions = list(FollowSuggestion.objects.filter(
+        user=request.user
+    ).select_related('author').order_by('-score')[:SUGGESTIONS_COUNT])
+    if not suggestions:
+        return {'suggestions': ()}
+    # Тот же счётчик подписчиков, что в профиле
+    followers = dict(UserStats.objects.filter(user__in=[
+        suggestion.author_id for suggestion in suggestions
+    ]).values_list('user_id', 'followers'))
+    for suggestion in suggestions:
+        suggestion.followers = followers.get(suggestion.author_id)
+        if suggestion.followers is None:
+            suggestion.followers = get_stats(suggestion.author).followers
+    return {'suggestions': suggestions}
+
+
+FRAGMENTS = {
+    'header': (
+        'includes/header.html',
+        lambda request: {},
+    ),
+    'switcher': (
+        'posts/includes/switcher.html',
+        lambda request, tab: {tab: True},
+    ),
+    'follow_button': (
+        'posts/includes/follow_button.html',
+        follow_button_context,
+    ),
+    'edit_button': (
+        'posts/includes/edit_button.html',
+        lambda request, post_id, author_id: {
+            'post_id': post_id,
+            'is_author': str(request.user.pk) == author_id,
+        },
+    ),
+    'suggestions': (
+        'posts/includes/suggestions.html',
+        suggestions_context,
+    ),
+    'comment_form': (
+        'posts/includes/comment_form.html',
+        lambda request, post_id: {'post_id': post_id, 'form': CommentForm()},
+    ),
+}
+
+
+@contextmanager
+def shared_render():
+    """Вью внутри блока рендерит общую копию страницы с маркерами.
+
+    Флаг живёт в потоке только на время блока, поэтому его не унаследует
+    обработчик ошибки, если вью упадёт.
+    """
+    previous = getattr(_state, 'shared', False)
+    _state.shared = True
+    try:
+        yield
+    finally:
+        _state.shared = previous
+
+
+def is_shared_render():
+    return getattr(_state, 'shared', False)
+
+
+def render_fragment(request, name, *args):
+    template, get_context = FRAGMENTS[name]
+    return render_to_string(template, get_context(request, *args), request)
+
+
+def marker(name, *args):
+    return mark_safe(MARKER.format(
+        name=name, args=''.join(f':{arg}' for arg in args)
+    ))
+
+
+def inject(request, content):
+    """Заменяет маркеры фрагментами для пользователя запроса."""
+    return MARKER_RE.sub(
+        lambda match: render_fragment(
+            request, match[1], *match[2].split(':')[1:]
+        ),
+        content
+    )
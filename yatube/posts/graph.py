@@ -0,0 +1,192 @@
+"""Граф подписок в компактных массивах.
+
+Для пакетных расчётов граф целиком загружается в CSR: для каждого
+направления — подписки и подписчики — хранятся два массива:
+offsets[user_id] указывает начало отрезка пользователя в массиве
+соседей, offsets[user_id + 1] — его конец. Соседи внутри отрезка
+отсортированы по id. На ребро уходит 4 байта в каждом направлении
+против сотни с лишним у кортежа в множестве, поэтому граф из
+миллионов подписок помещается в десятки мегабайт. Рёбра читаются
+потоком в порядке индекса (user, author); обратное направление
+строится подсчётом без промежуточных списков.
+
+Для запросов страниц в общем кэше лежат подписки каждого
+пользователя тем же отсортированным массивом: «подписан ли я» и
+«читает ли он меня» отвечаются без SQL. Сигналы Follow удаляют массив
+подписчика сразу и ещё раз после коммита, чтобы не осталась копия,
+прочитанная до коммита; промахи дочитываются из базы, а команда
+rebuild_follow_graph заполняет кэш целиком. Число подписчиков берётся
+из UserStats.
+"""
+from array import array
+from bisect import bisect_left
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Max
+
+from .const import FOLLOW_GRAPH_CACHE_TIME, INBOX_BATCH_SIZE
+from .models import Follow, User
+from .utils import batched
+
+ID_TYPE = 'i'
+OFFSET_TYPE = 'q'
+FOLLOWING_KEY = 'follow-graph:following:{user_id}'
+
+
+def zeros(typecode, size):
+    return array(typecode, bytes(array(typecode).itemsize * size))
+
+
+def prefix_sums(counts):
+    """Счётчики в offsets[id + 1] превращаются в начала отрезков."""
+    for index in range(1, len(counts)):
+        counts[index] += counts[index - 1]
+
+
+class FollowGraph:
+    """Подписки и подписчики всех пользователей в массивах CSR."""
+
+    def __init__(self, following_offsets, following,
+                 follower_offsets, followers):
+        self.following_offsets = following_offsets
+        self.following_ids = following
+        self.follower_offsets = follower_offsets
+        self.follower_ids = followers
+
+    @property
+    def size(self):
+        return len(self.following_offsets) - 1
+
+    @classmethod
+    def load(cls, chunk_size=INBOX_BATCH_SIZE):
+        size = (User.objects.aggregate(Max('id'))['id__max'] or 0) + 1
+        following_offsets = zeros(OFFSET_TYPE, size + 1)
+        follower_offsets = zeros(OFFSET_TYPE, size + 1)
+        following = array(ID_TYPE)
+        rows = Follow.objects.filter(
+            user_id__lt=size, author_id__lt=size
+        ).order_by('user_id', 'author_id').values_list(
+            'user_id', 'author_id'
+        ).iterator(chunk_size)
+        for user_id, author_id in rows:
+            following.append(author_id)
+            following_offsets[user_id + 1] += 1
+            follower_offsets[author_id + 1] += 1
+        prefix_sums(following_offsets)
+        prefix_sums(follower_offsets)
+        # Рёбра идут по возрастанию user_id, поэтому подписчики каждого
+        # автора тоже ложатся в отрезок по возрастанию
+        graph = cls(
+            following_offsets, following,
+            follower_offsets, zeros(ID_TYPE, len(following))
+        )
+        positions = array(OFFSET_TYPE, follower_offsets)
+        for user_id in range(size):
+            for author_id in graph.following(user_id):
+                graph.follower_ids[positions[author_id]] = user_id
+                positions[author_id] += 1
+        return graph
+
+    def following(self, user_id):
+        if not 0 <= user_id < self.size:
+            return array(ID_TYPE)
+        return self.following_ids[
+            self.following_offsets[user_id]:
+            self.following_offsets[user_id + 1]
+        ]
+
+    def followers(self, user_id):
+        if not 0 <= user_id < self.size:
+            return array(ID_TYPE)
+        return self.follower_ids[
+            self.follower_offsets[user_id]:
+            self.follower_offsets[user_id + 1]
+        ]
+
+    def follower_count(self, user_id):
+        if not 0 <= user_id < self.size:
+            return 0
+        return (
+            self.follower_offsets[user_id + 1]
+            - self.follower_offsets[user_id]
+        )
+
+
+def following_key(user_id):
+    return FOLLOWING_KEY.format(user_id=user_id)
+
+
+def to_array(data):
+    ids = array(ID_TYPE)
+    ids.frombytes(data)
+    return ids
+
+
+def contains(ids, value):
+    index = bisect_left(ids, value)
+    return index < len(ids) and ids[index] == value
+
+
+def load_following(user_ids):
+    """Массивы подписок пользователей; промахи кэша дочитываются."""
+    keys = {following_key(user_id): user_id for user_id in user_ids}
+    cached = cache.get_many(keys)
+    result = {keys[key]: to_array(data) for key, data in cached.items()}
+    missing = {keys[key]: array(ID_TYPE) for key in keys.keys() - cached}
+    if missing:
+        # Массив живёт в кэше сутки, поэтому читаем не с реплики
+        rows = Follow.objects.using(DEFAULT_DB_ALIAS).filter(
+            user_id__in=missing
+        ).order_by('user_id', 'author_id').values_list('user_id', 'author_id')
+        for user_id, author_id in rows:
+            missing[user_id].append(author_id)
+        cache.set_many({
+            following_key(user_id): ids.tobytes()
+            for user_id, ids in missing.items()
+        }, FOLLOW_GRAPH_CACHE_TIME)
+        result.update(missing)
+    return result
+
+
+def following(user_id):
+    return load_following([user_id])[user_id]
+
+
+def is_following(user_id, author_id):
+    return contains(following(user_id), author_id)
+
+
+def invalidate(follow):
+    """Сбрасывает закэшированный массив подписок подписчика."""
+    key = following_key(follow.user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def rebuild(chunk_size=INBOX_BATCH_SIZE):
+    """Заполняет кэш подписками из базы, возвращает число подписок.
+
+    Пользователи идут пачками по id, подписки пачки читаются потоком
+    по индексу (user, author): в памяти держится одна пачка, а массивы
+    пишутся только существующим пользователям.
+    """
+    total = 0
+    user_ids = User.objects.order_by('id').values_list(
+        'id', flat=True
+    ).iterator(chunk_size)
+    for block in batched(user_ids, chunk_size):
+        arrays = {user_id: array(ID_TYPE) for user_id in block}
+        rows = Follow.objects.filter(
+            user_id__gte=block[0], user_id__lte=block[-1]
+        ).order_by('user_id', 'author_id').values_list(
+            'user_id', 'author_id'
+        ).iterator(chunk_size)
+        for user_id, author_id in rows:
+            arrays[user_id].append(author_id)
+            total += 1
+        cache.set_many({
+            following_key(user_id): ids.tobytes()
+            for user_id, ids in arrays.items()
+        }, FOLLOW_GRAPH_CACHE_TIME)
+    return total
@@ -0,0 +1,64 @@
+from django.db import transaction
+
+from .const import INBOX_BATCH_SIZE
+from .models import Follow, InboxEntry, Post
+from .utils import batched
+
+
+def insert(entries):
+    # Пачки собираем сами: bulk_create превращает генератор в список
+    # целиком, а явный batch_size в Django 2.2 не ограничивается
+    # лимитом SQLite на 500 SELECT в одном INSERT
+    for batch in batched(entries, INBOX_BATCH_SIZE):
+        InboxEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    insert(
+        InboxEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+        for user_id in Follow.objects.filter(
+            author_id=post.author_id
+        ).values_list('user_id', flat=True).iterator()
+    )
+
+
+def backfill(follow):
+    """Добавляет посты автора в ленту нового подписчика."""
+    insert(
+        InboxEntry(user_id=follow.user_id, post_id=post_id,
+                   pub_date=pub_date)
+        for post_id, pub_date in Post.objects.filter(
+            author_id=follow.author_id
+        ).values_list('id', 'pub_date').iterator()
+    )
+
+
+def prune(follow):
+    """Убирает посты автора из ленты отписавшегося пользователя."""
+    InboxEntry.objects.filter(
+        user_id=follow.user_id, post__author_id=follow.author_id
+    ).delete()
+
+
+def rebuild():
+    """Пересобирает все ленты подписок из Follow и Post.
+
+    Возвращает количество созданных записей.
+    """
+    rows = Post.objects.filter(
+        author__following__isnull=False
+    ).values_list('author__following__user_id', 'id', 'pub_date')
+    with transaction.atomic():
+        InboxEntry.objects.all().delete()
+        created = 0
+        batch = []
+        for user_id, post_id, pub_date in rows.iterator(INBOX_BATCH_SIZE):
+            batch.append(InboxEntry(
+                user_id=user_id, post_id=post_id, pub_date=pub_date
+            ))
+            if len(batch) == INBOX_BATCH_SIZE:
+                created += len(InboxEntry.objects.bulk_create(batch))
+                batch = []
+        created += len(InboxEntry.objects.bulk_create(batch))
+    return created
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from posts import tags
+from posts.const import TAG_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Разбирает хэштеги всех постов в индекс тегов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=TAG_BATCH_SIZE,
+            help='Постов в одной пачке'
+        )
+
+    def handle(self, *args, **options):
+        links = tags.backfill(options['chunk_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Тегов у постов: {links}')
+        )
@@ -0,0 +1,88 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.benchmark import (
+    PERCENTILES, ClientTransport, HttpTransport, pick_targets, run
+)
+
+
+class Command(BaseCommand):
+    help = 'Нагрузочный прогон страниц posts: перцентили и пропускная'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument(
+            '--warmup', type=int, default=5,
+            help='Запросов на прогрев перед замером каждой страницы'
+        )
+        parser.add_argument(
+            '--writers', type=int, default=0,
+            help='Потоков, которые параллельно пишут в базу'
+        )
+        parser.add_argument(
+            '--url', default=None,
+            help='Адрес запущенного сервера; без него — тестовый клиент'
+        )
+        parser.add_argument(
+            '--views', nargs='*', default=None,
+            help='Только эти вью, например posts:main_page'
+        )
+        parser.add_argument(
+            '--output', default=None, help='Сохранить результат в JSON'
+        )
+        parser.add_argument(
+            '--compare', default=None,
+            help='JSON прошлого прогона для сравнения p95'
+        )
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('Нужны хотя бы один запрос и один клиент')
+        user, targets = pick_targets()
+        if options['views']:
+            targets = [
+                target for target in targets
+                if target[0] in options['views']
+            ]
+        if not targets:
+            raise CommandError('Нечего прогонять')
+        if options['url']:
+            transport = HttpTransport(options['url'], user)
+        else:
+            transport = ClientTransport(user)
+        result = run(
+            transport, targets, options['requests'], options['concurrency'],
+            options['warmup'], options['writers'], log=self.log_view,
+        )
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(result, output, ensure_ascii=False, indent=2)
+        if options['compare']:
+            with open(options['compare']) as previous:
+                self.compare(json.load(previous), result)
+
+    def log_view(self, view_name, summary):
+        percentiles = ' '.join(
+            f'p{percent} {summary[f"p{percent}_ms"]:.1f} мс'
+            for percent in PERCENTILES
+        )
+        self.stdout.write(
+            f'{view_name}: {percentiles}, {summary["rps"]:.1f} запр/с, '
+            f'ошибок {summary["errors"]}'
+        )
+
+    def compare(self, previous, current):
+        self.stdout.write(
+            f'Сравнение с {previous["meta"].get("commit") or "прошлым"}:'
+        )
+        for view_name, summary in current['views'].items():
+            before = previous['views'].get(view_name)
+            if before is None:
+                continue
+            change = summary['p95_ms'] / before['p95_ms'] - 1
+            self.stdout.write(
+                f'  {view_name}: p95 {before["p95_ms"]:.1f} → '
+                f'{summary["p95_ms"]:.1f} мс ({change:+.0%})'
+            )
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from posts import related
+from posts.const import RELATED_POSTS_COUNT
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает похожие посты по векторам TF-IDF'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Пересобрать векторы и списки всех постов'
+        )
+        parser.add_argument(
+            '--count', type=int, default=RELATED_POSTS_COUNT,
+            help='Похожих постов на пост'
+        )
+
+    def handle(self, *args, **options):
+        vectors, lists = related.build(options['full'], options['count'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Векторов пересчитано: {vectors}, списков похожих: {lists}'
+        ))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from posts import suggestions
+from posts.const import SUGGESTION_BLOCK_SIZE, SUGGESTIONS_COUNT
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рекомендации «кого почитать» по графу подписок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--count', type=int, default=SUGGESTIONS_COUNT,
+            help='Рекомендаций на пользователя'
+        )
+        parser.add_argument(
+            '--block-size', type=int, default=SUGGESTION_BLOCK_SIZE,
+            help='Пользователей в одной пачке записи'
+        )
+
+    def handle(self, *args, **options):
+        stored = suggestions.build(options['count'], options['block_size'])
+        self.stdout.write(self.style.SUCCESS(f'Рекомендаций: {stored}'))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.dataset import DatasetGenerator
+
+
+class Command(BaseCommand):
+    help = 'Создаёт синтетический набор данных для нагрузочных тестов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument(
+            '--follows', type=float, default=20,
+            help='Среднее число подписок на пользователя'
+        )
+        parser.add_argument(
+            '--alpha', type=float, default=1.1,
+            help='Показатель степенного закона популярности авторов'
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней распределить даты публикаций'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['batch_size'] < 1:
+            raise CommandError('Нужны хотя бы один пользователь и пачка')
+        DatasetGenerator(
+            users=options['users'],
+            posts=options['posts'],
+            groups=options['groups'],
+            comments=options['comments'],
+            follows=options['follows'],
+            batch_size=options['batch_size'],
+            days=options['days'],
+            alpha=options['alpha'],
+            seed=options['seed'],
+        ).generate(log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS('Набор данных создан'))
@@ -0,0 +1,65 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts.models import Post
+from posts.thumbnails import cached, generate, refresh_pages
+
+
+def generate_file(name):
+    """Миниатюра одной картинки: (имя, ошибка или None)."""
+    try:
+        generate(name)
+    except Exception as error:
+        return name, repr(error)
+    # sorl не бросает исключение, если исходник не читается
+    if not cached(name):
+        return name, 'не удалось прочитать исходный файл'
+    return name, None
+
+
+class Command(BaseCommand):
+    help = 'Генерирует недостающие миниатюры картинок постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Процессов для ресайза'
+        )
+        parser.add_argument('--chunk-size', type=int, default=16)
+
+    def handle(self, *args, **options):
+        names = Post.objects.exclude(image='').values_list(
+            'image', flat=True
+        ).distinct().iterator()
+        missing = [name for name in names if not cached(name)]
+        self.stdout.write(f'Без миниатюр: {len(missing)}')
+        if not missing:
+            return
+        if options['workers'] <= 1:
+            done, failed = self.collect(map(generate_file, missing))
+        else:
+            # Дочерним процессам нельзя делить соединения родителя
+            connections.close_all()
+            with ProcessPoolExecutor(
+                options['workers'],
+                mp_context=multiprocessing.get_context('fork'),
+            ) as pool:
+                done, failed = self.collect(pool.map(
+                    generate_file, missing, chunksize=options['chunk_size']
+                ))
+        refresh_pages(done)
+        self.stdout.write(f'Готово: {len(done)}, ошибок: {failed}')
+
+    def collect(self, results):
+        done, failed = [], 0
+        for name, error in results:
+            if error:
+                failed += 1
+                self.stderr.write(f'{name}: {error}')
+            else:
+                done.append(name)
+        return done, failed
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from posts import graph
+from posts.const import INBOX_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Заполняет кэш подписок пользователей из Follow'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=INBOX_BATCH_SIZE,
+            help='Строк Follow и пользователей в одной пачке'
+        )
+
+    def handle(self, *args, **options):
+        follows = graph.rebuild(options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Подписок в кэше: {follows}'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts import inbox
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает ленты подписок из Follow и Post'
+
+    def handle(self, *args, **options):
+        created = inbox.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f'Записей в лентах подписок: {created}')
+        )
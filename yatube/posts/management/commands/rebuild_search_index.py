@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts.search import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовые индексы постов и комментариев'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--optimize', action='store_true',
+            help='Слить сегменты индекса после перестройки'
+        )
+
+    def handle(self, *args, **options):
+        rebuild(optimize=options['optimize'])
+        self.stdout.write('Индексы поиска перестроены')
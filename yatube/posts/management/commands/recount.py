@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts import stats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики профилей пользователей'
+
+    def handle(self, *args, **options):
+        recounted = stats.recount()
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересчитано профилей: {recounted}')
+        )
@@ -0,0 +1,53 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:33
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_inbox(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    InboxEntry = apps.get_model('posts', 'InboxEntry')
+    InboxEntry.objects.bulk_create(
+        (
+            InboxEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for user_id, post_id, pub_date in Post.objects.filter(
+                author__following__isnull=False
+            ).values_list(
+                'author__following__user_id', 'id', 'pub_date'
+            ).iterator()
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0010_auto_20261018_0331'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InboxEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inbox_entries', to='posts.Post', verbose_name='пост')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inbox', to=settings.AUTH_USER_MODEL, verbose_name='подписчик')),
+            ],
+            options={
+                'verbose_name': 'запись ленты подписок',
+                'verbose_name_plural': 'Ленты подписок',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='inboxentry',
+            index=models.Index(fields=['user', '-pub_date', '-post'], name='inbox_user_pub_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='inboxentry',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='inbox_user_post_constraint'),
+        ),
+        migrations.RunPython(fill_inbox, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+from django.db import migrations
+
+# Внешние (external content) индексы FTS5: текст хранится только в
+# исходной таблице, триггеры обновляют индекс при любой записи
+INDEX_SQL = '''
+CREATE VIRTUAL TABLE {table}_fts USING fts5(
+    text, content='{table}', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+CREATE TRIGGER {table}_fts_insert AFTER INSERT ON {table} BEGIN
+    INSERT INTO {table}_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER {table}_fts_delete AFTER DELETE ON {table} BEGIN
+    INSERT INTO {table}_fts ({table}_fts, rowid, text)
+    VALUES ('delete', old.id, old.text);
+END;
+CREATE TRIGGER {table}_fts_update AFTER UPDATE OF text ON {table}
+WHEN old.text IS NOT new.text BEGIN
+    INSERT INTO {table}_fts ({table}_fts, rowid, text)
+    VALUES ('delete', old.id, old.text);
+    INSERT INTO {table}_fts (rowid, text) VALUES (new.id, new.text);
+END;
+INSERT INTO {table}_fts ({table}_fts) VALUES ('rebuild');
+'''
+DROP_SQL = '''
+DROP TRIGGER {table}_fts_update;
+DROP TRIGGER {table}_fts_delete;
+DROP TRIGGER {table}_fts_insert;
+DROP TABLE {table}_fts;
+'''
+
+
+def search_index(table):
+    return migrations.RunSQL(
+        INDEX_SQL.format(table=table), DROP_SQL.format(table=table)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_feed_indexes'),
+    ]
+
+    operations = [
+        search_index('posts_post'),
+        search_index('posts_comment'),
+    ]
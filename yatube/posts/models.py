@@ -2,6 +2,9 @@ from django.db import models
 from django.contrib.auth import get_user_model
 
 from yatube.settings import POST_IMAGE_UPLOAD_PATH
+
+from .const import TAG_MAX_LENGTH
+
 User = get_user_model()
 FOLLOWING_STRING = 'Пользователь {user} подписан на {author}'
 
@@ -23,6 +26,9 @@ class Post(models.Model):
     pub_date = models.DateTimeField(
         auto_now_add=True, verbose_name='Дата публикации'
     )
+    updated = models.DateTimeField(
+        auto_now=True, verbose_name='Дата изменения'
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -43,15 +49,41 @@ class Post(models.Model):
         upload_to=POST_IMAGE_UPLOAD_PATH,
         blank=True
     )
+    comment_count = models.IntegerField(
+        'Комментариев',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='post_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=('group', '-pub_date', '-id'),
+                name='post_group_pub_date_idx'
+            ),
+        )
 
     def __str__(self):
         return self.text[:15]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        post = super().from_db(db, field_names, values)
+        # Группа на момент чтения: сигналы сравнивают с ней при сохранении
+        post.loaded_group_id = post.__dict__.get('group_id')
+        return post
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -78,6 +110,12 @@ class Comment(models.Model):
         ordering = ('-created',)
         verbose_name = 'комментарий'
         verbose_name_plural = 'комментарии'
+        indexes = (
+            models.Index(
+                fields=('post', '-created', '-id'),
+                name='comment_post_created_idx'
+            ),
+        )
 
     def __str__(self):
         return self.text[:15]
@@ -106,9 +144,199 @@ class Follow(models.Model):
                 name='follow_user_author_constraint'
             ),
         )
+        indexes = (
+            models.Index(
+                fields=('author', 'user'),
+                name='follow_author_user_idx'
+            ),
+        )
 
     def __str__(self):
         return FOLLOWING_STRING.format(
             user=self.user.username,
             author=self.author.username
         )
+
+
+class InboxEntry(models.Model):
+    """Запись ленты подписок: пост автора, на которого подписан user."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='inbox',
+        verbose_name='подписчик'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='inbox_entries',
+        verbose_name='пост'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        verbose_name = 'запись ленты подписок'
+        verbose_name_plural = 'Ленты подписок'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                name='inbox_user_post_constraint'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-post'),
+                name='inbox_user_pub_date_idx'
+            ),
+        )
+
+
+class Tag(models.Model):
+    name = models.CharField(
+        max_length=TAG_MAX_LENGTH, unique=True, verbose_name='тег'
+    )
+
+    class Meta:
+        verbose_name = 'тег'
+        verbose_name_plural = 'Теги'
+
+    def __str__(self):
+        return self.name
+
+
+class PostTag(models.Model):
+    """Тег в тексте поста; дата поста продублирована для ленты тега."""
+    tag = models.ForeignKey(
+        Tag,
+        on_delete=models.CASCADE,
+        related_name='post_tags',
+        verbose_name='тег'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='post_tags',
+        verbose_name='пост'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        verbose_name = 'тег поста'
+        verbose_name_plural = 'Теги постов'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('tag', 'post'),
+                name='post_tag_tag_post_constraint'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('tag', '-pub_date', '-post'),
+                name='post_tag_pub_date_idx'
+            ),
+        )
+
+
+class PostVector(models.Model):
+    """Частоты слов поста и время версии текста, по которой они собраны."""
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='vector',
+        verbose_name='пост'
+    )
+    terms = models.TextField('частоты слов (JSON)')
+    computed = models.DateTimeField('версия текста')
+
+    class Meta:
+        verbose_name = 'вектор поста'
+        verbose_name_plural = 'Векторы постов'
+
+
+class RelatedPost(models.Model):
+    """Похожий пост и косинусная близость их векторов TF-IDF."""
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='related_posts',
+        verbose_name='пост'
+    )
+    related = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='похожий пост'
+    )
+    score = models.FloatField('близость')
+
+    class Meta:
+        verbose_name = 'похожий пост'
+        verbose_name_plural = 'Похожие посты'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('post', 'related'),
+                name='related_post_post_related_constraint'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('post', '-score'),
+                name='related_post_score_idx'
+            ),
+        )
+
+
+class FollowSuggestion(models.Model):
+    """Автор, на которого пользователю стоит подписаться."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='suggestions',
+        verbose_name='пользователь'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='автор'
+    )
+    score = models.FloatField('вес')
+
+    class Meta:
+        verbose_name = 'рекомендация подписки'
+        verbose_name_plural = 'Рекомендации подписок'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'author'),
+                name='suggestion_user_author_constraint'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-score'),
+                name='suggestion_user_score_idx'
+            ),
+        )
+
+
+class UserStats(models.Model):
+    """Счётчики профиля, которые обновляются вместе с записями."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+    posts = models.IntegerField('постов', default=0)
+    followers = models.IntegerField('подписчиков', default=0)
+    following = models.IntegerField('подписок', default=0)
+    comments = models.IntegerField('комментариев', default=0)
+
+    class Meta:
+        verbose_name = 'счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return self.user.username
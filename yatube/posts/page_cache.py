@@ -0,0 +1,257 @@
+"""Кэш страниц с инвалидацией по поколениям.
+
+У каждой ленты (главная, группа, автор) и у каждого поста есть счётчик
+поколения в кэше.
+Счётчики входят в ключ страницы, поэтому страницы можно хранить
+часами: при записи сигнал увеличивает счётчик, и следующий запрос
+строит новый ключ, а старые записи просто истекают.
+
+От лавины пересчётов при истечении записи защищает get_or_compute:
+пересчитывает только тот, кто взял блокировку, остальные получают
+устаревшее значение, а обновление вероятностно начинается заранее.
+
+Страница хранится одна на всех пользователей, персональные части
+подставляются при отдаче (см. fragments).
+
+Чтобы ключ страницы поста строился без SQL, автор поста и имя
+пользователя тоже лежат в кэше: сигналы обновляют их при сохранении
+поста и пользователя.
+"""
+import hashlib
+import math
+import random
+import time
+from functools import wraps
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core.routers import REPLICA, read_source
+from core.timing import count_cache
+
+from .const import (
+    CACHE_LOCK_TIMEOUT, CACHE_LOCK_WAIT, CACHE_STALE_TIME, CACHE_TIME
+)
+from .fragments import inject, shared_render
+from .models import Post, User
+from .tags import extract as extract_tags
+
+GENERATION_KEY = 'generation:{scope}'
+FEED_SCOPE = 'feed'
+GROUP_SCOPE = 'group:{slug}'
+AUTHOR_SCOPE = 'author:{username}'
+POST_SCOPE = 'post:{post_id}'
+TAG_SCOPE = 'tag:{name}'
+LOCK_KEY = 'lock:{key}'
+PAGE_KEY = 'page:{digest}'
+POST_AUTHOR_KEY = 'post-author:{post_id}'
+USERNAME_KEY = 'username:{user_id}'
+LOCK_POLL_INTERVAL = 0.05
+EARLY_REFRESH_BETA = 1.0
+
+
+def group_scope(slug):
+    return GROUP_SCOPE.format(slug=slug)
+
+
+def author_scope(username):
+    return AUTHOR_SCOPE.format(username=username)
+
+
+def post_scope(post_id):
+    return POST_SCOPE.format(post_id=post_id)
+
+
+def tag_scope(name):
+    return TAG_SCOPE.format(name=name.lower())
+
+
+def post_author_key(post_id):
+    return POST_AUTHOR_KEY.format(post_id=post_id)
+
+
+def username_key(user_id):
+    return USERNAME_KEY.format(user_id=user_id)
+
+
+def username(user_id):
+    """Имя пользователя по id; промах кэша дочитывается из базы."""
+    key = username_key(user_id)
+    name = cache.get(key)
+    if name is None:
+        name = User.objects.filter(pk=user_id).values_list(
+            'username', flat=True
+        ).first()
+        if name is not None:
+            cache.set(key, name, CACHE_TIME)
+    return name
+
+
+def post_author_scope(post_id):
+    """Лента автора поста: на попадании в кэш без запросов к базе."""
+    key = post_author_key(post_id)
+    author_id = cache.get(key)
+    if author_id is None:
+        author_id = Post.objects.filter(pk=post_id).values_list(
+            'author_id', flat=True
+        ).first()
+        if author_id is None:
+            return author_scope(None)
+        cache.set(key, author_id, CACHE_TIME)
+    return author_scope(username(author_id))
+
+
+def generation_key(scope):
+    return GENERATION_KEY.format(scope=quote(scope))
+
+
+def initial_generation():
+    # Вытесненный из кэша счётчик не должен вернуться к уже
+    # использованному значению, поэтому начинаем с текущего времени
+    return int(time.time() * 1000)
+
+
+def get_generations(scopes):
+    keys = [generation_key(scope) for scope in scopes]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            cache.add(key, initial_generation(), None)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+
+def increment(scopes):
+    for scope in scopes:
+        key = generation_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, initial_generation(), None)
+
+
+def bump(*scopes):
+    """Сбрасывает страницы перечисленных лент сейчас и после фиксации.
+
+    Читатель, успевший до фиксации отрендерить старые данные, положил бы
+    их под новое поколение — его страницу отменяет второе увеличение.
+    """
+    scopes = set(scopes)
+    increment(scopes)
+    transaction.on_commit(lambda: increment(scopes))
+
+
+def post_scopes(post):
+    scopes = [
+        FEED_SCOPE, author_scope(post.author.username), post_scope(post.id)
+    ]
+    if post.group_id:
+        scopes.append(group_scope(post.group.slug))
+    scopes.extend(tag_scope(name) for name in extract_tags(post.text))
+    return scopes
+
+
+def is_fresh(delta, expiry, beta=EARLY_REFRESH_BETA):
+    """Вероятностное раннее обновление (XFetch).
+
+    Чем дольше пересчёт и ближе истечение, тем вероятнее, что
+    запрос сочтёт значение устаревшим и обновит его заранее.
+    """
+    return time.time() - delta * beta * math.log(
+        1 - random.random()
+    ) < expiry
+
+
+def wait_for_value(key):
+    deadline = time.time() + CACHE_LOCK_WAIT
+    while time.time() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+def get_or_compute(key, compute, timeout=CACHE_TIME,
+                   should_cache=lambda value: True):
+    """Значение из кэша или результат compute() без лавины пересчётов."""
+    entry = cache.get(key)
+    lock_key = LOCK_KEY.format(key=key)
+    if entry is not None:
+        value, delta, expiry = entry
+        if is_fresh(delta, expiry) or not cache.add(
+            lock_key, True, CACHE_LOCK_TIMEOUT
+        ):
+            count_cache('page', hits=1)
+            return value
+    elif not cache.add(lock_key, True, CACHE_LOCK_TIMEOUT):
+        entry = wait_for_value(key)
+        if entry is not None:
+            count_cache('page', hits=1)
+            return entry[0]
+    count_cache('page', misses=1)
+    try:
+        started = time.time()
+        value = compute()
+        finished = time.time()
+        if should_cache(value):
+            cache.set(
+                key,
+                (value, finished - started, finished + timeout),
+                timeout + CACHE_STALE_TIME
+            )
+    finally:
+        cache.delete(lock_key)
+    return value
+
+
+def page_key(prefix, path):
+    return PAGE_KEY.format(digest=hashlib.md5(
+        f'{prefix}:{path}'.encode()
+    ).hexdigest())
+
+
+def cache_feed(*scopes):
+    """Кэширует страницу с учётом поколений и без лавины пересчётов.
+
+    scopes — шаблоны областей, в которые подставляются именованные
+    аргументы вью, или функции от этих аргументов.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            names = [
+                scope(**kwargs) if callable(scope) else scope.format(**kwargs)
+                for scope in scopes
+            ]
+            # Страница с отстающей реплики не должна достаться тому,
+            # кто только что писал, и живёт в кэше недолго
+            source = read_source()
+            prefix = '.'.join([source] + [
+                f'{name}-{generation}' for name, generation
+                in zip(names, get_generations(names))
+            ])
+
+            def compute():
+                with shared_render():
+                    return view(request, *args, **kwargs)
+            response = get_or_compute(
+                page_key(prefix, request.get_full_path()),
+                compute,
+                timeout=(
+                    settings.REPLICA_PAGE_CACHE_TIME if source == REPLICA
+                    else CACHE_TIME
+                ),
+                should_cache=lambda response: response.status_code == 200,
+            )
+            if response.status_code == 200:
+                response.content = inject(
+                    request, response.content.decode(response.charset)
+                )
+            return response
+        return wrapper
+    return decorator
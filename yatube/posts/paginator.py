@@ -0,0 +1,138 @@
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_bytes, force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from .const import MAX_OFFSET_PAGES
+
+CURSOR_SEPARATOR = '|'
+
+
+class CursorPaginator(Paginator):
+    """Паджинатор по ключу (key, tiebreak) без COUNT(*) и больших OFFSET.
+
+    Первые MAX_OFFSET_PAGES страниц доступны по ?page=N, переходы
+    «старше»/«новее» идут по непрозрачным курсорам ?after=/?before=,
+    поэтому глубина страницы не влияет на стоимость запроса.
+    Общее количество записей не считается: count и num_pages
+    отражают только то, что известно о соседних страницах.
+    """
+
+    def __init__(self, object_list, per_page, key='pub_date', tiebreak='pk'):
+        self.key = key
+        self.tiebreak = tiebreak
+        super().__init__(
+            object_list.order_by(f'-{key}', f'-{tiebreak}'), per_page
+        )
+        self._count = 0
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def num_pages(self):
+        return -(-self.count // self.per_page)
+
+    def validate_number(self, number):
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('Номер страницы должен быть числом')
+        if not 1 <= number <= MAX_OFFSET_PAGES:
+            raise EmptyPage('Страница недоступна по номеру')
+        return number
+
+    def get_page(self, number=None, after=None, before=None):
+        """Страница по курсору, а при его отсутствии — по номеру."""
+        cursor = after or before
+        if cursor:
+            try:
+                return self.cursor_page(cursor, older=bool(after))
+            except EmptyPage:
+                pass
+        try:
+            return self.page(number)
+        except (PageNotAnInteger, EmptyPage):
+            return self.page(1)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = self.fetch_slice(bottom, bottom + self.per_page + 1)
+        if not rows and number > 1:
+            raise EmptyPage('На этой странице нет записей')
+        self._count = bottom + len(rows)
+        return self._build_page(rows[:self.per_page], number)
+
+    def cursor_page(self, cursor, older=True):
+        number, value, pk = self.decode_cursor(cursor)
+        if older:
+            rows = self.fetch_older(value, pk, self.per_page + 1)
+            if not rows:
+                raise EmptyPage('Записей старше курсора нет')
+            number += 1
+            self._count = (number - 1) * self.per_page + len(rows)
+            return self._build_page(rows[:self.per_page], number)
+        rows = self.fetch_newer(value, pk, self.per_page + 1)
+        if len(rows) <= self.per_page or number <= 2:
+            return self.page(1)
+        number -= 1
+        self._count = number * self.per_page + 1
+        return self._build_page(rows[:self.per_page][::-1], number)
+
+    def fetch_slice(self, bottom, top):
+        return list(self.object_list[bottom:top])
+
+    def fetch_older(self, value, pk, limit):
+        """Записи старше курсора, от новых к старым."""
+        return list(self.object_list.filter(
+            Q(**{f'{self.key}__lt': value})
+            | Q(**{self.key: value, f'{self.tiebreak}__lt': pk})
+        )[:limit])
+
+    def fetch_newer(self, value, pk, limit):
+        """Записи новее курсора, от старых к новым."""
+        return list(self.object_list.filter(
+            Q(**{f'{self.key}__gt': value})
+            | Q(**{self.key: value, f'{self.tiebreak}__gt': pk})
+        ).order_by(self.key, self.tiebreak)[:limit])
+
+    def _build_page(self, object_list, number):
+        page = self._get_page(object_list, number, self)
+        page.previous_cursor = page.next_cursor = None
+        if object_list and page.has_previous():
+            page.previous_cursor = self.encode_cursor(object_list[0], number)
+        if object_list and page.has_next():
+            page.next_cursor = self.encode_cursor(object_list[-1], number)
+        return page
+
+    def encode_value(self, obj):
+        return getattr(obj, self.key).isoformat()
+
+    def decode_value(self, value):
+        return parse_datetime(value)
+
+    def encode_cursor(self, obj, number):
+        value = self.encode_value(obj)
+        return urlsafe_base64_encode(force_bytes(
+            CURSOR_SEPARATOR.join(
+                (str(number), value, str(getattr(obj, self.tiebreak)))
+            )
+        ))
+
+    def decode_cursor(self, cursor):
+        try:
+            number, value, pk = force_str(
+                urlsafe_base64_decode(cursor)
+            ).split(CURSOR_SEPARATOR)
+            number, pk = int(number), int(pk)
+            value = self.decode_value(value)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise EmptyPage('Некорректный курсор')
+        if value is None or number < 1:
+            raise EmptyPage('Некорректный курсор')
+        return number, value, pk
@@ -0,0 +1,118 @@
+"""Полнотекстовый поиск по постам и комментариям на SQLite FTS5.
+
+Индексы posts_post_fts и posts_comment_fts — внешние (external
+content) таблицы FTS5 над текстом постов и комментариев: сам текст
+лежит только в исходной таблице, а триггеры из миграции 0016 правят
+индекс при любой записи, в том числе через bulk_create и update().
+Поиск идёт по инвертированному индексу, поэтому его время зависит от
+числа совпадений, а не от размера таблицы, в отличие от LIKE '%…%'.
+
+Запрос пользователя разбивается на слова, каждое ищется по префиксу
+(«котик» найдёт «котики»), все слова обязательны. Результаты
+упорядочены по bm25, к каждому посту прилагается фрагмент текста с
+подсвеченными совпадениями.
+"""
+import re
+
+from django.db import connections, router
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+
+POST_INDEX = 'posts_post_fts'
+COMMENT_INDEX = 'posts_comment_fts'
+WORD = re.compile(r'\w+')
+# Служебные символы не встречаются в тексте и не задеваются escape
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+SNIPPET_TOKENS = 24
+SNIPPET_ELLIPSIS = '…'
+
+
+def match_expression(query):
+    """Запрос в синтаксисе FTS5 или пустая строка, если слов нет."""
+    return ' '.join(f'"{word}"*' for word in WORD.findall(query.lower()))
+
+
+def matching_ids(index, query):
+    """Подзапрос rowid совпадений для фильтра pk__in."""
+    return RawSQL(
+        f'SELECT rowid FROM {index} WHERE {index} MATCH %s',
+        [match_expression(query)]
+    )
+
+
+def highlight(snippet):
+    return mark_safe(
+        escape(snippet)
+        .replace(HIGHLIGHT_START, '<mark>')
+        .replace(HIGHLIGHT_END, '</mark>')
+    )
+
+
+class SearchResults:
+    """Найденные посты по рангу: Paginator берёт count() и срезы."""
+
+    def __init__(self, query):
+        self.match = match_expression(query)
+        self.db = router.db_for_read(Post)
+        self._count = None
+
+    def execute(self, sql, params):
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def count(self):
+        if self._count is None:
+            self._count = self.execute(
+                f'SELECT count(*) FROM {POST_INDEX} '
+                f'WHERE {POST_INDEX} MATCH %s', [self.match]
+            )[0][0] if self.match else 0
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, items):
+        if not isinstance(items, slice):
+            raise TypeError('Результаты поиска берутся только срезом')
+        start = items.start or 0
+        stop = self.count() if items.stop is None else items.stop
+        if not self.match or stop <= start:
+            return []
+        rows = self.execute(
+            f'SELECT rowid, snippet({POST_INDEX}, 0, %s, %s, %s, %s) '
+            f'FROM {POST_INDEX} WHERE {POST_INDEX} MATCH %s '
+            'ORDER BY rank LIMIT %s OFFSET %s',
+            [
+                HIGHLIGHT_START, HIGHLIGHT_END, SNIPPET_ELLIPSIS,
+                SNIPPET_TOKENS, self.match, stop - start, start,
+            ]
+        )
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [post_id for post_id, _ in rows]
+        )
+        results = []
+        for post_id, snippet in rows:
+            post = posts.get(post_id)
+            if post is not None:
+                post.snippet = highlight(snippet)
+                results.append(post)
+        return results
+
+
+def rebuild(optimize=False):
+    """Перестраивает индексы из исходных таблиц."""
+    with connections[router.db_for_write(Post)].cursor() as cursor:
+        for index in (POST_INDEX, COMMENT_INDEX):
+            cursor.execute(
+                f'INSERT INTO {index} ({index}) VALUES (%s)', ['rebuild']
+            )
+            if optimize:
+                cursor.execute(
+                    f'INSERT INTO {index} ({index}) VALUES (%s)',
+                    ['optimize']
+                )
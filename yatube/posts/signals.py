@@ -0,0 +1,178 @@
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+
+from . import (
+    graph, inbox, page_cache, related, stats, tags, thumbnails, timelines
+)
+from .const import CACHE_TIME, FEED_ENGINE_INBOX
+from .models import Comment, Follow, FollowSuggestion, Group, Post, User
+
+
+# Поля пользователя, которые выводятся на страницах
+USER_SHOWN_FIELDS = {'username', 'first_name', 'last_name'}
+
+# id постов, которые удаляет текущий поток: их комментарии уходят
+# каскадом, и работа по ним делается один раз на пост
+deleting = threading.local()
+
+
+def deleting_posts():
+    if not hasattr(deleting, 'posts'):
+        deleting.posts = set()
+    return deleting.posts
+
+
+def inbox_enabled():
+    return settings.FOLLOW_FEED_ENGINE == FEED_ENGINE_INBOX
+
+
+def bump_follow_pages(follow):
+    page_cache.bump(
+        page_cache.author_scope(follow.user.username),
+        page_cache.author_scope(follow.author.username),
+    )
+
+
+def bump_comment_pages(comment, post):
+    scopes = [page_cache.author_scope(page_cache.username(comment.author_id))]
+    if post is not None:
+        scopes.extend(page_cache.post_scopes(post))
+    page_cache.bump(*scopes)
+
+
+@receiver(pre_save, sender=Post)
+def post_changing(sender, instance, **kwargs):
+    instance.previous_group_slug = None
+    if not instance.pk:
+        return
+    if hasattr(instance, 'loaded_group_id'):
+        if instance.loaded_group_id in (None, instance.group_id):
+            return
+        groups = Group.objects.filter(pk=instance.loaded_group_id)
+    else:
+        groups = Group.objects.filter(posts=instance.pk)
+    instance.previous_group_slug = groups.values_list(
+        'slug', flat=True
+    ).first()
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    scopes = page_cache.post_scopes(instance)
+    if getattr(instance, 'previous_group_slug', None):
+        scopes.append(page_cache.group_scope(instance.previous_group_slug))
+    scopes.extend(
+        page_cache.tag_scope(name) for name in tags.sync(instance, created)
+    )
+    page_cache.bump(*scopes)
+    instance.loaded_group_id = instance.group_id
+    cache.set(
+        page_cache.post_author_key(instance.pk), instance.author_id,
+        CACHE_TIME
+    )
+    thumbnails.schedule(instance)
+    # Ключ ленты автора содержит pub_date, а его можно поменять в админке
+    timelines.invalidate_timeline(instance.author_id)
+    if not created:
+        return
+    stats.bump(instance.author_id, posts=1)
+    if inbox_enabled():
+        inbox.fan_out_post(instance)
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    # Страницы самого поста сбросит post_deleted, а счётчики и профили
+    # авторов комментариев правим одним запросом на пост. Связи с
+    # похожими постами удалятся каскадом, поэтому страницы, которые
+    # ссылаются на пост, сбрасываем до удаления
+    deleting_posts().add(instance.pk)
+    commenters = Comment.objects.filter(post_id=instance.pk).order_by(
+    ).values('author_id').annotate(total=Count('pk')).values_list(
+        'author_id', 'total'
+    )
+    scopes = list(map(page_cache.post_scope, related.referrers(instance.pk)))
+    for author_id, total in commenters:
+        stats.bump(author_id, comments=-total)
+        scopes.append(page_cache.author_scope(page_cache.username(author_id)))
+    page_cache.bump(*scopes)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    deleting_posts().discard(instance.pk)
+    page_cache.bump(*page_cache.post_scopes(instance))
+    stats.bump(instance.author_id, posts=-1)
+    timelines.invalidate_timeline(instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if not created:
+        return
+    bump_follow_pages(instance)
+    stats.bump(instance.user_id, following=1)
+    stats.bump(instance.author_id, followers=1)
+    graph.invalidate(instance)
+    FollowSuggestion.objects.filter(
+        user_id=instance.user_id, author_id=instance.author_id
+    ).delete()
+    if inbox_enabled():
+        inbox.backfill(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    bump_follow_pages(instance)
+    stats.bump(instance.user_id, following=-1)
+    stats.bump(instance.author_id, followers=-1)
+    graph.invalidate(instance)
+    if inbox_enabled():
+        inbox.prune(instance)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        bump_comment_pages(instance, instance.post)
+        stats.bump(instance.author_id, comments=1)
+        stats.bump_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if instance.post_id in deleting_posts():
+        return
+    bump_comment_pages(instance, Post.objects.select_related(
+        'author', 'group'
+    ).filter(pk=instance.post_id).first())
+    stats.bump(instance.author_id, comments=-1)
+    stats.bump_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields, **kwargs):
+    # Вход пользователя сохраняет только last_login — страницы не меняются
+    if created or (
+        update_fields is not None
+        and not update_fields & USER_SHOWN_FIELDS
+    ):
+        return
+    cache.delete(page_cache.username_key(instance.pk))
+    page_cache.bump(
+        page_cache.FEED_SCOPE, page_cache.author_scope(instance.username)
+    )
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, **kwargs):
+    page_cache.bump(
+        page_cache.FEED_SCOPE, page_cache.group_scope(instance.slug)
+    )
@@ -0,0 +1,87 @@
+"""Денормализованные счётчики профиля и комментариев поста.
+
+Строка UserStats создаётся при первом чтении по реальным COUNT,
+дальше её поддерживают сигналы Post, Comment и Follow. Если строки
+ещё нет, обновление пропускается: первое чтение посчитает всё заново.
+Post.comment_count поддерживается теми же сигналами Comment.
+"""
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .const import STATS_BATCH_SIZE
+from .models import Comment, Follow, Post, User, UserStats
+
+COUNTERS = {
+    'posts': (Post, 'author'),
+    'followers': (Follow, 'author'),
+    'following': (Follow, 'user'),
+    'comments': (Comment, 'author'),
+}
+
+
+def bump(user_id, **deltas):
+    UserStats.objects.filter(user_id=user_id).update(**{
+        counter: F(counter) + delta for counter, delta in deltas.items()
+    })
+
+
+def bump_comments(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comment_count=F('comment_count') + delta
+    )
+
+
+def count_subquery(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(total=Count('pk')).values(
+            'total'
+        ),
+        output_field=IntegerField()
+    ), 0)
+
+
+def with_counters(users):
+    return users.annotate(**{
+        f'{counter}_total': count_subquery(model, field)
+        for counter, (model, field) in COUNTERS.items()
+    })
+
+
+def get_stats(user):
+    """Все счётчики пользователя одним запросом."""
+    try:
+        return UserStats.objects.get(user=user)
+    except UserStats.DoesNotExist:
+        pass
+    totals = with_counters(User.objects.filter(pk=user.pk)).values(
+        *(f'{counter}_total' for counter in COUNTERS)
+    ).get()
+    stats, _ = UserStats.objects.get_or_create(user=user, defaults={
+        counter: totals[f'{counter}_total'] for counter in COUNTERS
+    })
+    return stats
+
+
+def recount():
+    """Пересчитывает счётчики всех пользователей и постов.
+
+    Возвращает количество пересчитанных профилей.
+    """
+    users = with_counters(User.objects.order_by('pk')).values_list(
+        'pk', *(f'{counter}_total' for counter in COUNTERS)
+    )
+    with transaction.atomic():
+        UserStats.objects.all().delete()
+        created = 0
+        batch = []
+        for pk, *totals in users.iterator(STATS_BATCH_SIZE):
+            batch.append(UserStats(user_id=pk, **dict(zip(COUNTERS, totals))))
+            if len(batch) == STATS_BATCH_SIZE:
+                created += len(UserStats.objects.bulk_create(batch))
+                batch = []
+        created += len(UserStats.objects.bulk_create(batch))
+        Post.objects.update(comment_count=count_subquery(Comment, 'post'))
+    return created
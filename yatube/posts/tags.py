@@ -0,0 +1,113 @@
+"""Хэштеги в тексте постов и инвертированный индекс тег → посты.
+
+Теги (#котики) разбираются из текста при каждом сохранении поста
+(сигнал post_saved) и лежат в PostTag с продублированной датой
+публикации: лента тега читается по индексу (tag, pub_date, post) так
+же, как лента подписок по InboxEntry, без LIKE по текстам.
+Посты, созданные в обход save() или до появления тегов, догоняет
+команда backfill_tags.
+"""
+import re
+
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from django.urls import reverse
+
+from core.db import immediate_atomic
+
+from .const import TAG_BATCH_SIZE, TAG_MAX_LENGTH
+from .models import Post, PostTag, Tag
+from .utils import batched
+
+TAG = re.compile(r'(?<![\w#&])#(\w{1,%d})(?!\w)' % TAG_MAX_LENGTH)
+
+
+def extract(text):
+    """Множество тегов текста в нижнем регистре."""
+    return {name.lower() for name in TAG.findall(text)}
+
+
+def get_tag_ids(names):
+    """id тегов по именам, недостающие теги создаются."""
+    if not names:
+        return {}
+    Tag.objects.bulk_create(
+        [Tag(name=name) for name in names], ignore_conflicts=True
+    )
+    return dict(
+        Tag.objects.filter(name__in=names).values_list('name', 'id')
+    )
+
+
+def sync(post, created=False):
+    """Приводит теги поста к его тексту, возвращает изменившиеся имена."""
+    names = extract(post.text)
+    current = {} if created else dict(
+        post.post_tags.values_list('tag__name', 'id')
+    )
+    added = names - current.keys()
+    removed = current.keys() - names
+    if removed:
+        PostTag.objects.filter(
+            id__in=[current[name] for name in removed]
+        ).delete()
+    PostTag.objects.bulk_create([
+        PostTag(tag_id=tag_id, post=post, pub_date=post.pub_date)
+        for tag_id in get_tag_ids(added).values()
+    ], ignore_conflicts=True)
+    return added | removed
+
+
+def backfill(chunk_size=TAG_BATCH_SIZE):
+    """Разбирает теги всех постов пачками, возвращает число связей."""
+    rows = Post.objects.order_by().values_list(
+        'id', 'text', 'pub_date'
+    ).iterator(chunk_size)
+    links = 0
+    for batch in batched(rows, chunk_size):
+        names = {post_id: extract(text) for post_id, text, _ in batch}
+        with immediate_atomic():
+            tag_ids = get_tag_ids(set().union(*names.values()))
+            wanted = {
+                (post_id, tag_ids[name])
+                for post_id, post_names in names.items()
+                for name in post_names
+            }
+            stale = [
+                link_id for link_id, post_id, tag_id
+                in PostTag.objects.filter(post_id__in=names).values_list(
+                    'id', 'post_id', 'tag_id'
+                )
+                if (post_id, tag_id) not in wanted
+            ]
+            PostTag.objects.filter(id__in=stale).delete()
+            PostTag.objects.bulk_create([
+                PostTag(tag_id=tag_ids[name], post_id=post_id,
+                        pub_date=pub_date)
+                for post_id, _, pub_date in batch
+                for name in names[post_id]
+            ], ignore_conflicts=True)
+        links += len(wanted)
+    return links
+
+
+def link_tags(text):
+    """Экранированный текст, в котором теги стали ссылками на ленты.
+
+    Теги ищутся в исходном тексте, как и в extract, а экранируются
+    только куски между ними: иначе сущности вроде &#123; давали бы
+    ссылки на несуществующие теги.
+    """
+    parts = []
+    end = 0
+    for match in TAG.finditer(text):
+        parts.append(escape(text[end:match.start()]))
+        parts.append('<a href="{url}">#{name}</a>'.format(
+            url=escape(reverse(
+                'posts:tag_list', args=[match.group(1).lower()]
+            )),
+            name=escape(match.group(1)),
+        ))
+        end = match.end()
+    parts.append(escape(text[end:]))
+    return mark_safe(''.join(parts))
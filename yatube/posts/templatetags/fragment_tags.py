@@ -0,0 +1,16 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts.fragments import is_shared_render, marker, render_fragment
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def fragment(context, name, *args):
+    """Персональный фрагмент: маркер в общей копии, иначе сразу рендер."""
+    request = context.get('request')
+    args = [str(arg) for arg in args]
+    if is_shared_render():
+        return marker(name, *args)
+    return mark_safe(render_fragment(request, name, *args))
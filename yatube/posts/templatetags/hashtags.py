@@ -0,0 +1,11 @@
+from django import template
+
+from posts.tags import link_tags as link_tags_in_text
+
+register = template.Library()
+
+
+@register.filter
+def link_tags(text):
+    """Текст поста со ссылками на ленты его тегов."""
+    return link_tags_in_text(text)
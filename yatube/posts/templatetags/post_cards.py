@@ -0,0 +1,15 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts.cards import render_cards
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_cards(posts, dont_show_author=False, dont_show_group=False):
+    """Карточки постов страницы, собранные из кэша."""
+    return [
+        mark_safe(card) for card in
+        render_cards(list(posts), dont_show_author, dont_show_group)
+    ]
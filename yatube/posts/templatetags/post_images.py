@@ -0,0 +1,11 @@
+from django import template
+
+from posts.thumbnails import thumbnail_or_original
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_image(image):
+    """Миниатюра картинки поста или оригинал, пока она готовится."""
+    return thumbnail_or_original(image)
@@ -0,0 +1,109 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import Count, F
+from django.test import TestCase
+
+from ..benchmark import percentile
+from ..models import Comment, Follow, Group, InboxEntry, Post, User
+
+USERS = 60
+POSTS = 300
+GROUPS = 3
+COMMENTS = 200
+
+
+class BenchmarkTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command(
+            'generate_dataset',
+            users=USERS, posts=POSTS, groups=GROUPS, comments=COMMENTS,
+            follows=5, batch_size=50, seed=1, stdout=StringIO(),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_dataset_has_requested_scale(self):
+        """Генератор создаёт заданное количество объектов"""
+        self.assertEqual(User.objects.count(), USERS)
+        self.assertEqual(Post.objects.count(), POSTS)
+        self.assertEqual(Group.objects.count(), GROUPS)
+        self.assertEqual(Comment.objects.count(), COMMENTS)
+        self.assertTrue(Follow.objects.exists())
+        self.assertFalse(Follow.objects.filter(
+            user_id=F('author_id')
+        ).exists())
+
+    def test_followers_follow_power_law(self):
+        """Подписчики сосредоточены у немногих авторов"""
+        followers = sorted(
+            User.objects.annotate(
+                total=Count('following')
+            ).values_list('total', flat=True),
+            reverse=True
+        )
+        top = sum(followers[:USERS // 10])
+        self.assertGreater(top, sum(followers) / 3)
+
+    def test_derived_data_is_rebuilt(self):
+        """Счётчики и ленты подписок пересобраны после bulk_create"""
+        post = Post.objects.annotate(
+            total=Count('comments')
+        ).order_by('-total').first()
+        self.assertEqual(post.comment_count, post.total)
+        self.assertTrue(InboxEntry.objects.exists())
+        dates = Post.objects.values_list('pub_date', flat=True)
+        self.assertGreater(len(set(dates)), POSTS // 2)
+
+    def test_post_dates_follow_ids(self):
+        """Даты постов набора растут вместе с id"""
+        dates = list(Post.objects.order_by('id').values_list(
+            'pub_date', flat=True
+        ))
+        self.assertEqual(dates, sorted(dates))
+
+    def test_benchmark_reports_percentiles(self):
+        """Прогон сохраняет перцентили и пропускную по каждой вью"""
+        path = os.path.join(
+            tempfile.mkdtemp(dir=settings.BASE_DIR), 'result.json'
+        )
+        self.addCleanup(os.rmdir, os.path.dirname(path))
+        self.addCleanup(os.remove, path)
+        call_command(
+            'benchmark', requests=3, concurrency=1, warmup=0,
+            output=path, stdout=StringIO(),
+        )
+        with open(path) as result_file:
+            result = json.load(result_file)
+        self.assertEqual(set(result['views']), {
+            'posts:main_page', 'posts:group_list', 'posts:profile',
+            'posts:post_detail', 'posts:comment_list', 'posts:follow_index',
+            'posts:post_create', 'posts:post_edit',
+        })
+        for view_name, summary in result['views'].items():
+            with self.subTest(view_name=view_name):
+                self.assertEqual(summary['requests'], 3)
+                self.assertEqual(summary['errors'], 0)
+                self.assertLessEqual(summary['p50_ms'], summary['p99_ms'])
+        output = StringIO()
+        call_command(
+            'benchmark', requests=1, concurrency=1, warmup=0,
+            views=['posts:main_page'], compare=path, stdout=output,
+        )
+        self.assertIn('p95', output.getvalue().splitlines()[-1])
+
+    def test_percentile_uses_nearest_rank(self):
+        """Перцентиль берётся по ближайшему рангу"""
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([5], 95), 5)
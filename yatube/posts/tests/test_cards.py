@@ -0,0 +1,63 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..cards import card_key
+from ..models import Group, Post, User
+
+USERNAME = "username"
+HOME_URL = reverse("posts:main_page")
+
+
+class PostCardsTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username=USERNAME)
+        cls.group = Group.objects.create(
+            title="Старая группа", slug="group", description="Описание"
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text="Старый текст", group=cls.group
+        )
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feed_stores_rendered_cards(self):
+        """Лента кладёт карточки постов в кэш"""
+        self.author_client.get(HOME_URL)
+        card = cache.get(card_key(self.post))
+        self.assertIn("Старый текст", card)
+
+    def test_cached_card_is_used(self):
+        """Лента собирается из закэшированных карточек"""
+        cache.set(card_key(self.post), "<article>из кэша</article>")
+        self.assertContains(self.author_client.get(HOME_URL), "из кэша")
+
+    def test_post_edit_invalidates_card(self):
+        """Правка поста сбрасывает его карточку"""
+        self.author_client.get(HOME_URL)
+        old_key = card_key(self.post)
+        self.author_client.post(
+            reverse("posts:post_edit", args=[self.post.id]),
+            data={"text": "Новый текст"},
+        )
+        self.assertIsNone(cache.get(old_key))
+        self.assertContains(self.author_client.get(HOME_URL), "Новый текст")
+
+    def test_author_and_group_renames_change_card(self):
+        """Переименование автора и группы даёт новую карточку"""
+        self.author_client.get(HOME_URL)
+        user = User.objects.get(id=self.user.id)
+        user.first_name = "Новое имя"
+        user.save()
+        group = Group.objects.get(id=self.group.id)
+        group.title = "Новая группа"
+        group.save()
+        response = self.author_client.get(HOME_URL)
+        self.assertContains(response, "Новое имя")
+        self.assertContains(response, "Новая группа")
@@ -0,0 +1,114 @@
+from array import array
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import Client, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import graph
+from ..models import Follow, User
+from ..stats import get_stats
+
+USERNAMES = ('reader', 'author', 'fan')
+PROFILE_URL = reverse('posts:profile', args=['author'])
+FOLLOW_URL = reverse('posts:profile_follow', args=['author'])
+UNFOLLOW_URL = reverse('posts:profile_unfollow', args=['author'])
+
+
+class FollowGraphTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader, cls.author, cls.fan = (
+            User.objects.create(username=username) for username in USERNAMES
+        )
+        Follow.objects.create(user=cls.author, author=cls.reader)
+        Follow.objects.create(user=cls.fan, author=cls.author)
+        Follow.objects.create(user=cls.fan, author=cls.reader)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_answers_come_from_cache(self):
+        """После сборки кэша подписки отвечаются без SQL"""
+        call_command('rebuild_follow_graph', stdout=StringIO())
+        with self.assertNumQueries(0):
+            self.assertTrue(graph.is_following(self.fan.pk, self.author.pk))
+            self.assertFalse(
+                graph.is_following(self.reader.pk, self.author.pk)
+            )
+            self.assertEqual(
+                list(graph.following(self.fan.pk)),
+                sorted([self.reader.pk, self.author.pk])
+            )
+
+    def test_rebuild_skips_missing_users(self):
+        """Сборка кэша не пишет массивы для id без пользователя"""
+        User.objects.filter(pk=self.author.pk).delete()
+        call_command(
+            'rebuild_follow_graph', chunk_size=1, stdout=StringIO()
+        )
+        self.assertIsNone(cache.get(graph.following_key(self.author.pk)))
+        self.assertIsNone(cache.get(graph.following_key(self.fan.pk + 1)))
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                list(graph.following(self.fan.pk)), [self.reader.pk]
+            )
+
+    def test_misses_are_read_from_database(self):
+        """Промах кэша дочитывается из базы и кладётся в кэш"""
+        self.assertEqual(list(graph.following(self.reader.pk)), [])
+        with self.assertNumQueries(0):
+            self.assertFalse(
+                graph.is_following(self.reader.pk, self.author.pk)
+            )
+
+    def test_follow_and_unfollow_reset_cache(self):
+        """Подписка и отписка сбрасывают закэшированный массив"""
+        call_command('rebuild_follow_graph', stdout=StringIO())
+        self.client.get(FOLLOW_URL)
+        self.client.get(FOLLOW_URL)
+        self.assertEqual(
+            Follow.objects.filter(user=self.reader).count(), 1
+        )
+        self.assertTrue(graph.is_following(self.reader.pk, self.author.pk))
+        self.client.get(UNFOLLOW_URL)
+        self.assertFalse(graph.is_following(self.reader.pk, self.author.pk))
+        with self.assertNumQueries(0):
+            self.assertFalse(
+                graph.is_following(self.reader.pk, self.author.pk)
+            )
+
+    def test_profile_does_not_query_follows(self):
+        """Кнопка подписки в профиле не ходит в таблицу подписок"""
+        call_command('rebuild_follow_graph', stdout=StringIO())
+        get_stats(self.author)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(PROFILE_URL)
+        self.assertContains(response, 'Читает вас')
+        self.assertFalse(any(
+            '"posts_follow"' in query['sql'] for query in queries
+        ))
+
+
+class FollowGraphCommitTests(TransactionTestCase):
+
+    def test_array_read_before_commit_is_dropped(self):
+        """Массив, прочитанный до коммита подписки, не переживает коммит"""
+        cache.clear()
+        reader, author = (
+            User.objects.create(username=username)
+            for username in USERNAMES[:2]
+        )
+        with transaction.atomic():
+            Follow.objects.create(user=reader, author=author)
+            # Другой запрос успел прочитать массив без новой подписки
+            cache.set(
+                graph.following_key(reader.pk), array(graph.ID_TYPE).tobytes()
+            )
+        self.assertTrue(graph.is_following(reader.pk, author.pk))
@@ -0,0 +1,71 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Follow, Post, User
+
+USERNAME_1 = "username-1"
+USERNAME_2 = "username-2"
+PROFILE_URL = reverse("posts:profile", args=[USERNAME_1])
+HOME_URL = reverse("posts:main_page")
+MISSING_GROUP_URL = reverse("posts:group_list", args=["missing"])
+LOGOUT_URL = reverse("users:logout")
+
+
+class PersonalFragmentsTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username=USERNAME_1)
+        cls.reader = User.objects.create(username=USERNAME_2)
+        cls.post = Post.objects.create(author=cls.author, text="Пост")
+        cls.guest_client = Client()
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+        cls.POST_DETAIL_URL = reverse("posts:post_detail", args=[cls.post.id])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_shared_page_gets_personal_fragments(self):
+        """Общая копия страницы дополняется фрагментами пользователя"""
+        guest = self.guest_client.get(HOME_URL)
+        reader = self.reader_client.get(HOME_URL)
+        self.assertIsNotNone(guest.context)
+        self.assertNotContains(guest, 'Избранные авторы')
+        self.assertContains(reader, 'Избранные авторы')
+        self.assertContains(reader, USERNAME_2)
+        self.assertNotContains(reader, '<!--fragment:')
+
+    def test_error_page_of_cached_view_gets_header(self):
+        """Страница 404 после упавшей кэшируемой вью рендерит шапку"""
+        response = self.reader_client.get(MISSING_GROUP_URL)
+        self.assertEqual(response.status_code, 404)
+        self.assertNotContains(response, '<!--fragment:', status_code=404)
+        self.assertContains(response, LOGOUT_URL, status_code=404)
+
+    def test_follow_button_is_rendered_per_request(self):
+        """Кнопка подписки считается при отдаче, а не берётся из кэша"""
+        self.assertContains(self.reader_client.get(PROFILE_URL), 'Подписаться')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertContains(
+            self.reader_client.get(PROFILE_URL), 'Отписаться'
+        )
+        self.assertNotContains(
+            self.author_client.get(PROFILE_URL), 'Отписаться'
+        )
+
+    def test_post_detail_edit_button_and_comment_form(self):
+        """Кнопка редактирования и форма комментария — персональные"""
+        guest = self.guest_client.get(self.POST_DETAIL_URL)
+        author = self.author_client.get(self.POST_DETAIL_URL)
+        reader = self.reader_client.get(self.POST_DETAIL_URL)
+        self.assertNotContains(guest, 'Добавить комментарий')
+        self.assertNotContains(guest, 'редактировать запись')
+        self.assertContains(author, 'редактировать запись')
+        self.assertContains(reader, 'Добавить комментарий')
+        self.assertNotContains(reader, 'редактировать запись')
+        self.assertContains(reader, 'csrfmiddlewaretoken')
@@ -0,0 +1,54 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Follow, InboxEntry, Post, User
+
+USERNAME_1 = "username-1"
+USERNAME_2 = "username-2"
+
+
+class InboxTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username=USERNAME_1)
+        cls.reader = User.objects.create(username=USERNAME_2)
+        cls.post = Post.objects.create(author=cls.author, text="Старый пост")
+
+    def inbox_posts(self):
+        return set(
+            self.reader.inbox.values_list('post_id', flat=True)
+        )
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка заполняет ленту, отписка очищает её"""
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.inbox_posts(), {self.post.id})
+        follow.delete()
+        self.assertEqual(self.inbox_posts(), set())
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост попадает в ленты подписчиков"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text="Новый пост")
+        entry = self.reader.inbox.get(post=post)
+        self.assertEqual(entry.pub_date, post.pub_date)
+        self.assertFalse(self.author.inbox.exists())
+
+    def test_rebuild_inbox_command(self):
+        """Команда rebuild_inbox восстанавливает ленты"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        InboxEntry.objects.all().delete()
+        call_command('rebuild_inbox', stdout=StringIO())
+        self.assertEqual(self.inbox_posts(), {self.post.id})
+
+    def test_backfill_of_prolific_author(self):
+        """Подписка на автора с сотнями постов укладывается в лимиты SQLite"""
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f"Пост {i}") for i in range(700)
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(len(self.inbox_posts()), 701)
@@ -0,0 +1,139 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import metrics
+
+from ..models import Post, User
+
+USERNAME = "username"
+HOME_URL = reverse("posts:main_page")
+POST_CREATE_URL = reverse("posts:post_create")
+METRICS_URL = reverse("metrics")
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+METRICS_TOKEN = 'scrape-token'
+
+
+@override_settings(MEDIA_ROOT=TEMP_DIR, METRICS_TOKEN=METRICS_TOKEN)
+class MetricsTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username=USERNAME)
+        Post.objects.create(author=cls.user, text="Тестовый пост")
+        cls.guest_client = Client()
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+
+    def setUp(self):
+        cache.clear()
+        # Свой каталог на тест: файл процесса заводится заново
+        self.metrics_dir = tempfile.mkdtemp(dir=TEMP_DIR)
+        settings_override = override_settings(METRICS_DIR=self.metrics_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def scrape(self):
+        return self.guest_client.get(
+            METRICS_URL, HTTP_AUTHORIZATION=f'Bearer {METRICS_TOKEN}'
+        ).content.decode()
+
+    def test_worker_files_are_summed(self):
+        """Значения из файлов разных воркеров складываются"""
+        for amount, pid in enumerate((os.getpid(), os.getppid()), 1):
+            store = metrics.MmapStore(
+                os.path.join(self.metrics_dir, f'{pid}.db')
+            )
+            store.inc('yatube_requests_total', amount)
+        self.assertEqual(metrics.collect()['yatube_requests_total'], 3)
+
+    def test_files_of_dead_workers_are_removed(self):
+        """Файл завершившегося воркера не учитывается и удаляется"""
+        pid = os.fork()
+        if not pid:
+            os._exit(0)
+        os.waitpid(pid, 0)
+        path = os.path.join(self.metrics_dir, f'{pid}.db')
+        metrics.MmapStore(path).inc('yatube_requests_total')
+        self.assertNotIn('yatube_requests_total', metrics.collect())
+        self.assertFalse(os.path.exists(path))
+
+    def test_store_grows_and_reopens(self):
+        """Файл воркера растёт по мере появления ключей и читается заново"""
+        path = os.path.join(self.metrics_dir, f'{os.getpid()}.db')
+        store = metrics.MmapStore(path)
+        keys = [f'sample_{"x" * 100}_{i}' for i in range(1000)]
+        for key in keys:
+            store.inc(key, 2)
+        self.assertGreater(os.path.getsize(path), metrics.INITIAL_SIZE)
+        metrics.MmapStore(path).inc(keys[-1])
+        totals = metrics.collect()
+        self.assertEqual(totals[keys[0]], 2)
+        self.assertEqual(totals[keys[-1]], 3)
+
+    def test_views_are_counted_by_url_name(self):
+        """Запросы, гистограммы и доля попаданий в кэш по имени вью"""
+        self.guest_client.get(HOME_URL)
+        self.guest_client.get(HOME_URL)
+        text = self.scrape()
+        self.assertIn(
+            'yatube_requests_total{method="GET",status="200",'
+            'view="posts:main_page"} 2',
+            text
+        )
+        self.assertIn(
+            'yatube_request_duration_seconds_bucket'
+            '{le="+Inf",view="posts:main_page"} 2',
+            text
+        )
+        self.assertIn(
+            'yatube_db_queries_count{view="posts:main_page"} 2', text
+        )
+        self.assertIn('yatube_cache_hit_ratio{cache="page"} 0.5', text)
+        self.assertIn('# TYPE yatube_request_duration_seconds histogram', text)
+
+    def test_upload_sizes_are_observed(self):
+        """Размер загруженной картинки попадает в гистограмму"""
+        self.authorized_client.post(POST_CREATE_URL, {
+            'text': 'Пост с картинкой',
+            'image': SimpleUploadedFile(
+                name='small.gif', content=SMALL_GIF, content_type='image/gif'
+            ),
+        })
+        text = self.scrape()
+        self.assertIn('yatube_upload_bytes_count 1', text)
+        self.assertIn(f'yatube_upload_bytes_sum {len(SMALL_GIF)}', text)
+
+    def test_metrics_require_token(self):
+        """Без токена сборщика эндпоинт не виден, даже с 127.0.0.1"""
+        for headers in ({}, {'HTTP_AUTHORIZATION': 'Bearer wrong'}):
+            with self.subTest(headers=headers):
+                response = self.guest_client.get(
+                    METRICS_URL, REMOTE_ADDR='127.0.0.1', **headers
+                )
+                self.assertEqual(response.status_code, 404)
+        with override_settings(METRICS_TOKEN=''):
+            response = self.guest_client.get(
+                METRICS_URL, HTTP_AUTHORIZATION='Bearer '
+            )
+        self.assertEqual(response.status_code, 404)
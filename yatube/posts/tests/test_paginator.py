@@ -0,0 +1,98 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..const import MAX_OFFSET_PAGES, POSTS_FOR_PAGE
+from ..models import Post, User
+from ..paginator import CursorPaginator
+
+USERNAME = "username"
+HOME_URL = reverse("posts:main_page")
+
+
+class CursorPaginatorTests(TestCase):
+    PAGES = 3
+    ALL_POSTS = POSTS_FOR_PAGE * PAGES - 1
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username=USERNAME)
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f"Тестовый пост {i}")
+            for i in range(cls.ALL_POSTS)
+        )
+        cls.ordered = list(Post.objects.order_by('-pub_date', '-pk'))
+        cls.guest_client = Client()
+
+    def setUp(self):
+        cache.clear()
+
+    def paginator(self):
+        return CursorPaginator(Post.objects.all(), POSTS_FOR_PAGE)
+
+    def test_cursor_pages_walk_whole_feed(self):
+        """Переходы по курсорам «старше» проходят ленту без пропусков"""
+        page = self.paginator().get_page()
+        seen = list(page)
+        while page.has_next():
+            page = self.paginator().get_page(after=page.next_cursor)
+            seen.extend(page)
+        self.assertEqual(seen, self.ordered)
+        self.assertEqual(page.number, self.PAGES)
+
+    def test_cursor_pages_match_offset_pages(self):
+        """Страница по курсору совпадает со страницей по номеру"""
+        first = self.paginator().get_page(1)
+        second = self.paginator().get_page(after=first.next_cursor)
+        self.assertEqual(list(second), list(self.paginator().get_page(2)))
+        back = self.paginator().get_page(before=second.previous_cursor)
+        self.assertEqual(back.number, 1)
+        self.assertEqual(list(back), list(first))
+
+    def test_newer_cursor_returns_previous_page(self):
+        """Курсор «новее» возвращает предыдущую страницу"""
+        third = self.paginator().get_page(3)
+        second = self.paginator().get_page(before=third.previous_cursor)
+        self.assertEqual(second.number, 2)
+        self.assertEqual(list(second), list(self.paginator().get_page(2)))
+
+    def test_invalid_input_falls_back_to_first_page(self):
+        """Некорректные номер и курсор ведут на первую страницу"""
+        first = list(self.paginator().get_page(1))
+        for kwargs in (
+            {'number': 'abc'},
+            {'number': MAX_OFFSET_PAGES + 1},
+            {'after': 'broken'},
+            {'before': 'broken'},
+        ):
+            with self.subTest(kwargs=kwargs):
+                page = self.paginator().get_page(**kwargs)
+                self.assertEqual(page.number, 1)
+                self.assertEqual(list(page), first)
+
+    def test_cursor_page_skips_count_query(self):
+        """Страница по курсору строится одним запросом без COUNT"""
+        cursor = self.paginator().get_page(1).next_cursor
+        with CaptureQueriesContext(connection) as queries:
+            len(self.paginator().get_page(after=cursor))
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('COUNT', queries[0]['sql'])
+        self.assertNotIn('OFFSET', queries[0]['sql'])
+
+    def test_feed_pagination_links(self):
+        """Ссылки паджинатора ленты ведут по курсорам"""
+        page = self.guest_client.get(HOME_URL).context['page_obj']
+        response = self.guest_client.get(
+            HOME_URL, {'after': page.next_cursor}
+        )
+        self.assertEqual(response.context['page_obj'].number, 2)
+        self.assertContains(
+            response, f'?after={response.context["page_obj"].next_cursor}'
+        )
+        self.assertContains(
+            response,
+            f'?before={response.context["page_obj"].previous_cursor}'
+        )
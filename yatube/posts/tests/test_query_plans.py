@@ -0,0 +1,89 @@
+import re
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..const import FEED_ENGINE_INBOX, FEED_ENGINE_TIMELINE, POSTS_FOR_PAGE
+from ..models import Comment, Follow, Group, Post, User
+
+USERNAME_1 = "username-1"
+USERNAME_2 = "username-2"
+SLUG = "slug"
+TAG = "тег"
+FULL_SCAN = re.compile(r'\bSCAN (TABLE )?\w+$')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+class QueryPlanTests(TestCase):
+    """Запросы лент идут по индексам: без полных сканов и сортировок."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username=USERNAME_1)
+        cls.reader = User.objects.create(username=USERNAME_2)
+        cls.group = Group.objects.create(
+            title="Тестовая группа", slug=SLUG, description="Описание"
+        )
+        for i in range(POSTS_FOR_PAGE * 2):
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f"Пост {i} #{TAG}"
+            )
+        cls.post = Post.objects.first()
+        for i in range(3):
+            Comment.objects.create(
+                post=cls.post, author=cls.reader, text=f"Коммент {i}"
+            )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+
+    def setUp(self):
+        cache.clear()
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assert_indexed(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.reader_client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        for query in queries:
+            if not query['sql'].startswith('SELECT'):
+                continue
+            for step in self.explain(query['sql']):
+                with self.subTest(url=url, sql=query['sql'], step=step):
+                    self.assertIsNone(FULL_SCAN.search(step))
+                    self.assertNotIn(TEMP_SORT, step)
+        return response
+
+    def assert_feed_indexed(self, url):
+        page = self.assert_indexed(url).context['page_obj']
+        self.assert_indexed(url, {'after': page.next_cursor})
+
+    def test_index(self):
+        self.assert_feed_indexed(reverse("posts:main_page"))
+
+    def test_group_list(self):
+        self.assert_feed_indexed(reverse("posts:group_list", args=[SLUG]))
+
+    def test_profile(self):
+        self.assert_feed_indexed(reverse("posts:profile", args=[USERNAME_1]))
+
+    def test_post_detail(self):
+        self.assert_indexed(reverse("posts:post_detail", args=[self.post.id]))
+        self.assert_indexed(reverse("posts:comment_list", args=[self.post.id]))
+
+    def test_tag_list(self):
+        self.assert_feed_indexed(reverse("posts:tag_list", args=[TAG]))
+
+    def test_follow_index(self):
+        for engine in (FEED_ENGINE_INBOX, FEED_ENGINE_TIMELINE):
+            with self.subTest(engine=engine):
+                with override_settings(FOLLOW_FEED_ENGINE=engine):
+                    self.assert_feed_indexed(reverse("posts:follow_index"))
@@ -0,0 +1,120 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Post, RelatedPost, User
+from ..related import build
+
+USERNAME = 'username'
+CATS = (
+    'Рыжий котик спит на подоконнике',
+    'Котик ловит мышку под подоконником',
+    'Рыжий котик и серая мышка',
+)
+DOGS = (
+    'Пёсик грызёт косточку во дворе',
+    'Большой пёсик охраняет двор',
+    'Пёсик принёс косточку домой',
+)
+OTHER = (
+    'Рецепт борща со сметаной',
+    'Погода на выходные обещает дождь',
+    'Новый роман прочитан за вечер',
+)
+
+
+def related_ids(post):
+    return list(RelatedPost.objects.filter(post=post).order_by(
+        '-score'
+    ).values_list('related_id', flat=True))
+
+
+class RelatedPostsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username=USERNAME)
+        cls.cats = [
+            Post.objects.create(author=cls.user, text=text) for text in CATS
+        ]
+        cls.dogs = [
+            Post.objects.create(author=cls.user, text=text) for text in DOGS
+        ]
+        for text in OTHER:
+            Post.objects.create(author=cls.user, text=text)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_similar_posts_come_first(self):
+        """Похожими считаются посты с общими словами, лучшие первыми"""
+        call_command('build_related_posts', full=True, stdout=StringIO())
+        self.assertEqual(
+            set(related_ids(self.cats[0])),
+            {post.id for post in self.cats[1:]}
+        )
+        self.assertEqual(related_ids(self.cats[2])[0], self.cats[0].id)
+        self.assertEqual(
+            set(related_ids(self.dogs[0])),
+            {post.id for post in self.dogs[1:]}
+        )
+
+    def test_incremental_build_touches_only_changed(self):
+        """Повторный запуск считает только новые и изменённые посты"""
+        build(full=True)
+        dog_rows = list(RelatedPost.objects.filter(
+            post__in=self.dogs
+        ).values_list('id', flat=True))
+        self.assertEqual(build(), (0, 0))
+        new_cat = Post.objects.create(
+            author=self.user, text='Рыжий котик на подоконнике'
+        )
+        vectors, _ = build()
+        self.assertEqual(vectors, 1)
+        self.assertIn(self.cats[0].id, related_ids(new_cat))
+        self.assertIn(new_cat.id, related_ids(self.cats[0]))
+        self.assertEqual(
+            list(RelatedPost.objects.filter(
+                post__in=self.dogs
+            ).values_list('id', flat=True)),
+            dog_rows
+        )
+
+    def test_edited_post_leaves_old_lists(self):
+        """Правка текста убирает пост из списков бывших соседей"""
+        build(full=True)
+        cat = self.cats[1]
+        cat.text = 'Пёсик грызёт косточку'
+        cat.save()
+        self.assertEqual(build()[0], 1)
+        self.assertNotIn(cat.id, related_ids(self.cats[0]))
+        self.assertIn(self.dogs[0].id, related_ids(cat))
+
+    def test_post_detail_shows_related(self):
+        """Страница поста выводит похожие посты после пересчёта"""
+        client = Client()
+        url = reverse('posts:post_detail', args=[self.cats[0].id])
+        self.assertNotContains(client.get(url), 'Похожие записи')
+        build(full=True)
+        response = client.get(url)
+        self.assertContains(response, 'Похожие записи')
+        self.assertContains(
+            response,
+            reverse('posts:post_detail', args=[self.cats[1].id])
+        )
+
+    def test_deleted_post_leaves_related_pages(self):
+        """Удалённый пост пропадает со страниц, где был похожим"""
+        cat = Post.objects.create(
+            author=User.objects.create(username='other'), text=CATS[0]
+        )
+        build(full=True)
+        client = Client()
+        url = reverse('posts:post_detail', args=[self.cats[0].id])
+        deleted_url = reverse('posts:post_detail', args=[cat.id])
+        self.assertContains(client.get(url), deleted_url)
+        cat.delete()
+        self.assertNotContains(client.get(url), deleted_url)
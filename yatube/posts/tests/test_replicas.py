@@ -0,0 +1,101 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core.routers import ReplicaRouter
+
+from ..models import Post, User
+
+REPLICA = 'replica'
+USERNAME = 'username'
+HOME_URL = reverse('posts:main_page')
+POST_CREATE_URL = reverse('posts:post_create')
+FOLLOW_URL = reverse('posts:profile_follow', args=[USERNAME])
+FOLLOW_INDEX_URL = reverse('posts:follow_index')
+OLD_TEXT = 'Пост из снимка'
+NEW_TEXT = 'Пост только в основной базе'
+
+
+@override_settings(
+    DATABASE_REPLICAS=[REPLICA], REPLICA_HEALTH_CHECK_INTERVAL=0
+)
+class ReplicaRouterTests(TransactionTestCase):
+    databases = {DEFAULT_DB_ALIAS, REPLICA}
+
+    @classmethod
+    def setUpClass(cls):
+        # Реплика — копия тестовой базы в отдельном файле
+        cls.directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        cls.path = os.path.join(cls.directory, 'replica.sqlite3')
+        connections.databases[REPLICA] = {
+            'ENGINE': 'core.sqlite3', 'NAME': cls.path,
+        }
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA].close()
+        del connections.databases[REPLICA]
+        delattr(connections._connections, REPLICA)
+        shutil.rmtree(cls.directory, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username=USERNAME)
+        Post.objects.create(author=self.user, text=OLD_TEXT)
+        call_command('sync_replicas', stdout=StringIO())
+        Post.objects.create(author=self.user, text=NEW_TEXT)
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_feed_is_read_from_replica(self):
+        """Лента читается с реплики, которая отстаёт от основной базы"""
+        response = self.guest_client.get(HOME_URL)
+        self.assertContains(response, OLD_TEXT)
+        self.assertNotContains(response, NEW_TEXT)
+
+    def test_author_reads_own_writes(self):
+        """После записи пользователь читает из основной базы"""
+        response = self.authorized_client.post(
+            POST_CREATE_URL, {'text': 'Свежий пост'}
+        )
+        self.assertIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+        self.assertContains(
+            self.authorized_client.get(HOME_URL), 'Свежий пост'
+        )
+        self.assertNotContains(
+            self.guest_client.get(HOME_URL), 'Свежий пост'
+        )
+
+    def test_follower_reads_own_follow(self):
+        """Подписка по ссылке тоже закрепляет за основной базой"""
+        follower_client = Client()
+        follower_client.force_login(User.objects.create(username='follower'))
+        response = follower_client.get(FOLLOW_URL)
+        self.assertIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+        self.assertContains(follower_client.get(FOLLOW_INDEX_URL), NEW_TEXT)
+
+    def test_unhealthy_replica_falls_back_to_primary(self):
+        """Без живой реплики чтение идёт в основную базу"""
+        connections[REPLICA].close()
+        os.remove(self.path)
+        self.assertContains(self.guest_client.get(HOME_URL), NEW_TEXT)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_writes_and_migrations_stay_on_primary(self):
+        """Запись и миграции не попадают на реплики"""
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_write(Post), DEFAULT_DB_ALIAS)
+        self.assertEqual(router.db_for_read(Post), DEFAULT_DB_ALIAS)
+        self.assertFalse(router.allow_migrate(REPLICA, 'posts'))
+        self.assertTrue(router.allow_migrate(DEFAULT_DB_ALIAS, 'posts'))
@@ -14,6 +14,7 @@ ROUTES = [
     [f'/posts/{POST_ID}/', 'post_detail', [POST_ID]],
     ['/create/', 'post_create', None],
     [f'/posts/{POST_ID}/edit/', 'post_edit', [POST_ID]],
+    [f'/posts/{POST_ID}/comments/', 'comment_list', [POST_ID]],
     [f'/posts/{POST_ID}/comment/', 'add_comment', [POST_ID]],
     ['/follow/', 'follow_index', None],
     [f'/profile/{USERNAME}/follow/', 'profile_follow', [USERNAME]],
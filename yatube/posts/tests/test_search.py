@@ -0,0 +1,144 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..const import POSTS_FOR_PAGE
+from ..models import Comment, Post, User
+from ..search import POST_INDEX, SearchResults
+
+USERNAME = 'username'
+SEARCH_URL = reverse('posts:search')
+POST_ADMIN_URL = reverse('admin:posts_post_changelist')
+COMMENT_ADMIN_URL = reverse('admin:posts_comment_changelist')
+
+
+def found(query):
+    return [post.text for post in SearchResults(query)[:100]]
+
+
+class SearchIndexTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username=USERNAME)
+
+    def test_index_follows_every_write(self):
+        """Индекс видит создание, правку, массовые записи и удаление"""
+        post = Post.objects.create(author=self.user, text='Рыжий котик')
+        self.assertEqual(found('котик'), ['Рыжий котик'])
+        post.text = 'Серый пёсик'
+        post.save()
+        self.assertEqual(found('котик'), [])
+        self.assertEqual(found('пёсик'), ['Серый пёсик'])
+        Post.objects.bulk_create([Post(author=self.user, text='Котики')])
+        Post.objects.filter(pk=post.pk).update(text='Котик и пёсик')
+        self.assertCountEqual(found('кот'), ['Котики', 'Котик и пёсик'])
+        Post.objects.all().delete()
+        self.assertEqual(found('кот'), [])
+
+    def test_query_syntax_is_not_interpreted(self):
+        """Кавычки и операторы FTS5 в запросе — просто текст"""
+        Post.objects.create(author=self.user, text='Котик NOT пёсик')
+        for query in ('"котик', 'котик NOT', 'котик*)', '-', ''):
+            with self.subTest(query=query):
+                SearchResults(query)[:10]
+
+    def test_rebuild_command_restores_index(self):
+        """Команда перестраивает индекс из таблицы постов"""
+        Post.objects.create(author=self.user, text='Рыжий котик')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {POST_INDEX} ({POST_INDEX}) "
+                "VALUES ('delete-all')"
+            )
+        self.assertEqual(found('котик'), [])
+        call_command('rebuild_search_index', optimize=True, stdout=StringIO())
+        self.assertEqual(found('котик'), ['Рыжий котик'])
+
+
+class SearchViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username=USERNAME)
+        Post.objects.bulk_create(
+            [Post(author=cls.user, text=f'Про котика номер {index}')
+             for index in range(POSTS_FOR_PAGE + 1)]
+            + [Post(author=cls.user, text='Котик, котик и <b>котик</b>')]
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_results_are_ranked_and_highlighted(self):
+        """Лучшее совпадение первое, совпадения подсвечены и экранированы"""
+        response = self.guest_client.get(SEARCH_URL, {'q': 'котик'})
+        posts = response.context['page_obj'].object_list
+        self.assertEqual(len(posts), POSTS_FOR_PAGE)
+        self.assertEqual(
+            posts[0].snippet,
+            '<mark>Котик</mark>, <mark>котик</mark> и '
+            '&lt;b&gt;<mark>котик</mark>&lt;/b&gt;'
+        )
+        self.assertContains(response, '<mark>котика</mark>')
+
+    def test_results_are_paginated(self):
+        """Последняя страница получает остаток результатов"""
+        response = self.guest_client.get(
+            SEARCH_URL, {'q': 'котик', 'page': 2}
+        )
+        self.assertEqual(response.context['page_obj'].paginator.count,
+                         POSTS_FOR_PAGE + 2)
+        self.assertEqual(len(response.context['page_obj']), 2)
+        self.assertContains(response, 'q=%D0%BA%D0%BE%D1%82%D0%B8%D0%BA')
+
+    def test_every_word_is_required(self):
+        """Все слова запроса должны встретиться в посте"""
+        response = self.guest_client.get(SEARCH_URL, {'q': 'котик номер 3'})
+        self.assertEqual(
+            [post.text for post in response.context['page_obj']],
+            ['Про котика номер 3']
+        )
+
+    def test_empty_query(self):
+        """Пустой запрос показывает форму без результатов"""
+        response = self.guest_client.get(SEARCH_URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['page_obj'].paginator.count, 0)
+
+
+class AdminSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        cls.post = Post.objects.create(author=cls.admin, text='Рыжий котик')
+        Post.objects.create(author=cls.admin, text='Серый пёсик')
+        Comment.objects.create(
+            post=cls.post, author=cls.admin, text='Хороший котик'
+        )
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке постов и комментариев идёт через FTS5"""
+        for url, index in (
+            (POST_ADMIN_URL, 'posts_post_fts'),
+            (COMMENT_ADMIN_URL, 'posts_comment_fts'),
+        ):
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url, {'q': 'кот'})
+                self.assertEqual(response.context['cl'].result_count, 1)
+                sql = ' '.join(query['sql'] for query in queries)
+                self.assertIn(f'{index} MATCH', sql)
+                self.assertNotIn('LIKE', sql)
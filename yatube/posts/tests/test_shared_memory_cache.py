@@ -0,0 +1,132 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from core.shm_cache import SharedMemoryCache
+
+from ..models import Post, User
+
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SHARED_PATH = os.path.join(TEMP_DIR, 'shared.shm')
+HOME_URL = reverse('posts:main_page')
+
+
+def increment(path, times):
+    worker = SharedMemoryCache(path, {})
+    for _ in range(times):
+        worker.incr('counter')
+    return worker.add('lock', os.getpid())
+
+
+class SharedMemoryCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.path = os.path.join(self.directory, 'cache.shm')
+
+    def create(self, classes=None):
+        options = {'CLASSES': classes} if classes else {}
+        return SharedMemoryCache(self.path, {'OPTIONS': options})
+
+    def test_values_are_shared_between_instances(self):
+        """Значение, записанное одним процессом, видно другому"""
+        first, second = self.create(), self.create()
+        first.set('key', {'text': 'значение'})
+        self.assertEqual(second.get('key'), {'text': 'значение'})
+        second.delete('key')
+        self.assertIsNone(first.get('key'))
+
+    def test_value_moves_between_slot_classes(self):
+        """Выросшее значение переезжает в класс с большими слотами"""
+        cache = self.create(((512, 64), (4096, 64)))
+        cache.set('key', 'коротко')
+        cache.set('key', 'x' * 3000)
+        self.assertEqual(cache.get('key'), 'x' * 3000)
+        cache.set('key', 'снова коротко')
+        self.assertEqual(cache.get('key'), 'снова коротко')
+        cache.set('key', 'x' * 5000)
+        self.assertIsNone(cache.get('key'))
+
+    def test_least_recently_read_entry_is_evicted(self):
+        """Из полного набора вытесняется давнее всего прочитанная запись"""
+        cache = self.create(((512, 8),))
+        for number in range(8):
+            cache.set(number, number)
+        for number in range(1, 8):
+            cache.get(number)
+        cache.set('new', 'new')
+        self.assertIsNone(cache.get(0))
+        self.assertEqual(cache.get_many(range(1, 8)), {
+            number: number for number in range(1, 8)
+        })
+
+    def test_expired_values_are_not_returned(self):
+        """Истёкшее значение не отдаётся и не мешает add"""
+        cache = self.create()
+        cache.set('key', 'значение', timeout=0.05)
+        time.sleep(0.1)
+        self.assertIsNone(cache.get('key'))
+        self.assertTrue(cache.add('key', 'новое'))
+        self.assertFalse(cache.add('key', 'третье'))
+
+    def test_incr_and_add_are_atomic_across_processes(self):
+        """incr и add атомарны между процессами"""
+        cache = self.create()
+        cache.set('counter', 0, None)
+        # Напрямую через fork: в manage.py test --parallel тесты идут в
+        # демонических процессах, которым multiprocessing не даёт детей
+        read, write = os.pipe()
+        children = []
+        for _ in range(4):
+            pid = os.fork()
+            if not pid:
+                try:
+                    added = increment(self.path, 200)
+                    os.write(write, b'+' if added else b'-')
+                finally:
+                    os._exit(0)
+            children.append(pid)
+        for pid in children:
+            os.waitpid(pid, 0)
+        os.close(write)
+        with os.fdopen(read, 'rb') as results:
+            added = sorted(results.read())
+        self.assertEqual(cache.get('counter'), 800)
+        self.assertEqual(bytes(added), b'+---')
+
+    def test_new_geometry_resets_file(self):
+        """Файл с другой разметкой начинается с пустого кэша"""
+        self.create().set('key', 'значение')
+        cache = self.create(((512, 64),))
+        self.assertIsNone(cache.get('key'))
+        cache.set('key', 'значение')
+        self.assertEqual(cache.get('key'), 'значение')
+
+
+@override_settings(CACHES={'default': {
+    'BACKEND': 'core.backends.InstrumentedSharedMemoryCache',
+    'LOCATION': SHARED_PATH,
+}})
+class SharedMemoryCacheViewsTests(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def test_pages_are_served_from_shared_memory(self):
+        """Бэкенд подходит для CACHES['default'] как есть"""
+        cache.clear()
+        user = User.objects.create(username='username')
+        Post.objects.create(author=user, text='Пост из общей памяти')
+        self.assertContains(self.client.get(HOME_URL), 'Пост из общей памяти')
+        response = self.client.get(HOME_URL)
+        self.assertContains(response, 'Пост из общей памяти')
+        self.assertIn('page-hit', response['Server-Timing'])
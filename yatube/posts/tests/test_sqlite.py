@@ -0,0 +1,101 @@
+import os
+import shutil
+import tempfile
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import Client, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.db import immediate_atomic, maintain
+
+from ..benchmark import Writer
+from ..models import Comment, Follow, Post, User
+
+
+class SqliteTuningTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='username-1')
+        cls.user_2 = User.objects.create(username='username-2')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_are_applied_to_connection(self):
+        """Каждое соединение получает прагмы из SQLITE_PRAGMAS"""
+        for name, expected in (
+            ('synchronous', 1),
+            ('busy_timeout', settings.SQLITE_PRAGMAS['busy_timeout']),
+            ('cache_size', settings.SQLITE_PRAGMAS['cache_size']),
+            ('temp_store', 2),
+        ):
+            with self.subTest(name=name):
+                self.assertEqual(self.pragma(connection, name), expected)
+
+    def test_file_database_uses_wal(self):
+        """Файловая база переходит в WAL, контрольная точка проходит"""
+        directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        wrapper = DatabaseWrapper({
+            **settings.DATABASES['default'],
+            'NAME': os.path.join(directory, 'db.sqlite3'),
+        })
+        self.addCleanup(wrapper.close)
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        with wrapper.cursor() as cursor:
+            cursor.execute('CREATE TABLE sample (id integer)')
+            cursor.execute('INSERT INTO sample VALUES (1)')
+        busy, wal_pages, moved = maintain(wrapper, 'TRUNCATE')
+        self.assertEqual(busy, 0)
+        self.assertEqual(wal_pages, moved)
+
+    def test_benchmark_writer_writes_comments_and_follows(self):
+        """Писатель нагрузочного прогона создаёт комментарии и подписки"""
+        writer = Writer(
+            [self.user.pk, self.user_2.pk], [self.post.pk],
+            threading.Event(), seed=1
+        )
+        for _ in range(20):
+            writer.write()
+        self.assertTrue(Comment.objects.exists())
+        self.assertLessEqual(Follow.objects.count(), 2)
+
+
+class ImmediateTransactionTests(TransactionTestCase):
+
+    def begins(self, atomic):
+        with CaptureQueriesContext(connection) as queries:
+            with atomic():
+                User.objects.exists()
+        return [
+            query['sql'] for query in queries
+            if query['sql'].startswith('BEGIN')
+        ]
+
+    def test_only_write_blocks_begin_immediate(self):
+        """BEGIN IMMEDIATE открывают только блоки записи"""
+        self.assertEqual(self.begins(transaction.atomic), ['BEGIN'])
+        self.assertEqual(self.begins(immediate_atomic), ['BEGIN IMMEDIATE'])
+
+    def test_post_edit_begins_immediate(self):
+        """Правка поста пишет в блоке BEGIN IMMEDIATE"""
+        user = User.objects.create(username='username-1')
+        post = Post.objects.create(author=user, text='Тестовый пост')
+        client = Client()
+        client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            client.post(
+                reverse('posts:post_edit', args=[post.pk]),
+                {'text': 'Новый текст'}
+            )
+        self.assertIn('BEGIN IMMEDIATE', [query['sql'] for query in queries])
+        self.assertEqual(Post.objects.get(pk=post.pk).text, 'Новый текст')
@@ -0,0 +1,96 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Post, User, UserStats
+from ..stats import get_stats
+
+USERNAME_1 = "username-1"
+USERNAME_2 = "username-2"
+FOLLOW_URL = reverse("posts:profile_follow", args=[USERNAME_1])
+UNFOLLOW_URL = reverse("posts:profile_unfollow", args=[USERNAME_1])
+
+
+class UserStatsTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username=USERNAME_1)
+        cls.reader = User.objects.create(username=USERNAME_2)
+        cls.post = Post.objects.create(author=cls.author, text="Пост")
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text="Коммент"
+        )
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+
+    def setUp(self):
+        cache.clear()
+
+    def counters(self, user):
+        stats = get_stats(user)
+        return stats.posts, stats.followers, stats.following, stats.comments
+
+    def test_first_read_counts_existing_rows(self):
+        """Первое чтение считает счётчики по базе"""
+        self.assertEqual(self.counters(self.author), (1, 0, 0, 0))
+        self.assertEqual(self.counters(self.reader), (0, 0, 0, 1))
+
+    def test_writes_update_counters(self):
+        """Создание и удаление записей меняют счётчики"""
+        get_stats(self.author)
+        get_stats(self.reader)
+        self.reader_client.get(FOLLOW_URL)
+        post = Post.objects.create(author=self.author, text="Ещё пост")
+        Comment.objects.create(post=post, author=self.author, text="Ответ")
+        self.assertEqual(self.counters(self.author), (2, 1, 0, 1))
+        self.assertEqual(self.counters(self.reader), (0, 0, 1, 1))
+        self.reader_client.get(UNFOLLOW_URL)
+        post.delete()
+        self.assertEqual(self.counters(self.author), (1, 0, 0, 0))
+        self.assertEqual(self.counters(self.reader), (0, 0, 0, 1))
+
+    def test_post_delete_does_not_scale_with_comments(self):
+        """Удаление поста не делает запросов на каждый комментарий"""
+        get_stats(self.author)
+        get_stats(self.reader)
+
+        def delete_post(comments):
+            post = Post.objects.create(author=self.author, text="Пост")
+            for number in range(comments):
+                Comment.objects.create(
+                    post=post, author=self.reader, text=f"Коммент {number}"
+                )
+            with CaptureQueriesContext(connection) as queries:
+                post.delete()
+            return len(queries)
+        self.assertEqual(delete_post(2), delete_post(10))
+        self.assertEqual(self.counters(self.author), (1, 0, 0, 0))
+        self.assertEqual(self.counters(self.reader), (0, 0, 0, 1))
+
+    def test_recount_repairs_drift(self):
+        """Команда recount исправляет рассинхронизацию"""
+        get_stats(self.author)
+        UserStats.objects.filter(user=self.author).update(posts=100)
+        Follow.objects.create(user=self.reader, author=self.author)
+        call_command('recount', stdout=StringIO())
+        self.assertEqual(self.counters(self.author), (1, 1, 0, 0))
+
+    def test_profile_reads_counters_in_one_query(self):
+        """Профиль читает все счётчики одним запросом без COUNT"""
+        get_stats(self.author)
+        url = reverse("posts:profile", args=[USERNAME_1])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.reader_client.get(url)
+        self.assertEqual(response.context['stats'].posts, 1)
+        sqls = [query['sql'] for query in queries]
+        self.assertEqual(
+            len([sql for sql in sqls if 'posts_userstats' in sql]), 1
+        )
+        self.assertFalse([sql for sql in sqls if 'COUNT(' in sql])
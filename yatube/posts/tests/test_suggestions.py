@@ -0,0 +1,92 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..graph import FollowGraph
+from ..models import Follow, FollowSuggestion, User
+from ..suggestions import popular_authors, suggest
+
+USERNAMES = ('reader', 'friend', 'author', 'fan', 'star', 'newbie')
+FOLLOWS = (
+    ('reader', 'friend'),
+    ('friend', 'author'),
+    ('friend', 'star'),
+    ('fan', 'reader'),
+    ('fan', 'star'),
+    ('author', 'star'),
+)
+FOLLOW_INDEX_URL = reverse('posts:follow_index')
+
+
+class SuggestionsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = {
+            username: User.objects.create(username=username)
+            for username in USERNAMES
+        }
+        for user, author in FOLLOWS:
+            Follow.objects.create(
+                user=cls.users[user], author=cls.users[author]
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.graph = FollowGraph.load()
+
+    def ids(self, *usernames):
+        return [self.users[username].id for username in usernames]
+
+    def test_graph_arrays(self):
+        """Подписки и подписчики лежат отсортированными отрезками"""
+        self.assertEqual(
+            list(self.graph.following(self.users['friend'].id)),
+            sorted(self.ids('author', 'star'))
+        )
+        self.assertEqual(
+            list(self.graph.followers(self.users['star'].id)),
+            sorted(self.ids('friend', 'fan', 'author'))
+        )
+        self.assertEqual(list(self.graph.following(10 ** 6)), [])
+
+    def test_friends_of_friends_and_audience(self):
+        """Друзья друзей весят больше общей аудитории"""
+        self.assertEqual(
+            suggest(self.graph, self.users['reader'].id),
+            [(self.users['star'].id, 1.5), (self.users['author'].id, 1)]
+        )
+
+    def test_popular_authors_fill_the_list(self):
+        """Новичку без подписок предлагаются самые читаемые авторы"""
+        popular = popular_authors(self.graph, 2)
+        self.assertEqual(popular[0], self.users['star'].id)
+        self.assertEqual(
+            [author_id for author_id, _ in suggest(
+                self.graph, self.users['newbie'].id, popular
+            )],
+            popular
+        )
+
+    def test_suggestions_are_shown_and_dropped_after_follow(self):
+        """Рекомендации видны в ленте и профиле, подписка их убирает"""
+        call_command('build_suggestions', stdout=StringIO())
+        client = Client()
+        client.force_login(self.users['reader'])
+        star_url = reverse('posts:profile', args=['star'])
+        follow_star_url = reverse('posts:profile_follow', args=['star'])
+        response = client.get(FOLLOW_INDEX_URL)
+        self.assertContains(response, follow_star_url)
+        self.assertContains(response, 'подписчиков: 3')
+        self.assertContains(
+            client.get(reverse('posts:profile', args=['author'])),
+            follow_star_url
+        )
+        client.get(follow_star_url)
+        self.assertFalse(FollowSuggestion.objects.filter(
+            user=self.users['reader'], author=self.users['star']
+        ).exists())
+        self.assertNotContains(client.get(star_url), follow_star_url)
@@ -0,0 +1,110 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..const import POSTS_FOR_PAGE
+from ..models import Post, PostTag, User
+from ..tags import extract, link_tags
+
+USERNAME = 'username'
+TAG_URL = reverse('posts:tag_list', args=['котики'])
+
+
+def post_tags(post):
+    return set(post.post_tags.values_list('tag__name', flat=True))
+
+
+class TagsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username=USERNAME)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_extract(self):
+        """Теги берутся целыми словами после # и без учёта регистра"""
+        self.assertEqual(
+            extract('#Котики и #котики, #cats_2! mail#box ##x &#39; #'),
+            {'котики', 'cats_2'}
+        )
+
+    def test_tags_follow_post_text(self):
+        """Теги обновляются при создании и правке поста"""
+        post = Post.objects.create(author=self.user, text='#котики #пёсики')
+        self.assertEqual(post_tags(post), {'котики', 'пёсики'})
+        post.text = 'Только #пёсики и #утки'
+        post.save()
+        self.assertEqual(post_tags(post), {'пёсики', 'утки'})
+
+    def test_tag_feed(self):
+        """Лента тега — посты с тегом, новые сверху, по страницам"""
+        posts = [
+            Post.objects.create(author=self.user, text=f'{index} #Котики')
+            for index in range(POSTS_FOR_PAGE + 1)
+        ]
+        Post.objects.create(author=self.user, text='#пёсики')
+        page = self.guest_client.get(TAG_URL).context['page_obj']
+        self.assertEqual(
+            list(page), posts[::-1][:POSTS_FOR_PAGE]
+        )
+        self.assertEqual(
+            list(self.guest_client.get(
+                TAG_URL, {'after': page.next_cursor}
+            ).context['page_obj']),
+            posts[:1]
+        )
+
+    def test_tag_feed_is_refreshed(self):
+        """Новый пост с тегом и правка без тега сбрасывают кэш ленты"""
+        post = Post.objects.create(author=self.user, text='Первый #котики')
+        self.assertContains(self.guest_client.get(TAG_URL), 'Первый')
+        Post.objects.create(author=self.user, text='Второй #котики')
+        self.assertContains(self.guest_client.get(TAG_URL), 'Второй')
+        post.text = 'Первый без тегов'
+        post.save()
+        self.assertNotContains(self.guest_client.get(TAG_URL), 'Первый')
+
+    def test_unknown_tag(self):
+        """Лента несуществующего тега — 404"""
+        self.assertEqual(
+            self.guest_client.get(
+                reverse('posts:tag_list', args=['нет'])
+            ).status_code,
+            404
+        )
+
+    def test_tags_are_linked_in_text(self):
+        """Теги в тексте ведут на ленты, остальной текст экранирован"""
+        self.assertEqual(
+            link_tags('<b>#Котики</b>'),
+            f'&lt;b&gt;<a href="{TAG_URL}">#Котики</a>&lt;/b&gt;'
+        )
+
+    def test_entities_are_not_tags(self):
+        """Сущности в тексте не становятся ссылками на теги"""
+        for text in ('&#123', 'Tom&#39;s'):
+            with self.subTest(text=text):
+                self.assertNotIn('<a', link_tags(text))
+                self.assertEqual(extract(text), set())
+
+    def test_backfill(self):
+        """Команда разбирает теги постов, созданных в обход save()"""
+        Post.objects.bulk_create([
+            Post(author=self.user, text=f'{index} #котики #пёсики')
+            for index in range(5)
+        ])
+        stale = Post.objects.create(author=self.user, text='#утки')
+        Post.objects.filter(pk=stale.pk).update(text='без тегов')
+        call_command('backfill_tags', chunk_size=2, stdout=StringIO())
+        self.assertEqual(PostTag.objects.count(), 10)
+        self.assertEqual(
+            post_tags(Post.objects.get(text__startswith='0 ')),
+            {'котики', 'пёсики'}
+        )
+        self.assertEqual(post_tags(stale), set())
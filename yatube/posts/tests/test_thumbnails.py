@@ -0,0 +1,108 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, TransactionTestCase
+from django.test import override_settings
+from django.urls import reverse
+
+from ..models import Post, User
+from ..thumbnails import cached, thumbnail_queue
+
+USERNAME = 'username'
+HOME_URL = reverse('posts:main_page')
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+QUEUE_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def create_post(user):
+    return Post.objects.create(
+        author=user,
+        text='Пост с картинкой',
+        image=SimpleUploadedFile(
+            name='small.gif', content=SMALL_GIF, content_type='image/gif'
+        ),
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_QUEUE_WORKERS=2)
+class ThumbnailsTests(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.post = create_post(User.objects.create(username=USERNAME))
+        self.guest_client = Client()
+
+    def test_original_is_served_until_thumbnail_is_ready(self):
+        """Пока миниатюры нет — оригинал, после команды — миниатюра"""
+        self.assertContains(
+            self.guest_client.get(HOME_URL), self.post.image.url
+        )
+        call_command('generate_thumbnails', workers=1, stdout=StringIO())
+        thumbnail = cached(self.post.image)
+        self.assertIsNotNone(thumbnail)
+        response = self.guest_client.get(HOME_URL)
+        self.assertContains(response, thumbnail.url)
+        self.assertNotContains(response, self.post.image.url)
+
+    def test_variants_are_rendered_with_srcset(self):
+        """Варианты в WebP и формате оригинала выводятся через srcset"""
+        call_command('generate_thumbnails', workers=1, stdout=StringIO())
+        response = self.guest_client.get(HOME_URL)
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, 'width="960" height="339"')
+        content = response.content.decode()
+        for width in (480, 720, 960):
+            with self.subTest(width=width):
+                self.assertIn(f'.webp {width}w', content)
+                self.assertIn(f'.gif {width}w', content)
+
+    def test_command_skips_ready_thumbnails(self):
+        """Повторный запуск команды ничего не генерирует"""
+        call_command('generate_thumbnails', workers=1, stdout=StringIO())
+        output = StringIO()
+        call_command('generate_thumbnails', workers=1, stdout=output)
+        self.assertIn('Без миниатюр: 0', output.getvalue())
+
+
+@override_settings(MEDIA_ROOT=QUEUE_MEDIA_ROOT, THUMBNAIL_QUEUE_WORKERS=2)
+class ThumbnailQueueTests(TransactionTestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(QUEUE_MEDIA_ROOT, ignore_errors=True)
+
+    def test_thumbnail_is_generated_after_commit(self):
+        """После сохранения миниатюру готовит фоновая очередь"""
+        cache.clear()
+        post = create_post(User.objects.create(username=USERNAME))
+        thumbnail_queue.join()
+        self.assertIsNotNone(cached(post.image))
+
+    def test_queue_stops_before_media_root_changes(self):
+        """Смена MEDIA_ROOT дожидается потоков очереди"""
+        create_post(User.objects.create(username=USERNAME))
+        threads = list(thumbnail_queue.threads)
+        self.assertTrue(threads)
+        with override_settings(MEDIA_ROOT=QUEUE_MEDIA_ROOT):
+            pass
+        self.assertEqual(thumbnail_queue.threads, [])
+        self.assertFalse(any(thread.is_alive() for thread in threads))
@@ -0,0 +1,96 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ..const import FEED_ENGINE_TIMELINE, POSTS_FOR_PAGE
+from ..models import Follow, Post, User
+from ..timelines import load_timelines
+
+USERNAME_1 = "username-1"
+USERNAME_2 = "username-2"
+USERNAME_3 = "username-3"
+FOLLOW_INDEX_URL = reverse("posts:follow_index")
+
+
+@override_settings(FOLLOW_FEED_ENGINE=FEED_ENGINE_TIMELINE)
+class TimelineFeedTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author_1 = User.objects.create(username=USERNAME_1)
+        cls.author_2 = User.objects.create(username=USERNAME_2)
+        cls.reader = User.objects.create(username=USERNAME_3)
+        for i in range(POSTS_FOR_PAGE):
+            Post.objects.create(author=cls.author_1, text=f"Пост {i}")
+            Post.objects.create(author=cls.author_2, text=f"Пост {i}")
+        Follow.objects.create(user=cls.reader, author=cls.author_1)
+        Follow.objects.create(user=cls.reader, author=cls.author_2)
+        cls.client_reader = Client()
+        cls.client_reader.force_login(cls.reader)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feed_merges_author_timelines(self):
+        """Лента подписок — слияние лент авторов от новых к старым"""
+        expected = list(Post.objects.order_by('-id'))
+        page = self.client_reader.get(FOLLOW_INDEX_URL).context['page_obj']
+        self.assertEqual(list(page), expected[:POSTS_FOR_PAGE])
+        page = self.client_reader.get(
+            FOLLOW_INDEX_URL, {'after': page.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(page), expected[POSTS_FOR_PAGE:])
+        self.assertFalse(page.has_next())
+
+    def test_cold_timelines_are_read_in_one_query(self):
+        """Ленты всех авторов, которых нет в кэше, читаются одним запросом"""
+        with self.assertNumQueries(1):
+            timelines = load_timelines([self.author_1.id, self.author_2.id])
+        self.assertEqual(sorted(
+            [post_id for _, post_id in timeline] for timeline in timelines
+        ), sorted(
+            list(Post.objects.filter(author=author).order_by(
+                'pub_date', 'id'
+            ).values_list('id', flat=True))
+            for author in (self.author_1, self.author_2)
+        ))
+        with self.assertNumQueries(0):
+            load_timelines([self.author_1.id, self.author_2.id])
+
+    def test_signals_update_cached_timeline(self):
+        """Создание и удаление поста обновляют ленту автора в кэше"""
+        [timeline] = load_timelines([self.author_1.id])
+        post = Post.objects.create(author=self.author_1, text="Новый пост")
+        [timeline] = load_timelines([self.author_1.id])
+        self.assertEqual(timeline[-1][1], post.id)
+        post.delete()
+        [timeline] = load_timelines([self.author_1.id])
+        self.assertNotIn(post.id, [post_id for _, post_id in timeline])
+
+    def test_feed_follows_pub_date_not_id(self):
+        """Порядок ленты задаёт pub_date, даже если он расходится с id"""
+        now = timezone.now()
+        for number, post in enumerate(Post.objects.order_by('id')):
+            Post.objects.filter(id=post.id).update(
+                pub_date=now - timedelta(minutes=number)
+            )
+        expected = list(Post.objects.order_by('-pub_date', '-id'))
+        page = self.client_reader.get(FOLLOW_INDEX_URL).context['page_obj']
+        self.assertEqual(list(page), expected[:POSTS_FOR_PAGE])
+        page = self.client_reader.get(
+            FOLLOW_INDEX_URL, {'after': page.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(page), expected[POSTS_FOR_PAGE:])
+        page = self.client_reader.get(
+            FOLLOW_INDEX_URL, {'before': page.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(page), expected[:POSTS_FOR_PAGE])
+
+    def test_inbox_is_not_filled(self):
+        """При движке timeline ленты в базе не заполняются"""
+        Post.objects.create(author=self.author_1, text="Новый пост")
+        self.assertFalse(self.reader.inbox.exists())
@@ -0,0 +1,114 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from core.cache import LocalLRU, TwoTierCache
+
+
+class TwoTierCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.path = os.path.join(self.directory, 'cache.sqlite3')
+
+    def worker(self, **options):
+        """Кэш отдельного воркера: своя память, общий файл."""
+        options.setdefault('SYNC_INTERVAL', 0)
+        cache = TwoTierCache(self.path, {'OPTIONS': options})
+        cache.local = LocalLRU(
+            options.get('LOCAL_MAX_ENTRIES', 1000),
+            options.get('LOCAL_MAX_BYTES', 1024 ** 2),
+        )
+        return cache
+
+    def test_invalidation_reaches_other_workers(self):
+        """Изменение в одном воркере выбрасывает копию в другом"""
+        first, second = self.worker(), self.worker()
+        first.set('key', 'старое')
+        self.assertEqual(second.get('key'), 'старое')
+        first.set('key', 'новое')
+        self.assertEqual(second.get('key'), 'новое')
+        first.delete('key')
+        self.assertIsNone(second.get('key'))
+        second.set('counter', 1)
+        self.assertEqual(first.get('counter'), 1)
+        second.incr('counter')
+        self.assertEqual(first.get('counter'), 2)
+        first.clear()
+        self.assertIsNone(second.get('counter'))
+
+    def test_writes_of_same_process_reach_local_tier(self):
+        """Запись другого потока процесса выбрасывает устаревшую копию"""
+        first, second = self.worker(), self.worker()
+        second.local = first.local
+        first.set('key', 'старое')
+        stale = first.local.get(first.make_key('key'))
+        second.set('key', 'новое')
+        # Поток, прочитавший значение до записи, кладёт его в память позже
+        first.local.set(first.make_key('key'), stale, time.time() + 60)
+        self.assertEqual(first.get('key'), 'новое')
+
+    def test_local_copy_lives_until_sync(self):
+        """Между синхронизациями чтение идёт из памяти"""
+        first = self.worker()
+        second = self.worker(SYNC_INTERVAL=60)
+        first.set('key', 'старое')
+        self.assertEqual(second.get('key'), 'старое')
+        first.set('key', 'новое')
+        self.assertEqual(second.get('key'), 'старое')
+        second.local.synced = 0
+        self.assertEqual(second.get('key'), 'новое')
+
+    def test_truncated_log_clears_local_tier(self):
+        """Если журнал обрезан, память сбрасывается целиком"""
+        first = self.worker(LOG_LENGTH=1)
+        second = self.worker()
+        first.set('key', 'старое')
+        second.get('key')
+        for number in range(1001):
+            first.set(f'other-{number}', number)
+        self.assertIsNone(second.shared.changes_since(1)[1])
+        second.get('other-0')
+        self.assertNotIn(second.make_key('key'), second.local.entries)
+
+    def test_local_tier_is_bounded(self):
+        """Локальный уровень держит не больше заданного числа записей"""
+        cache = self.worker(LOCAL_MAX_ENTRIES=2, SYNC_INTERVAL=60)
+        for key in ('a', 'b', 'c'):
+            cache.set(key, key)
+        self.assertEqual(len(cache.local.entries), 2)
+        self.assertEqual(cache.get_many(['a', 'b', 'c']), {
+            'a': 'a', 'b': 'b', 'c': 'c'
+        })
+
+    def test_expired_values_are_not_returned(self):
+        """Истёкшее значение не отдаётся ни из памяти, ни из файла"""
+        cache = self.worker()
+        cache.set('key', 'значение', timeout=0.05)
+        time.sleep(0.1)
+        self.assertIsNone(cache.get('key'))
+        self.assertTrue(cache.add('key', 'новое'))
+
+    def test_add_is_atomic_across_workers(self):
+        """Из параллельных add успешен ровно один"""
+        workers = [self.worker() for _ in range(8)]
+        results = []
+        barrier = threading.Barrier(len(workers))
+
+        def add(cache):
+            barrier.wait()
+            results.append(cache.add('lock', os.getpid()))
+        threads = [
+            threading.Thread(target=add, args=(cache,)) for cache in workers
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(results), [False] * 7 + [True])
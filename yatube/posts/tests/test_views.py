@@ -1,14 +1,24 @@
+import json
+import os
 import shutil
 import tempfile
 
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.template import Context, Template
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..const import POSTS_FOR_PAGE
+from core.middleware.queries import QueryBudgetExceeded, QueryRecorder
+
+from ..const import (
+    COMMENTS_FOR_PAGE, POST_IMAGE_FORMATS, POST_IMAGE_WIDTHS, POSTS_FOR_PAGE
+)
 from ..models import Comment, Follow, Group, Post, User
+from ..page_cache import FEED_SCOPE, get_generations
 
 USERNAME_1 = "username-1"
 USERNAME_2 = "username-2"
@@ -40,6 +50,7 @@ SMALL_GIF = (
     b'\x0A\x00\x3B'
 )
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+TIMING_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -183,15 +194,60 @@ class PostPagesTests(TestCase):
             ).exists()
         )
 
-    def test_main_page_is_cached(self):
-        """главная страница кэшируется"""
-        response_first = self.guest_client.get(HOME_URL)
-        Post.objects.all().delete()
-        response_second = self.guest_client.get(HOME_URL)
-        self.assertEqual(response_first.content, response_second.content)
-        cache.clear()
-        response_third = self.guest_client.get(HOME_URL)
-        self.assertNotEqual(response_first.content, response_third.content)
+    def test_cached_post_page_makes_no_queries(self):
+        """Страница поста из кэша отдаётся без запросов к базе"""
+        self.guest_client.get(self.POST_DETAIL_URL)
+        with self.assertNumQueries(0):
+            self.guest_client.get(self.POST_DETAIL_URL)
+
+    def test_moved_post_leaves_old_group_page(self):
+        """Старая группа читается из базы, только если группа сменилась"""
+        post = Post.objects.select_related('group').get(id=self.post.id)
+        self.assertContains(self.guest_client.get(GROUP_LIST_1_URL), post.text)
+        with CaptureQueriesContext(connection) as queries:
+            post.save()
+        self.assertFalse(
+            [query for query in queries if 'posts_group' in query['sql']]
+        )
+        post.group = self.group_2
+        post.save()
+        self.assertNotContains(
+            self.guest_client.get(GROUP_LIST_1_URL), post.text
+        )
+
+    def test_renamed_author_is_shown_on_cached_pages(self):
+        """Смена имени автора сбрасывает ленты, вход — нет"""
+        for url in (HOME_URL, PROFILE_1_URL):
+            self.guest_client.get(url)
+        generations = get_generations([FEED_SCOPE])
+        Client().force_login(self.user_1)
+        self.assertEqual(get_generations([FEED_SCOPE]), generations)
+        author = User.objects.get(id=self.user_1.id)
+        author.first_name = "Переименованный"
+        author.save()
+        for url in (HOME_URL, PROFILE_1_URL):
+            with self.subTest(url=url):
+                self.assertContains(
+                    self.guest_client.get(url), "Переименованный"
+                )
+
+    def test_feed_pages_are_cached(self):
+        """ленты кэшируются до ближайшей записи"""
+        for url in (HOME_URL, GROUP_LIST_1_URL, PROFILE_1_URL):
+            with self.subTest(url=url):
+                response_first = self.guest_client.get(url)
+                Post.objects.filter(id=self.post.id).update(text="Тихо")
+                response_second = self.guest_client.get(url)
+                self.assertEqual(
+                    response_first.content, response_second.content
+                )
+                Post.objects.create(
+                    author=self.user_1, text="Новый пост", group=self.group
+                )
+                response_third = self.guest_client.get(url)
+                self.assertNotEqual(
+                    response_first.content, response_third.content
+                )
 
 
 class PostsPaginatorViewsTests(TestCase):
@@ -243,3 +299,209 @@ class PostsPaginatorViewsTests(TestCase):
                         self.author.get(url).context.get('page_obj')
                     ), posts_count
                 )
+
+
+class CommentsViewsTests(TestCase):
+    ALL_COMMENTS = COMMENTS_FOR_PAGE + 5
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username=USERNAME_1)
+        cls.post = Post.objects.create(author=cls.user, text="Тестовый пост")
+        for i in range(cls.ALL_COMMENTS):
+            Comment.objects.create(
+                author=User.objects.create(username=f"commenter-{i}"),
+                post=cls.post,
+                text=f"Коммент {i}",
+            )
+        cls.POST_DETAIL_URL = reverse(
+            "posts:post_detail", args=[cls.post.id]
+        )
+        cls.COMMENT_LIST_URL = reverse(
+            "posts:comment_list", args=[cls.post.id]
+        )
+        cls.guest_client = Client()
+
+    def test_comment_count_is_denormalized(self):
+        """Количество комментариев хранится в посте"""
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, self.ALL_COMMENTS)
+        Comment.objects.filter(post=self.post).first().delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, self.ALL_COMMENTS - 1)
+
+    def test_comments_are_paginated(self):
+        """Комментарии загружаются порциями с подгрузкой фрагментом"""
+        response = self.guest_client.get(self.POST_DETAIL_URL)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_FOR_PAGE)
+        self.assertTrue(comments.has_next())
+        fragment = self.guest_client.get(
+            self.COMMENT_LIST_URL, {'after': comments.next_cursor}
+        )
+        self.assertEqual(
+            len(fragment.context['comments']),
+            self.ALL_COMMENTS - COMMENTS_FOR_PAGE
+        )
+        self.assertTemplateUsed(
+            fragment, 'posts/includes/comment_list.html'
+        )
+
+    def test_comment_authors_are_joined(self):
+        """Авторы комментариев не запрашиваются по одному"""
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client.get(self.POST_DETAIL_URL)
+        user_lookups = [
+            query for query in queries
+            if query['sql'].startswith('SELECT "auth_user"."id"')
+        ]
+        self.assertEqual(user_lookups, [])
+
+
+@override_settings(QUERY_BUDGET_STRICT=True, QUERY_REPORT_PATH=None)
+class QueryBudgetTests(TestCase):
+    ALL_POSTS = POSTS_FOR_PAGE * 2
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username=USERNAME_1)
+        cls.user_2 = User.objects.create(username=USERNAME_2)
+        cls.group = Group.objects.create(
+            title="Тестовая группа",
+            slug=SLUG_1,
+            description="Тестовое описание",
+        )
+        for i in range(cls.ALL_POSTS):
+            cls.post = Post.objects.create(
+                author=cls.user, group=cls.group, text=f"Тестовый пост {i}"
+            )
+            Comment.objects.create(
+                author=cls.user_2, post=cls.post, text=f"Коммент {i}"
+            )
+        Follow.objects.create(user=cls.user_2, author=cls.user)
+        cls.guest_client = Client()
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user_2)
+        cls.urls = [
+            HOME_URL,
+            GROUP_LIST_1_URL,
+            PROFILE_1_URL,
+            FOLLOW_INDEX_URL,
+            reverse("posts:post_detail", args=[cls.post.id]),
+            reverse("posts:comment_list", args=[cls.post.id]),
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_views_fit_query_budget(self):
+        """Вью укладываются в бюджет запросов и без кэша"""
+        for client in (self.guest_client, self.authorized_client):
+            for url in self.urls:
+                with self.subTest(url=url):
+                    cache.clear()
+                    client.get(url)
+
+    def test_budget_overrun_fails(self):
+        """Превышение бюджета роняет запрос в строгом режиме"""
+        with override_settings(QUERY_BUDGETS={'posts:main_page': 0}):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.guest_client.get(HOME_URL)
+
+    def test_sample_is_written_to_report(self):
+        """Выборка дописывается в QUERY_REPORT_PATH, если он задан"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'query_report.jsonl')
+            with override_settings(QUERY_REPORT_PATH=path):
+                self.guest_client.get(HOME_URL)
+            with open(path) as report:
+                [entry] = map(json.loads, report)
+        self.assertEqual(entry['view'], 'posts:main_page')
+
+    def test_n_plus_one_is_traced_to_template(self):
+        """Повторяющиеся запросы группируются с указанием строки шаблона"""
+        recorder = QueryRecorder()
+        template = Template(
+            "{% for post in posts %}\n{{ post.author.username }}"
+            "{% endfor %}"
+        )
+        with connection.execute_wrapper(recorder):
+            template.render(Context({'posts': Post.objects.all()[:5]}))
+        [repeated] = recorder.repeated_shapes(3)
+        self.assertEqual(repeated['count'], 5)
+        self.assertIn('"auth_user"."id" = ?', repeated['shape'])
+        [origin] = repeated['origins']
+        self.assertTrue(origin.endswith(':2'))
+
+
+@override_settings(MEDIA_ROOT=TIMING_MEDIA_ROOT)
+class ServerTimingTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username=USERNAME_1)
+        cls.guest_client = Client()
+
+    def setUp(self):
+        cache.clear()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TIMING_MEDIA_ROOT, ignore_errors=True)
+
+    def metrics(self, response):
+        return dict(
+            metric.split(';', 1) if ';' in metric else (metric, '')
+            for metric in response['Server-Timing'].split(',')
+        )
+
+    def test_header_splits_request_by_layers(self):
+        """Server-Timing разбивает запрос на SQL, шаблоны и кэш страниц"""
+        Post.objects.create(author=self.user, text="Тестовый пост")
+        metrics = self.metrics(self.guest_client.get(HOME_URL))
+        for name in ('db', 'tpl', 'cache', 'total'):
+            with self.subTest(name=name):
+                self.assertIn('dur=', metrics[name])
+        self.assertEqual(metrics['page-miss'], 'desc="1"')
+        metrics = self.metrics(self.guest_client.get(HOME_URL))
+        self.assertEqual(metrics['page-hit'], 'desc="1"')
+        self.assertEqual(metrics['page-miss'], 'desc="0"')
+
+    def create_post_with_image(self):
+        Post.objects.create(
+            author=self.user,
+            text="Пост с картинкой",
+            image=SimpleUploadedFile(
+                name='small.gif', content=SMALL_GIF, content_type='image/gif'
+            ),
+        )
+
+    @override_settings(THUMBNAIL_QUEUE_WORKERS=2)
+    def test_thumbnail_is_only_looked_up_in_request(self):
+        """В запросе миниатюра только ищется, генерация — вне запроса"""
+        self.create_post_with_image()
+        metrics = self.metrics(self.guest_client.get(HOME_URL))
+        self.assertIn('thumb', metrics)
+        self.assertNotIn('thumb-generate', metrics)
+
+    @override_settings(THUMBNAIL_QUEUE_WORKERS=0)
+    def test_thumbnail_generation_is_timed(self):
+        """Генерация миниатюры в запросе попадает в отдельную метрику"""
+        self.create_post_with_image()
+        metrics = self.metrics(self.guest_client.get(HOME_URL))
+        self.assertIn('thumb', metrics)
+        variants = len(POST_IMAGE_WIDTHS) * (len(POST_IMAGE_FORMATS) + 1)
+        self.assertIn(f'desc="{variants}"', metrics['thumb-generate'])
+
+    def test_request_is_logged_by_view_name(self):
+        """Каждый запрос пишет строку лога с именем вью"""
+        with self.assertLogs('core.middleware.timing', 'INFO') as logs:
+            self.guest_client.get(PROFILE_1_URL)
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(record['view'], 'posts:profile')
+        self.assertIn('db', record['durations_ms'])
+        self.assertIn('page', record['cache'])
@@ -0,0 +1,285 @@
+"""Адаптивные варианты картинок постов, которые готовятся вне запроса.
+
+Каждая картинка режется под рамку POST_IMAGE_SIZE в нескольких ширинах
+(POST_IMAGE_WIDTHS) — в форматах POST_IMAGE_FORMATS и в формате
+оригинала. Файлы кладёт sorl в своё хранилище рядом с оригиналами, а
+шаблон выводит их через <picture> с srcset и sizes: телефон скачивает
+узкий WebP, а явные width и height не дают странице прыгать.
+
+После сохранения поста с картинкой имя файла уходит в очередь, которую
+разбирают фоновые потоки процесса (THUMBNAIL_QUEUE_WORKERS): декодирование
+и ресайз больше не достаются первому читателю. Пока вариантов нет, тег
+post_image отдаёт оригинал в той же рамке. Когда варианты готовы,
+карточки и страницы поста сбрасываются, чтобы в кэше не остался
+оригинал.
+
+Потоки останавливаются при выходе из процесса и при смене MEDIA_ROOT:
+начатая картинка дописывается, остальная очередь отбрасывается.
+Картинки, загруженные раньше или потерянные при перезапуске процесса,
+догоняет команда generate_thumbnails.
+"""
+import atexit
+import hashlib
+import logging
+import os
+import queue
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.db import close_old_connections, transaction
+from django.dispatch import receiver
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from core.timing import timer
+
+from . import page_cache
+from .cards import invalidate_cards
+from .const import (
+    POST_IMAGE_CACHE_TIME, POST_IMAGE_FORMATS, POST_IMAGE_OPTIONS,
+    POST_IMAGE_SIZE, POST_IMAGE_SIZES, POST_IMAGE_WIDTHS
+)
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+REFRESH_BATCH_SIZE = 500
+IMAGE_KEY = 'post-image:{digest}'
+MIME_TYPES = {
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'GIF': 'image/gif',
+}
+
+
+class ResponsiveImage:
+    """Картинка для шаблона: запасной src, srcset и источники форматов."""
+
+    sizes = POST_IMAGE_SIZES
+
+    def __init__(self, url, width, height, srcset='', sources=()):
+        self.url = url
+        self.width = width
+        self.height = height
+        self.srcset = srcset
+        self.sources = list(sources)
+
+
+def variants(image):
+    """Пары (геометрия, параметры sorl) всех вариантов картинки.
+
+    Последним идёт формат оригинала: он же запасной для <img>.
+    """
+    width, height = POST_IMAGE_SIZE
+    source_format = default.backend._get_format(ImageFile(image))
+    formats = [
+        image_format for image_format in POST_IMAGE_FORMATS
+        if image_format != source_format
+    ] + [source_format]
+    for image_format in formats:
+        for target in POST_IMAGE_WIDTHS:
+            yield (
+                f'{target}x{round(height * target / width)}',
+                dict(POST_IMAGE_OPTIONS, format=image_format),
+            )
+
+
+def thumbnail_name(image, geometry, options):
+    """Имя файла варианта — так же, как его строит sorl."""
+    backend = default.backend
+    options = dict(options)
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(thumbnail_settings, attr)
+        if value != getattr(default_settings, attr):
+            options.setdefault(key, value)
+    return backend._get_thumbnail_filename(
+        ImageFile(image), geometry, options
+    )
+
+
+def image_key(image):
+    name = getattr(image, 'name', image)
+    return IMAGE_KEY.format(digest=hashlib.md5(
+        f'{name}:{POST_IMAGE_WIDTHS}:{POST_IMAGE_FORMATS}'.encode()
+    ).hexdigest())
+
+
+def build(thumbnails):
+    """ResponsiveImage из пар (формат, миниатюра) в порядке variants."""
+    by_format = {}
+    for image_format, thumbnail in thumbnails:
+        by_format.setdefault(image_format, []).append(thumbnail)
+    *alternatives, fallback = [
+        (image_format, ', '.join(
+            f'{thumbnail.url} {thumbnail.width}w' for thumbnail in group
+        ))
+        for image_format, group in by_format.items()
+    ]
+    largest = by_format[fallback[0]][-1]
+    return ResponsiveImage(
+        largest.url, largest.width, largest.height, fallback[1], [
+            {'type': MIME_TYPES[image_format], 'srcset': srcset}
+            for image_format, srcset in alternatives
+        ]
+    )
+
+
+def cached(image):
+    """Готовые варианты картинки или None — без генерации."""
+    with timer('thumb'):
+        key = image_key(image)
+        responsive = cache.get(key)
+        if responsive is not None:
+            return responsive
+        thumbnails = []
+        for geometry, options in variants(image):
+            thumbnail = default.kvstore.get(ImageFile(
+                thumbnail_name(image, geometry, options), default.storage
+            ))
+            if not thumbnail:
+                return None
+            thumbnails.append((options['format'], thumbnail))
+        responsive = build(thumbnails)
+        cache.set(key, responsive, POST_IMAGE_CACHE_TIME)
+        return responsive
+
+
+def generate(image):
+    """Готовит все варианты картинки."""
+    responsive = build(
+        (options['format'], get_thumbnail(image, geometry, **options))
+        for geometry, options in variants(image)
+    )
+    cache.set(image_key(image), responsive, POST_IMAGE_CACHE_TIME)
+    return responsive
+
+
+def original(image):
+    """Оригинал в рамке миниатюры, пока варианты не готовы."""
+    return ResponsiveImage(image.url, *POST_IMAGE_SIZE)
+
+
+def refresh_pages(names):
+    """Сбрасывает карточки и страницы постов с этими картинками."""
+    names = list(names)
+    scopes = set()
+    for start in range(0, len(names), REFRESH_BATCH_SIZE):
+        posts = Post.objects.filter(
+            image__in=names[start:start + REFRESH_BATCH_SIZE]
+        ).select_related('author', 'group')
+        for post in posts.iterator():
+            invalidate_cards(post)
+            scopes.update(page_cache.post_scopes(post))
+    page_cache.bump(*scopes)
+
+
+class ThumbnailQueue:
+    """Очередь картинок, которую разбирают фоновые потоки процесса."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = None
+
+    def reset(self):
+        # После fork потоки родителя в дочернем процессе не работают
+        self.pid = os.getpid()
+        self.tasks = queue.Queue()
+        self.pending = set()
+        self.threads = []
+
+    def put(self, name):
+        with self.lock:
+            if self.pid != os.getpid():
+                self.reset()
+            if name in self.pending:
+                return
+            self.pending.add(name)
+            self.threads = [
+                thread for thread in self.threads if thread.is_alive()
+            ]
+            while len(self.threads) < settings.THUMBNAIL_QUEUE_WORKERS:
+                thread = threading.Thread(target=self.work, daemon=True)
+                thread.start()
+                self.threads.append(thread)
+            self.tasks.put(name)
+
+    def work(self):
+        while True:
+            name = self.tasks.get()
+            if name is None:
+                self.tasks.task_done()
+                return
+            try:
+                if not cached(name):
+                    generate(name)
+                    refresh_pages([name])
+            except Exception:
+                logger.exception('Не удалось подготовить миниатюру %s', name)
+            finally:
+                with self.lock:
+                    self.pending.discard(name)
+                close_old_connections()
+                self.tasks.task_done()
+
+    def join(self):
+        """Ждёт, пока очередь опустеет (для тестов и команд)."""
+        if self.pid == os.getpid():
+            self.tasks.join()
+
+    def stop(self):
+        """Отбрасывает очередь и ждёт, пока потоки допишут начатое."""
+        with self.lock:
+            if self.pid != os.getpid():
+                return
+            while True:
+                try:
+                    name = self.tasks.get_nowait()
+                except queue.Empty:
+                    break
+                self.pending.discard(name)
+                self.tasks.task_done()
+            threads, self.threads = self.threads, []
+            for _ in threads:
+                self.tasks.put(None)
+        for thread in threads:
+            thread.join()
+
+
+thumbnail_queue = ThumbnailQueue()
+atexit.register(thumbnail_queue.stop)
+
+
+@receiver(setting_changed)
+def stop_thumbnail_queue(setting, **kwargs):
+    # Потоки пишут в хранилище под MEDIA_ROOT: прежде чем каталог
+    # сменят или удалят, они должны закончить
+    if setting == 'MEDIA_ROOT':
+        thumbnail_queue.stop()
+
+
+def schedule(post):
+    """Поставить картинку поста в очередь после фиксации транзакции."""
+    if post.image and settings.THUMBNAIL_QUEUE_WORKERS:
+        name = post.image.name
+        transaction.on_commit(lambda: thumbnail_queue.put(name))
+
+
+def thumbnail_or_original(image):
+    """Варианты картинки, если уже готовы, иначе оригинал."""
+    if not image:
+        return None
+    responsive = cached(image)
+    if responsive or settings.THUMBNAIL_QUEUE_WORKERS:
+        return responsive or original(image)
+    try:
+        return generate(image)
+    except Exception:
+        logger.exception('Не удалось подготовить миниатюру %s', image.name)
+        return original(image)
@@ -0,0 +1,155 @@
+"""Ленты авторов в кэше и сборка ленты подписок слиянием.
+
+Для каждого автора в кэше лежат ключи (pub_date в микросекундах, id)
+его последних TIMELINE_LENGTH постов компактным массивом по возрастанию.
+Лента подписок собирается слиянием кучей таких лент по тому же ключу,
+что у CursorPaginator, поэтому порядок не зависит от того, совпадает
+ли pub_date с порядком id; из базы читаются только посты текущей
+страницы.
+
+Промахи кэша дочитываются одним запросом на всех авторов (номер поста
+в ленте автора считает оконная функция). Новый или удалённый пост
+не правит массив в кэше, а выбрасывает ленту автора: правка «прочитал,
+изменил, записал» теряла бы параллельные изменения.
+"""
+import heapq
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from itertools import islice
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from . import graph
+from .const import (
+    TIMELINE_AUTHORS_PER_QUERY, TIMELINE_CACHE_TIME, TIMELINE_LENGTH
+)
+from .models import Post
+from .paginator import CursorPaginator
+from .utils import batched
+
+TIMELINE_KEY = 'timeline:{author_id}'
+TIMELINE_TYPECODE = 'q'
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def timeline_key(author_id):
+    return TIMELINE_KEY.format(author_id=author_id)
+
+
+def sort_value(pub_date):
+    """pub_date целым числом микросекунд: первая часть ключа ленты."""
+    return (pub_date - EPOCH) // MICROSECOND
+
+
+def to_bytes(timeline):
+    return array(TIMELINE_TYPECODE, (
+        number for entry in timeline for number in entry
+    )).tobytes()
+
+
+def from_bytes(data):
+    numbers = array(TIMELINE_TYPECODE)
+    numbers.frombytes(data)
+    return list(zip(numbers[::2], numbers[1::2]))
+
+
+def read_timelines(author_ids):
+    """Ленты авторов из базы одним запросом на пачку авторов."""
+    timelines = {author_id: [] for author_id in author_ids}
+    for block in batched(timelines, TIMELINE_AUTHORS_PER_QUERY):
+        # Лента живёт в кэше сутки, поэтому читаем её не с реплики
+        ranked = Post.objects.using(DEFAULT_DB_ALIAS).filter(
+            author_id__in=block
+        ).order_by().annotate(number=Window(
+            RowNumber(),
+            partition_by=[F('author_id')],
+            order_by=[F('pub_date').desc(), F('id').desc()],
+        )).values_list('author_id', 'id', 'pub_date', 'number')
+        sql, params = ranked.query.sql_with_params()
+        # raw, чтобы pub_date прошёл через преобразования бэкенда
+        posts = Post.objects.using(DEFAULT_DB_ALIAS).raw(
+            f'SELECT id, author_id, pub_date FROM ({sql}) WHERE number <= %s',
+            (*params, TIMELINE_LENGTH)
+        )
+        for post in posts:
+            timelines[post.author_id].append(
+                (sort_value(post.pub_date), post.id)
+            )
+    for timeline in timelines.values():
+        timeline.sort()
+    return timelines
+
+
+def load_timelines(author_ids):
+    """Ленты авторов (ключи постов по возрастанию); промахи дочитываются."""
+    keys = {timeline_key(author_id): author_id for author_id in author_ids}
+    cached = cache.get_many(keys)
+    timelines = [from_bytes(data) for data in cached.values()]
+    missing = read_timelines([keys[key] for key in keys.keys() - cached])
+    cache.set_many({
+        timeline_key(author_id): to_bytes(timeline)
+        for author_id, timeline in missing.items()
+    }, TIMELINE_CACHE_TIME)
+    timelines.extend(missing.values())
+    return timelines
+
+
+def load_user_timelines(user):
+    return load_timelines(graph.following(user.pk))
+
+
+def invalidate_timeline(author_id):
+    """Выбрасывает ленту автора из кэша сейчас и после фиксации.
+
+    Читатель, успевший до фиксации заполнить кэш из базы, оставил бы
+    ленту без нового поста — её убирает вторая очистка.
+    """
+    key = timeline_key(author_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+class TimelinePaginator(CursorPaginator):
+    """Паджинатор ленты подписок поверх слияния лент авторов."""
+
+    def __init__(self, timelines, per_page):
+        self.key = 'pub_date'
+        self.tiebreak = 'pk'
+        super(CursorPaginator, self).__init__(timelines, per_page)
+        self._count = 0
+
+    def fetch_slice(self, bottom, top):
+        return self.hydrate(islice(heapq.merge(
+            *(reversed(timeline) for timeline in self.object_list),
+            reverse=True
+        ), bottom, top))
+
+    def fetch_older(self, value, pk, limit):
+        key = (sort_value(value), pk)
+        return self.hydrate(islice(heapq.merge(
+            *(
+                reversed(timeline[:bisect_left(timeline, key)])
+                for timeline in self.object_list
+            ),
+            reverse=True
+        ), limit))
+
+    def fetch_newer(self, value, pk, limit):
+        key = (sort_value(value), pk)
+        return self.hydrate(islice(heapq.merge(
+            *(
+                timeline[bisect_right(timeline, key):]
+                for timeline in self.object_list
+            )
+        ), limit))
+
+    def hydrate(self, entries):
+        ids = [post_id for _, post_id in entries]
+        posts = Post.objects.select_related('author', 'group').in_bulk(ids)
+        return [posts[post_id] for post_id in ids if post_id in posts]
@@ -7,10 +7,17 @@ app_name = 'posts'
 urlpatterns = [
     path('', views.index, name='main_page'),
     path('group/<slug:slug>/', views.group_list, name='group_list'),
+    path('tag/<str:name>/', views.tag_list, name='tag_list'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('search/', views.search, name='search'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.comment_list,
+        name='comment_list'
+    ),
     path(
         'posts/<int:post_id>/comment/',
         views.add_comment,
@@ -0,0 +1,11 @@
+from itertools import islice
+
+
+def batched(iterable, size):
+    """Списки по size элементов из любого итерируемого."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
@@ -1,53 +1,136 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.db import IntegrityError, transaction
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
-
-from .const import CACHE_TIME, POSTS_FOR_PAGE
-from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
 
+from core.db import immediate_atomic
+from core.routers import pin_replica, use_replica
 
-def get_page(request, queryset, per_page):
-    return Paginator(queryset, per_page).get_page(request.GET.get('page'))
+from .cards import invalidate_cards
+from .const import (
+    COMMENTS_FOR_PAGE, FEED_ENGINE_TIMELINE, POSTS_FOR_PAGE,
+    RELATED_POSTS_COUNT
+)
+from .forms import CommentForm, PostForm
+from .models import Comment, Follow, Group, Post, RelatedPost, Tag, User
+from .page_cache import (
+    AUTHOR_SCOPE, FEED_SCOPE, GROUP_SCOPE, POST_SCOPE, cache_feed,
+    post_author_scope, tag_scope
+)
+from .paginator import CursorPaginator
+from .search import SearchResults
+from .stats import get_stats
+from .timelines import TimelinePaginator, load_user_timelines
+
+
+def get_page(request, queryset, per_page, **kwargs):
+    return paginate(request, CursorPaginator(queryset, per_page, **kwargs))
+
+
+def paginate(request, paginator):
+    return paginator.get_page(
+        request.GET.get('page'),
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
 
 
-@cache_page(CACHE_TIME, key_prefix="index_page")
+@use_replica
+@cache_feed(FEED_SCOPE)
 def index(request):
     return render(request, 'posts/index.html', {
-        'page_obj': get_page(request, Post.objects.all(), POSTS_FOR_PAGE),
+        'page_obj': get_page(
+            request,
+            Post.objects.select_related('author', 'group'),
+            POSTS_FOR_PAGE
+        ),
     })
 
 
+@use_replica
+@cache_feed(GROUP_SCOPE)
 def group_list(request, slug):
     group = get_object_or_404(Group, slug=slug)
     return render(request, 'posts/group_list.html', {
         'group': group,
-        'page_obj': get_page(request, group.posts.all(), POSTS_FOR_PAGE),
+        'page_obj': get_page(
+            request, group.posts.select_related('author'), POSTS_FOR_PAGE
+        ),
     })
 
 
+@use_replica
+@cache_feed(AUTHOR_SCOPE)
 def profile(request, username):
     author = get_object_or_404(User, username=username)
     return render(request, 'posts/profile.html', {
         'author': author,
-        'page_obj': get_page(request, author.posts.all(), POSTS_FOR_PAGE),
-        'following':
-            request.user.is_authenticated
-            and request.user.username != username
-            and Follow.objects.filter(
-                author=author,
-                user=request.user).exists()
+        'stats': get_stats(author),
+        'page_obj': get_page(
+            request, author.posts.select_related('group'), POSTS_FOR_PAGE
+        ),
     })
 
 
+@use_replica
+@cache_feed(tag_scope)
+def tag_list(request, name):
+    tag = get_object_or_404(Tag, name=name.lower())
+    page_obj = get_page(
+        request,
+        tag.post_tags.select_related('post__author', 'post__group'),
+        POSTS_FOR_PAGE,
+        tiebreak='post_id',
+    )
+    page_obj.object_list = [entry.post for entry in page_obj]
+    return render(request, 'posts/tag_list.html', {
+        'tag': tag,
+        'page_obj': page_obj,
+    })
+
+
+def get_comments_page(request, post_id):
+    return get_page(
+        request,
+        Comment.objects.filter(post_id=post_id).select_related('author'),
+        COMMENTS_FOR_PAGE,
+        key='created',
+    )
+
+
+@use_replica
+@cache_feed(POST_SCOPE, post_author_scope)
 def post_detail(request, post_id):
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), id=post_id
+    )
     return render(request, 'posts/post_detail.html', {
-        'post': get_object_or_404(
-            Post.objects.prefetch_related('comments'),
-            id=post_id
-        ),
+        'post': post,
+        'stats': get_stats(post.author),
+        'comments': get_comments_page(request, post_id),
         'form': CommentForm(),
+        'related': RelatedPost.objects.filter(
+            post_id=post_id
+        ).select_related('related').order_by('-score')[:RELATED_POSTS_COUNT],
+    })
+
+
+@use_replica
+def comment_list(request, post_id):
+    return render(request, 'posts/includes/comment_list.html', {
+        'post_id': post_id,
+        'comments': get_comments_page(request, post_id),
+    })
+
+
+@use_replica
+def search(request):
+    query = request.GET.get('q', '').strip()
+    paginator = Paginator(SearchResults(query), POSTS_FOR_PAGE)
+    return render(request, 'posts/search.html', {
+        'query': query,
+        'page_obj': paginator.get_page(request.GET.get('page')),
     })
 
 
@@ -58,7 +141,8 @@ def post_create(request):
         return render(request, 'posts/create_post.html', {'form': form})
     post = form.save(commit=False)
     post.author = request.user
-    post.save()
+    with immediate_atomic():
+        post.save()
     return redirect('posts:profile', request.user.username)
 
 
@@ -67,13 +151,17 @@ def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     if request.user != post.author:
         return redirect('posts:post_detail', post_id)
+    if request.method == 'POST':
+        # Ключи карточек считаются по посту до того, как форма его изменит
+        invalidate_cards(post)
     form = PostForm(
         request.POST or None,
         files=request.FILES or None,
         instance=post
     )
     if form.is_valid():
-        form.save()
+        with immediate_atomic():
+            form.save()
         return redirect('posts:post_detail', post_id)
     return render(request, 'posts/create_post.html', {
         'form': form,
@@ -89,31 +177,50 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with immediate_atomic():
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
+@use_replica
 def follow_index(request):
-    post = Post.objects.filter(author__following__user=request.user)
-    return render(
-        request,
-        'posts/follow.html',
-        {'page_obj': get_page(request, post, POSTS_FOR_PAGE)}
-    )
+    if settings.FOLLOW_FEED_ENGINE == FEED_ENGINE_TIMELINE:
+        page_obj = paginate(request, TimelinePaginator(
+            load_user_timelines(request.user), POSTS_FOR_PAGE
+        ))
+    else:
+        page_obj = get_page(
+            request,
+            request.user.inbox.select_related(
+                'post__author', 'post__group'
+            ),
+            POSTS_FOR_PAGE,
+            tiebreak='post_id',
+        )
+        page_obj.object_list = [entry.post for entry in page_obj]
+    return render(request, 'posts/follow.html', {'page_obj': page_obj})
 
 
 @login_required
+@pin_replica
+@immediate_atomic
 def profile_follow(request, username):
     if username != request.user.username:
-        Follow.objects.get_or_create(
-            author=get_object_or_404(User, username=username),
-            user=request.user
-        )
+        author = get_object_or_404(User, username=username)
+        # Один INSERT вместо SELECT + INSERT у get_or_create: повторную
+        # подписку отсекает уникальное ограничение
+        try:
+            with transaction.atomic():
+                Follow.objects.create(author=author, user=request.user)
+        except IntegrityError:
+            pass
     return redirect('posts:profile', username=username)
 
 
 @login_required
+@pin_replica
+@immediate_atomic
 def profile_unfollow(request, username):
     get_object_or_404(
         Follow, author__username=username, user=request.user
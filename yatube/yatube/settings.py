@@ -12,17 +12,37 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 
 import os
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
-}
-
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# Движок ленты подписок: 'inbox' — материализованные ленты в базе,
+# 'timeline' — слияние лент авторов из кэша
+FOLLOW_FEED_ENGINE = 'inbox'
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
+# LRU в памяти каждого воркера перед общим для всех воркеров файлом;
+# инвалидации расходятся по воркерам через журнал изменений.
+# Вариант с одной копией на машину: BACKEND
+# 'core.backends.InstrumentedSharedMemoryCache' и LOCATION в tmpfs,
+# например '/dev/shm/yatube-cache' (сравнение: manage.py cache_benchmark).
+# В общем уровне лежат страницы, карточки, миниатюры, поколения, ленты
+# авторов и граф подписок — по несколько ключей на пользователя и пост,
+# поэтому MAX_ENTRIES с запасом, а вытесняется за раз десятая часть
+CACHES = {
+    'default': {
+        'BACKEND': 'core.cache.TwoTierCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000000,
+            'CULL_FREQUENCY': 10,
+            'LOCAL_MAX_ENTRIES': 1000,
+            'LOCAL_TIMEOUT': 60,
+            'SYNC_INTERVAL': 0.1,
+        },
+    }
+}
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/2.2/howto/deployment/checklist/
@@ -62,8 +82,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.timing.ServerTimingMiddleware',
+    'core.middleware.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.queries.QueryInspectorMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'core.routers.ReplicaPinMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -71,13 +95,55 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Учёт SQL-запросов: доля выборки, бюджеты запросов на вью и
+# порог одинаковых запросов, после которого они считаются N+1
+QUERY_SAMPLE_RATE = 0.01
+QUERY_BUDGET_DEFAULT = 15
+QUERY_BUDGETS = {
+    'posts:main_page': 5,
+    'posts:group_list': 6,
+    'posts:profile': 10,
+    'posts:post_detail': 9,
+    'posts:comment_list': 3,
+    'posts:follow_index': 6,
+    'posts:search': 5,
+    'posts:tag_list': 6,
+}
+QUERY_BUDGET_STRICT = False
+N_PLUS_ONE_THRESHOLD = 3
+# Файл, куда дописывается выборка (JSON Lines) для manage.py
+# query_report; None — не писать. С DEBUG в выборку попадает каждый
+# запрос, поэтому по умолчанию файл выключен, а включают его вне
+# каталога проекта, например '/var/log/yatube/query_report.jsonl'
+QUERY_REPORT_PATH = None
+
+# Время SQL, шаблонов, кэша и миниатюр в заголовке Server-Timing;
+# JSON-строка на запрос уходит в логгер core.middleware.timing (INFO)
+SERVER_TIMING_HEADER = True
+THUMBNAIL_BACKEND = 'core.backends.TimedThumbnailBackend'
+
+# Миниатюры картинок постов готовят фоновые потоки после сохранения,
+# пока их нет — показывается оригинал; 0 — генерировать в запросе
+THUMBNAIL_QUEUE_WORKERS = 2
+
+# Метрики Prometheus: каталог файлов воркеров и токен, который сборщик
+# передаёт в заголовке Authorization: Bearer <токен>. Адрес клиента за
+# обратным прокси всегда 127.0.0.1, поэтому доступ только по токену;
+# пока он пуст, /metrics отвечает 404
+METRICS_DIR = os.path.join(BASE_DIR, 'metrics')
+METRICS_TOKEN = ''
+
+# manage.py test подменяет настройки на время прогона значениями из
+# yatube.test_settings; pytest подключает этот модуль через pytest.ini
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
 ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 POST_IMAGE_UPLOAD_PATH = 'posts/'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.backends.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -100,10 +166,47 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 60,
+    }
+}
+
+# Реплики для чтения лент и страниц постов (см. core.routers).
+# Локально это снимки db.sqlite3, которые обновляет команда
+# sync_replicas, например REPLICA_FILES = ['replica1.sqlite3']
+REPLICA_FILES = []
+DATABASE_REPLICAS = []
+for number, name in enumerate(REPLICA_FILES, 1):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'NAME': os.path.join(BASE_DIR, name),
+        'TEST': {'MIRROR': 'default'},
     }
+    DATABASE_REPLICAS.append(f'replica{number}')
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+REPLICA_APP_LABELS = ['posts']
+# После записи пользователь REPLICA_PIN_SECONDS читает из основной базы
+REPLICA_PIN_COOKIE = 'read_primary'
+REPLICA_PIN_SECONDS = 10
+REPLICA_HEALTH_CHECK_INTERVAL = 30
+# Страницы, собранные с реплики, кэшируются ненадолго
+REPLICA_PAGE_CACHE_TIME = 60
+
+# Прагмы каждого нового соединения SQLite (см. core.db): WAL, чтобы
+# запись не блокировала чтение, ожидание блокировки вместо ошибки,
+# кэш страниц 64 МБ и чтение файла базы через mmap
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 ** 2,
+    'temp_store': 'MEMORY',
 }
+# Как часто (в секундах) поток выполняет PRAGMA optimize и
+# контрольную точку WAL после очередного запроса
+SQLITE_MAINTENANCE_INTERVAL = 300
 
 
 # Password validation
@@ -0,0 +1,37 @@
+"""Настройки тестов поверх yatube.settings.
+
+Рабочий кэш — файл, общий для всех процессов, а тесты чистят кэш и
+заново раздают одни и те же id. Поэтому у каждого процесса тестов кэш
+свой, в памяти: прогоны не видят данных друг друга, manage.py test
+--parallel работает, и в дереве не остаётся файлов. Файлы метрик
+воркеров пишутся во временный каталог.
+
+Миниатюры готовятся в запросе: тест не ждёт фоновых потоков очереди,
+и они писали бы в его временный MEDIA_ROOT, пока тот удаляется. Тесты
+самой очереди включают её через override_settings.
+
+OVERRIDES применяет на время прогона core.test_runner (manage.py test),
+а pytest загружает модуль целиком (pytest.ini).
+"""
+import atexit
+import os
+import shutil
+import tempfile
+
+from .settings import *  # noqa: F401,F403
+
+TEMP_DIR = tempfile.mkdtemp(prefix='yatube-tests-')
+atexit.register(shutil.rmtree, TEMP_DIR, ignore_errors=True)
+
+OVERRIDES = {
+    'CACHES': {
+        'default': {
+            'BACKEND': 'core.backends.InstrumentedLocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        },
+    },
+    'THUMBNAIL_QUEUE_WORKERS': 0,
+    'METRICS_DIR': os.path.join(TEMP_DIR, 'metrics'),
+}
+
+globals().update(OVERRIDES)